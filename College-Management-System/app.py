@@ -1,15 +1,29 @@
 # app.py
 import os
 import io
-import json
 import base64
+import logging
+import time
 from datetime import datetime
 from flask import (
     Flask, render_template, request, jsonify, redirect, url_for,
-    send_file, abort, flash
+    send_file, abort, flash, g, session
 )
+from sqlalchemy import text as sql_text
 from werkzeug.utils import secure_filename
 
+from recognition import frame_gate, marked_cache, recognizer, class_sessions, admission, Saturated, recognition_jobs
+from services import (IngestError, VersionConflict, ingest_jobs, results_store, roster, storage, student_search,
+                      thumbnails)
+from database.models import epoch_of
+from services.health import hit_rate, pool_stats, process_stats, readiness
+from services.blobstore import blob_store, is_digest
+from services.log_pipeline import install_request_logging, pipeline
+from services.profiling import HEADER as PROFILE_HEADER, request_profiler
+from services.serialization import FastJSONProvider, dump_file, load_file
+from services.retention import open_capture
+from services.ingest import MAX_ELEMENT, finish, stream_array_to_file, validate_mark_record
+
 # -------------- Configuration --------------
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.join(BASE_DIR, "data")
@@ -29,6 +43,49 @@ os.makedirs(STUDENT_FACES, exist_ok=True)
 # Flask app
 app = Flask(__name__)
 app.secret_key = os.environ.get("FLASK_SECRET", "dev-secret-key")
+app.json = FastJSONProvider(app)  # jsonify() through the fast serializer
+log = logging.getLogger(__name__)
+
+# request id + access record; run.py routes all logging through the queue (services/log_pipeline.py)
+install_request_logging(app, quiet_endpoints=("healthz", "readyz"))
+
+# --- Per-request profiling (opt-in: X-Profile header from an admin, or sampling) ---
+@app.before_request
+def _start_profile():
+    request_profiler.configure(
+        sample_rate=app.config.get("PROFILE_SAMPLE_RATE"),
+        token=app.config.get("PROFILE_TOKEN"),
+        keep=app.config.get("PROFILE_KEEP"),
+    )
+    trigger = request_profiler.trigger(request.headers.get(PROFILE_HEADER), "admin" in session)
+    if trigger and request.endpoint not in (None, "static"):
+        g.profile = (request_profiler.start(), trigger, time.perf_counter())
+
+def _finish_profile(status):
+    prof, trigger, started = g.pop("profile", (None, None, None))
+    if prof is None:
+        return None
+    meta = {"endpoint": request.endpoint, "method": request.method, "path": request.path,
+            "status": status, "trigger": trigger,
+            "latency_ms": round((time.perf_counter() - started) * 1000, 2)}
+    try:
+        return request_profiler.stop(prof, meta)
+    except OSError as e:
+        log.warning("could not save request profile: %s", e)
+        return None
+
+@app.after_request
+def _stop_profile(response):
+    meta = _finish_profile(response.status_code)
+    if meta is not None:
+        response.headers["X-Profile-Id"] = meta["name"]
+    return response
+
+@app.teardown_request
+def _abort_profile(exc):
+    # after_request does not run when the view raised
+    if "profile" in g:
+        _finish_profile(500)
 
 # --- Register blueprints (routes) ---
 def try_register(import_path):
@@ -36,25 +93,27 @@ def try_register(import_path):
         module = __import__(import_path, fromlist=['bp'])
         bp = getattr(module, 'bp', None)
         if bp is None:
-            print(f"Warning: module {import_path} has no 'bp' attribute")
+            log.warning("module %s has no 'bp' attribute", import_path)
             return
         app.register_blueprint(bp)
-        print(f"Registered blueprint from {import_path}")
+        log.debug("registered blueprint from %s", import_path)
     except Exception as e:
-        print(f"Warning: could not register blueprint {import_path}: {e}")
+        log.warning("could not register blueprint %s: %s", import_path, e)
 
 try_register('routes.admin_routes')
 try_register('routes.teacher_routes')
-try_register('routes.student_routes')
+try_register('routes.student_route')
 try_register('routes.face_routes')
 try_register('routes.api_routes')
 
 # --- Initialize SQLAlchemy models and create tables if needed ---
 try:
     from database.models import db, create_all_if_needed
+    from database.migrations import backfill_epochs, upgrade_schema
     # configure SQLAlchemy DB location (fallback to sqlite in instance/)
+    os.makedirs(os.path.join(BASE_DIR, "instance"), exist_ok=True)
     app.config["SQLALCHEMY_DATABASE_URI"] = app.config.get(
-        "SQLALCHEMY_DATABASE_URI", "sqlite:///instance/database.sqlite3"
+        "SQLALCHEMY_DATABASE_URI", "sqlite:///" + os.path.join(BASE_DIR, "instance", "database.sqlite3")
     )
 
     # Initialize db once
@@ -64,9 +123,13 @@ try:
     # to avoid calling db.init_app() twice inside the helper).
     with app.app_context():
         db.create_all()
+        # add columns introduced after the database file was created
+        upgrade_schema(db)
+        # integer epochs for rows written before the epoch columns existed
+        backfill_epochs(db)
 except Exception as _err:
-    # If database package is not available yet, print a warning and continue.
-    print("Warning: could not initialize SQLAlchemy models:", _err)
+    # If database package is not available yet, log a warning and continue.
+    log.warning("could not initialize SQLAlchemy models: %s", _err)
 
 
 
@@ -74,33 +137,55 @@ except Exception as _err:
 
 
 # -------------- Helper functions --------------
+def _roster_counts():
+    """Cached per-class / per-department counts for the dashboard (None if the DB is down)."""
+    try:
+        return roster.counts()
+    except Exception as e:
+        log.warning("roster counts unavailable: %s", e)
+        return None
+
 def save_json(path, obj):
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(obj, f, ensure_ascii=False, indent=2)
+    # compact unless JSON_PRETTY_FILES; orjson when installed (services/serialization.py)
+    dump_file(path, obj, pretty=app.config.get("JSON_PRETTY_FILES", False))
 
 def load_json(path, default=None):
-    if not os.path.exists(path):
-        return default
-    try:
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception:
-        return default
+    return load_file(path, default=default)
 
 def allowed_file(filename):
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_IMAGE_EXT
 
-def save_base64_image(data_url, dest_path):
+def _store_face(upload=None, data_url=None):
     """
-    data_url: "data:image/jpeg;base64,...."
-    dest_path: file path to save (including extension)
+    Put an enrollment photo (multipart file or data URL) into the blob store.
+    Identical photos are stored once. Returns the blob dict or None.
     """
-    header, encoded = data_url.split(",", 1)
-    # optionally inspect header for mimetype
-    data = base64.b64decode(encoded)
-    with open(dest_path, "wb") as f:
-        f.write(data)
-    return dest_path
+    data, ext = None, "jpg"
+    if upload and upload.filename:
+        if not allowed_file(upload.filename):
+            return None
+        data, ext = upload.read(), upload.filename.rsplit(".", 1)[1]
+    elif data_url and data_url.startswith("data:"):
+        header, _, encoded = data_url.partition(",")
+        ext = "png" if "png" in header else "jpg"
+        try:
+            data = base64.b64decode(encoded)
+        except Exception as ex:
+            log.warning("error decoding base64 image: %s", ex)
+            return None
+    if not data:
+        return None
+    try:
+        return blob_store.put(data, ext)
+    except Exception:
+        log.exception("error saving face image")
+        return None
+
+def _set_face(profile, blob):
+    profile["face_image"] = blob["path"] if blob else None
+    if blob:
+        profile["face_blob"] = blob["digest"]
+        profile["face_url"] = blob["url"]
 
 def make_unique_filename(prefix, orig_filename):
     ts = datetime.utcnow().strftime("%Y%m%d%H%M%S%f")
@@ -114,7 +199,7 @@ def index():
 
 @app.route("/dashboard")
 def dashboard():
-    return render_template("dashboard.html")
+    return render_template("dashboard.html", counts=_roster_counts())
 
 @app.route("/teacher-login")
 def teacher_login_page():
@@ -155,7 +240,8 @@ def register_teacher():
     Accepts either:
     - multipart form: fields (teacher_name, teacher_id, department, assigned_classes) + photo_file
     - OR photo_base64 (dataURL) in a text field
-    Saves profile JSON in data/teachers.json and the face image in static/uploads/teacher_faces/.
+    Saves the profile (data/teachers.json and/or the Teacher table, see STORAGE_BACKEND)
+    and the face image in the blob store.
     """
     name = request.form.get("teacher_name") or request.form.get("name")
     teacher_id = request.form.get("teacher_id")
@@ -165,8 +251,6 @@ def register_teacher():
     if not name or not teacher_id:
         return "Missing name or teacher_id", 400
 
-    # load existing teachers
-    teachers = load_json(os.path.join(DATA_DIR, "teachers.json"), default=[])
     # store profile
     profile = {
         "name": name,
@@ -176,38 +260,9 @@ def register_teacher():
         "enrolled_at": datetime.utcnow().isoformat()
     }
 
-    # Handle image (file or base64)
-    saved_image_path = None
-    if "photo_file" in request.files and request.files["photo_file"]:
-        f = request.files["photo_file"]
-        if f and allowed_file(f.filename):
-            fname = make_unique_filename(teacher_id, f.filename)
-            dest = os.path.join(TEACHER_FACES, fname)
-            f.save(dest)
-            saved_image_path = os.path.relpath(dest, BASE_DIR)
-    else:
-        # base64 field
-        base64_field = request.form.get("photo_base64")
-        if base64_field and base64_field.startswith("data:"):
-            # choose extension from header
-            header = base64_field.split(",", 1)[0]
-            if "jpeg" in header or "jpg" in header:
-                ext = "jpg"
-            elif "png" in header:
-                ext = "png"
-            else:
-                ext = "jpg"
-            fname = make_unique_filename(teacher_id, f"face.{ext}")
-            dest = os.path.join(TEACHER_FACES, fname)
-            try:
-                save_base64_image(base64_field, dest)
-                saved_image_path = os.path.relpath(dest, BASE_DIR)
-            except Exception as ex:
-                print("Error saving base64 image:", ex)
-
-    profile["face_image"] = saved_image_path
-    teachers.append(profile)
-    save_json(os.path.join(DATA_DIR, "teachers.json"), teachers)
+    # Handle image (file or base64); stored once per distinct photo in the blob store
+    _set_face(profile, _store_face(request.files.get("photo_file"), request.form.get("photo_base64")))
+    storage.add_profile("teacher", profile)
 
     # redirect back to dashboard or return JSON
     if request.accept_mimetypes.accept_json and not request.accept_mimetypes.accept_html:
@@ -229,7 +284,6 @@ def register_student():
     if not name or not student_id:
         return "Missing name or student_id", 400
 
-    students = load_json(os.path.join(DATA_DIR, "students.json"), default=[])
     profile = {
         "name": name,
         "student_id": student_id,
@@ -238,35 +292,13 @@ def register_student():
         "enrolled_at": datetime.utcnow().isoformat()
     }
 
-    saved_image_path = None
-    if "photo_file_student" in request.files and request.files["photo_file_student"]:
-        f = request.files["photo_file_student"]
-        if f and allowed_file(f.filename):
-            fname = make_unique_filename(student_id, f.filename)
-            dest = os.path.join(STUDENT_FACES, fname)
-            f.save(dest)
-            saved_image_path = os.path.relpath(dest, BASE_DIR)
-    else:
-        base64_field = request.form.get("photo_base64_student")
-        if base64_field and base64_field.startswith("data:"):
-            header = base64_field.split(",", 1)[0]
-            if "jpeg" in header or "jpg" in header:
-                ext = "jpg"
-            elif "png" in header:
-                ext = "png"
-            else:
-                ext = "jpg"
-            fname = make_unique_filename(student_id, f"face.{ext}")
-            dest = os.path.join(STUDENT_FACES, fname)
-            try:
-                save_base64_image(base64_field, dest)
-                saved_image_path = os.path.relpath(dest, BASE_DIR)
-            except Exception as ex:
-                print("Error saving base64 image:", ex)
-
-    profile["face_image"] = saved_image_path
-    students.append(profile)
-    save_json(os.path.join(DATA_DIR, "students.json"), students)
+    _set_face(profile, _store_face(request.files.get("photo_file_student"), request.form.get("photo_base64_student")))
+    saved_image_path = profile["face_image"]
+    storage.add_profile("student", profile)
+    student_search.add(profile)
+    if recognizer.loaded:
+        recognizer.enroll_file(student_id, saved_image_path, BASE_DIR, name=name, class_name=class_section,
+                               replace=True)
 
     if request.accept_mimetypes.accept_json and not request.accept_mimetypes.accept_html:
         return jsonify({"ok": True, "profile": profile})
@@ -274,6 +306,20 @@ def register_student():
     return redirect(url_for("dashboard"))
 
 # -------------- API: Marks & Results --------------
+def _start_stream_upload(kind):
+    """
+    Common setup for ?stream=1 uploads: lift the body size limit for this
+    request and register progress under the client's X-Upload-Id (or a new id),
+    pollable at GET /api/uploads/<id>. Returns (job, error_response).
+    """
+    if request.mimetype not in ("application/json", "application/octet-stream", "text/plain"):
+        return None, (jsonify({"error": "Only JSON accepted"}), 400)
+    upload_id = request.headers.get("X-Upload-Id") or request.args.get("upload_id")
+    if upload_id and (len(upload_id) > 64 or not upload_id.replace("-", "").replace("_", "").isalnum()):
+        return None, (jsonify({"error": "invalid upload id"}), 400)
+    request.max_content_length = app.config.get("INGEST_MAX_CONTENT_LENGTH", 1024 * 1024 * 1024)
+    return ingest_jobs.start(upload_id, kind=kind), None
+
 @app.route("/api/upload-marks", methods=["POST"])
 def api_upload_marks():
     """
@@ -283,58 +329,93 @@ def api_upload_marks():
         "lastSavedBy": { id, name },
         "lastSavedAt": ISOString
       }
-    Saves to data/sessional_marks.json (server-side).
+    Saves to the Mark table and, outside STORAGE_BACKEND=sql, data/sessional_marks.json.
+    With ?stream=1 the body is a bare array of mark rows, parsed and written
+    incrementally (see _start_stream_upload); saved-by comes from the query string.
     """
+    if request.args.get("stream") == "1":
+        job, err = _start_stream_upload("marks")
+        if err:
+            return err
+        meta = {"lastSavedAt": datetime.utcnow().isoformat(),
+                "lastSavedBy": {"id": request.args.get("saved_by_id", ""), "name": request.args.get("saved_by_name", "")}}
+        staging = f"{SESSIONAL_MARKS_FILE}.{job['id']}.part"
+        try:
+            stream_array_to_file(request.stream, staging, job, validate=validate_mark_record,
+                                 meta_fn=lambda j: meta,
+                                 chunk_size=app.config.get("INGEST_CHUNK_SIZE", 64 * 1024),
+                                 max_element=app.config.get("INGEST_MAX_ELEMENT_SIZE", MAX_ELEMENT))
+        except IngestError as e:
+            return jsonify({"ok": False, "error": str(e), "upload": ingest_jobs.get(job["id"])}), 400
+        try:
+            storage.save_sessional_marks_staged(staging, meta)
+        except ValueError as e:
+            finish(job, "failed", str(e))
+            return jsonify({"ok": False, "error": str(e), "upload": ingest_jobs.get(job["id"])}), 400
+        finish(job, "done")
+        return jsonify({"ok": True, "saved_at": meta["lastSavedAt"], "upload": ingest_jobs.get(job["id"])})
     if not request.is_json:
         return jsonify({"error": "Only JSON accepted"}), 400
     payload = request.get_json()
     # minimal validation
     marks = payload.get("marks") or payload.get("records") or []
     meta = payload.get("meta") or {"lastSavedAt": datetime.utcnow().isoformat(), "lastSavedBy": payload.get("lastSavedBy", {})}
-    stored = {"_meta": meta, "records": marks}
-    save_json(SESSIONAL_MARKS_FILE, stored)
+    try:
+        storage.save_sessional_marks(marks, meta)
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
     return jsonify({"ok": True, "saved_at": meta.get("lastSavedAt")})
 
-@app.route("/api/get-marks", methods=["GET"])
-def api_get_marks():
-    """
-    Returns the stored marks object (for teacher pages or client-side).
-    """
-    saved = load_json(SESSIONAL_MARKS_FILE, default={})
-    return jsonify(saved)
-
 @app.route("/api/get-semester-results", methods=["GET"])
 def api_get_semester_results():
     """
     Returns semester results (students array) -> used by results page
     """
-    raw = load_json(SEMESTER_RESULTS_FILE, default=None)
-    if raw is None:
+    doc = results_store.document()
+    if doc is None:
         # try fallback to sessional marks to convert into student centric structure (very simple)
         return jsonify({"ok": False, "message": "No semester_results found on server"})
-    return jsonify({"ok": True, "data": raw})
+    return jsonify({"ok": True, "data": doc, "version": doc["_meta"].get("version")})
 
 @app.route("/api/publish-semester-results", methods=["POST"])
 def api_publish_semester_results():
     """
     Endpoint to upload full semester_results JSON (array of students with semesters array).
     Example payload: [ { roll_no, student_id, name, class, semesters: [ ... ] }, ... ]
+    For single corrections use POST /api/semester-results/delta instead.
+    With ?stream=1 the array is parsed and written record by record, so uploads
+    far larger than MAX_CONTENT_LENGTH never sit in memory.
     """
+    if request.args.get("stream") == "1":
+        job, err = _start_stream_upload("semester_results")
+        if err:
+            return err
+        try:
+            version = results_store.publish_stream(request.stream, job, saved_by={"id": "api", "name": "API"},
+                                                   chunk_size=app.config.get("INGEST_CHUNK_SIZE", 64 * 1024),
+                                                   max_element=app.config.get("INGEST_MAX_ELEMENT_SIZE", MAX_ELEMENT))
+        except IngestError as e:
+            return jsonify({"ok": False, "error": str(e), "upload": ingest_jobs.get(job["id"])}), 400
+        except VersionConflict as e:
+            return jsonify({"ok": False, "error": "results changed during upload, retry",
+                            "version": e.current, "upload": ingest_jobs.get(job["id"])}), 409
+        return jsonify({"ok": True, "count": job["written"], "rejected": job["rejected"],
+                        "version": version, "upload": ingest_jobs.get(job["id"])})
     if not request.is_json:
         return jsonify({"error": "Only JSON accepted"}), 400
     payload = request.get_json()
     # minimal check: payload must be list
     if not isinstance(payload, list):
         return jsonify({"error": "Expecting top-level array of student objects"}), 400
-    # optionally add meta wrapper
-    meta = {"lastSavedAt": datetime.utcnow().isoformat(), "lastSavedBy": {"id": "api", "name": "API"}}
-    to_store = {"_meta": meta, "records": payload}
-    save_json(SEMESTER_RESULTS_FILE, to_store)
-    return jsonify({"ok": True, "count": len(payload), "saved_at": meta["lastSavedAt"]})
+    try:
+        version = results_store.publish(payload, saved_by={"id": "api", "name": "API"})
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+    meta = results_store.document()["_meta"]
+    return jsonify({"ok": True, "count": len(payload), "saved_at": meta["lastSavedAt"], "version": version})
 
 # -------------- Face recognition stub --------------
-# persistence for attendance captures
-ATTENDANCE_FILE = os.path.join(DATA_DIR, "attendance.json")
+# persistence for attendance captures (services.storage: data/attendance/<YYYY-MM>.jsonl and/or Attendance rows)
 CAPTURE_DIR = os.path.join(UPLOADS_DIR, "captures")
 os.makedirs(CAPTURE_DIR, exist_ok=True)
 
@@ -342,74 +423,406 @@ os.makedirs(CAPTURE_DIR, exist_ok=True)
 def face_recognize():
     """
     Demo capture+persist endpoint:
-    - Accepts JSON { image: dataURL } OR form-file named "file"
+    - Accepts JSON { image: dataURL, session } OR form-file named "file"
+    - Skips frames that look the same as the last processed one for the session
+    - Matches against the class session roster first, then every enrolled student
+    - Runs at most RECOGNITION_MAX_CONCURRENT recognitions at once; extra frames
+      queue fairly per session, and a full queue answers 503 + Retry-After
+    - Records each student once per session within ATTENDANCE_DEDUP_TTL_SECONDS
     - Saves image to static/uploads/captures/
-    - Appends an attendance record to data/attendance.json
+    - Appends an attendance record to data/attendance/<YYYY-MM>.jsonl
     - Returns { ok: True, id, name, status, ts } on success
-    Replace recognition logic with your real model later.
+    Without the face_recognition package it falls back to demo records.
+    """
+    capture, early = _gated_capture()
+    if early is not None:
+        return early
+    image_bytes, ext, session_key = capture
+
+    # 3) Admission: bounded, per-session fair queue in front of recognition
+    admission.configure(
+        max_concurrent=app.config.get("RECOGNITION_MAX_CONCURRENT"),
+        max_queue=app.config.get("RECOGNITION_MAX_QUEUE"),
+        max_per_session=app.config.get("RECOGNITION_MAX_PER_SESSION"),
+        max_wait_seconds=app.config.get("RECOGNITION_MAX_WAIT_SECONDS"),
+    )
+    try:
+        with admission.slot(session_key):
+            result, code = _recognize_and_mark(image_bytes, ext, session_key)
+    except Saturated as e:
+        return _busy_response(e)
+    return jsonify(result), code
+
+
+@app.route("/face/recognize/async", methods=["POST"])
+def face_recognize_async():
     """
-    image_data = None
-    filename = None
+    Same input as /face/recognize, but the capture is only queued:
+    answers 202 { ok, job_id, status: "queued", poll } straight away.
+    Poll GET /face/jobs/<job_id> (add ?wait=N to long-poll) for the result.
+    Unchanged frames are still answered inline (skipped), and a full job
+    queue answers 503 + Retry-After.
+    """
+    capture, early = _gated_capture()
+    if early is not None:
+        return early
+    image_bytes, ext, session_key = capture
+
+    recognition_jobs.configure(
+        workers=app.config.get("RECOGNITION_JOB_WORKERS"),
+        batch_size=app.config.get("RECOGNITION_BATCH_SIZE"),
+        batch_wait_ms=app.config.get("RECOGNITION_BATCH_WAIT_MS"),
+        max_pending=app.config.get("RECOGNITION_JOB_MAX_PENDING"),
+    )
+    try:
+        job = recognition_jobs.submit(session_key, (image_bytes, ext, session_key))
+    except Saturated as e:
+        return _busy_response(e)
+    return jsonify({"ok": True, "job_id": job["id"], "status": job["state"], "position": job["position"],
+                    "poll": url_for("face_job", job_id=job["id"])}), 202
+
+
+@app.route("/face/jobs/<job_id>", methods=["GET"])
+def face_job(job_id):
+    """Status of an async recognition job; ?wait=N blocks up to N seconds for the result."""
+    try:
+        wait = float(request.args.get("wait", 0))
+    except ValueError:
+        wait = 0.0
+    wait = min(max(wait, 0.0), float(app.config.get("RECOGNITION_JOB_MAX_WAIT_SECONDS", 25)))
+    job = recognition_jobs.get(job_id, wait=wait)
+    if job is None:
+        return jsonify({"ok": False, "message": "Unknown or expired job"}), 404
+    return jsonify(job)
 
-    # 1) Get image payload
+
+def _busy_response(e):
+    resp = jsonify({"ok": False, "status": "busy", "message": "Recognition is busy, retry shortly",
+                    "reason": e.reason, "retry_after": e.retry_after})
+    resp.status_code = 503
+    resp.headers["Retry-After"] = str(e.retry_after)
+    return resp
+
+
+def _gated_capture():
+    """
+    Read the capture from the request and run it through the frame gate.
+    Returns ((image_bytes, ext, session_key), None), or (None, response) when
+    the request is answered here (bad input, unchanged frame).
+    """
+    image_bytes = None
+    ext = "jpg"
+    payload = {}
+
+    # 1) Get image payload (kept in memory until the frame gate has seen it)
     if request.is_json:
-        image_data = request.get_json().get("image")
-    elif "image" in request.form:
+        payload = request.get_json(silent=True)
+        if not isinstance(payload, dict):
+            return None, (jsonify({"ok": False, "message": "Invalid JSON body"}), 400)
+        image_data = payload.get("image")
+    else:
+        payload = request.form
         image_data = request.form.get("image")
-    elif "file" in request.files:
-        f = request.files["file"]
-        filename = make_unique_filename("capture", f.filename or "capture.jpg")
-        dest = os.path.join(CAPTURE_DIR, filename)
-        f.save(dest)
 
-    # 2) If dataURL provided, save it to file
     if image_data and isinstance(image_data, str) and image_data.startswith("data:"):
         try:
-            header = image_data.split(",", 1)[0]
-            ext = "jpg"
+            header, b64 = image_data.split(",", 1)
             if "png" in header: ext = "png"
-            filename = make_unique_filename("capture", f"capture.{ext}")
-            dest = os.path.join(CAPTURE_DIR, filename)
-            _, b64 = image_data.split(",", 1)
-            with open(dest, "wb") as fh:
-                fh.write(base64.b64decode(b64))
+            image_bytes = base64.b64decode(b64)
         except Exception as e:
-            print("Failed to save capture:", e)
-            return jsonify({"ok": False, "message": "Failed to save image"}), 500
+            log.warning("failed to decode capture: %s", e)
+            return None, (jsonify({"ok": False, "message": "Invalid image data"}), 400)
+    elif "file" in request.files:
+        f = request.files["file"]
+        orig_name = f.filename or "capture.jpg"
+        if "." in orig_name:
+            ext = orig_name.rsplit(".", 1)[1].lower()
+        image_bytes = f.read()
+
+    if not image_bytes:
+        return None, (jsonify({"ok": False, "message": "No image provided"}), 400)
+
+    # 2) Frame gate: skip frames that haven't meaningfully changed
+    session_key = payload.get("session") or payload.get("camera_id") or request.remote_addr or "default"
+    if app.config.get("FRAME_GATE_ENABLED", True):
+        frame_gate.configure(
+            threshold=app.config.get("FRAME_GATE_THRESHOLD"),
+            max_skip_seconds=app.config.get("FRAME_GATE_MAX_SKIP_SECONDS"),
+            hash_size=app.config.get("FRAME_GATE_HASH_SIZE"),
+        )
+        process, distance = frame_gate.check(session_key, image_bytes)
+        if not process:
+            return None, jsonify({"ok": True, "skipped": True, "status": "unchanged", "distance": distance})
+    return (image_bytes, ext, session_key), None
+
+
+def _recognize_and_mark(image_bytes, ext, session_key):
+    """
+    Recognition + attendance write for one frame that passed the frame gate.
+    Returns (response body, HTTP status).
+    """
+    return _recognize_batch([(image_bytes, ext, session_key)])[0]
+
+
+def _recognize_batch(captures):
+    """
+    captures: [(image_bytes, ext, session_key)]. All faces are matched in one
+    recognizer call, then each capture is recorded on its own.
+    Returns [(response body, HTTP status)] in the same order.
+    """
+    # 1) Recognition: active class session roster first, then the whole college
+    sessions = [class_sessions.get(session_key) for _, _, session_key in captures]
+    if recognizer.available:
+        _load_recognizer()
+        matches = recognizer.identify_batch([(c[0], s) for c, s in zip(captures, sessions)],
+                                            threshold=app.config.get("FACE_MATCH_THRESHOLD", 0.45))
+    else:
+        # demo fallback when no embedding model is installed
+        matches = [{"student_id": f"DEMO-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}", "name": "Demo Student"}
+                   for _ in captures]
+    return [_mark_attendance(match, image_bytes, ext, session_key, class_session)
+            for match, (image_bytes, ext, session_key), class_session in zip(matches, captures, sessions)]
+
+
+def _load_recognizer():
+    """Configure the recognizer from app.config and embed every enrolled student (first call only)."""
+    recognizer.configure(
+        backend=app.config.get("FACE_INDEX_BACKEND", "exact"),
+        detection_model=app.config.get("FACE_DETECTION_MODEL", "hog"),
+        detect_max_side=app.config.get("FACE_DETECT_MAX_SIDE", 480),
+        nlist=app.config.get("FACE_IVF_NLIST", 0),
+        nprobe=app.config.get("FACE_IVF_NPROBE", 8),
+    )
+    if not recognizer.loaded:
+        recognizer.ensure_loaded(storage.profiles("student"), BASE_DIR)
+
+
+def _mark_attendance(match, image_bytes, ext, session_key, class_session):
+    if match is None:
+        return {"ok": False, "status": "unknown", "message": "No matching student"}, 200
+    student_id = match["student_id"]
+    student_name = match["name"]
+    status = "present"
+
+    # 2) Already marked in this session? short-circuit before any write
+    marked_cache.configure(
+        ttl_seconds=app.config.get("ATTENDANCE_DEDUP_TTL_SECONDS"),
+        max_entries=app.config.get("ATTENDANCE_DEDUP_MAX_ENTRIES"),
+    )
+    mark_key = (student_id, session_key)
+    if marked_cache.check_and_mark(mark_key):
+        return {"ok": True, "id": student_id, "name": student_name, "status": status, "already_marked": True}, 200
+
+    # 3) Save capture and append the attendance record
+    filename = make_unique_filename("capture", f"capture.{ext}")
+    dest = os.path.join(CAPTURE_DIR, filename)
+    try:
+        with open(dest, "wb") as fh:
+            fh.write(image_bytes)
+    except Exception:
+        marked_cache.discard(mark_key)
+        log.exception("failed to save capture", extra={"student_id": student_id, "session_key": session_key})
+        return {"ok": False, "message": "Failed to save image"}, 500
+
+    ts = datetime.utcnow().isoformat()
+    record = {
+        "id": student_id,
+        "name": student_name,
+        "status": status,
+        "ts": ts,
+        "ts_epoch": epoch_of(ts),
+        "session": session_key,
+        "image": os.path.relpath(dest, BASE_DIR)
+    }
+
+    storage.append_attendance(record)
+    if class_session is not None:
+        class_session.note_recognized(student_id, ts)
+
+    return {"ok": True, "id": record["id"], "name": record["name"], "status": record["status"], "ts": record["ts"]}, 200
+
+
+def _run_recognition_jobs(captures):
+    """Batch processor for /face/recognize/async; job results are the sync response bodies."""
+    with app.app_context():
+        return [body for body, _code in _recognize_batch(captures)]
+
+
+recognition_jobs.set_processor(_run_recognition_jobs)
 
-    # 3) Demo recognition / record creation
-    if filename:
-        ts = datetime.utcnow().isoformat()
-        demo_id = f"DEMO-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}"
-        demo_name = "Demo Student"
-        status = "present"
-        record = {
-            "id": demo_id,
-            "name": demo_name,
-            "status": status,
-            "ts": ts,
-            "image": os.path.relpath(os.path.join(CAPTURE_DIR, filename), BASE_DIR)
-        }
 
-        arr = load_json(ATTENDANCE_FILE, default=[])
-        arr.append(record)
-        save_json(ATTENDANCE_FILE, arr)
+@app.route("/api/frame-gate/stats", methods=["GET"])
+def api_frame_gate_stats():
+    """Skipped vs processed frame counters (optionally ?session=...)."""
+    return jsonify(frame_gate.stats(request.args.get("session")))
 
-        return jsonify({"ok": True, "id": record["id"], "name": record["name"], "status": record["status"], "ts": record["ts"]})
+@app.route("/api/face-index/stats", methods=["GET"])
+def api_face_index_stats():
+    out = recognizer.index.stats()
+    out["loaded"] = recognizer.loaded
+    out["detection_model"] = recognizer.detection_model
+    out["stage_ms"] = recognizer.stage_stats()
+    return jsonify(out)
 
-    return jsonify({"ok": False, "message": "No image provided"}), 400
+@app.route("/api/attendance-dedup/stats", methods=["GET"])
+def api_attendance_dedup_stats():
+    return jsonify(marked_cache.stats())
+
+@app.route("/api/recognition-queue/stats", methods=["GET"])
+def api_recognition_queue_stats():
+    """Running / queued recognitions, rejections and queue-time percentiles."""
+    return jsonify(admission.stats())
+
+@app.route("/api/recognition-jobs/stats", methods=["GET"])
+def api_recognition_jobs_stats():
+    return jsonify(recognition_jobs.stats())
+
+
+# -------------- Health / readiness (services/health.py) --------------
+def _warm_face_index():
+    if not recognizer.available:
+        return "face_recognition not installed"
+    _load_recognizer()
+    return f"{recognizer.index.stats()['students']} students"
+
+readiness.check("database", lambda: db.session.execute(sql_text("SELECT 1")))
+readiness.warmer("roster", lambda: f"{roster.counts()['students']['total']} students")
+readiness.warmer("student_search", lambda: f"{student_search.stats()['students']} indexed")
+readiness.warmer("results", lambda: f"version {results_store.version}" if results_store.analytics() else "nothing published")
+readiness.warmer("face_index", _warm_face_index)
+
+def _saturation():
+    """Recognition queues at their limit: new captures would be rejected with 503."""
+    a, j = admission.stats(), recognition_jobs.stats()
+    return {"saturated": a["queued"] >= a["max_queue"] or j["pending"] >= j["max_pending"],
+            "recognition_busy": round(a["running"] / a["max_concurrent"], 2) if a["max_concurrent"] else None}
+
+@app.route("/healthz", methods=["GET"])
+def healthz():
+    """Liveness: the process is up and serving requests (no I/O)."""
+    return jsonify({"ok": True})
+
+@app.route("/readyz", methods=["GET"])
+def readyz():
+    """
+    Readiness: 200 once the database answers and the roster, search index,
+    results snapshot and face index are loaded; 503 with the pending parts
+    before that (the first probe starts the warm-up).
+    With READYZ_FAIL_WHEN_SATURATED, also 503 while the recognition queues are full.
+    """
+    readiness.configure(cache_seconds=app.config.get("READINESS_CACHE_SECONDS"))
+    out = dict(readiness.status(context=app.app_context))
+    out.update(_saturation())
+    ok = out["ready"] and not (out["saturated"] and app.config.get("READYZ_FAIL_WHEN_SATURATED", False))
+    return jsonify(out), 200 if ok else 503
+
+def _section(fn):
+    try:
+        return fn()
+    except Exception as e:
+        return {"error": f"{e.__class__.__name__}: {e}"}
+
+@app.route("/api/stats", methods=["GET"])
+def api_stats():
+    """One snapshot for routing decisions: load, queues, caches, indexes, DB pool and worker memory."""
+    def queues():
+        a, j = admission.stats(), recognition_jobs.stats()
+        return {"recognition": {k: a[k] for k in ("running", "max_concurrent", "queued", "max_queue", "rejected",
+                                                    "queue_ms")},
+                "recognition_jobs": {k: j[k] for k in ("pending", "max_pending", "workers", "rejected", "jobs")},
+                "log": pipeline.stats()}
+
+    def caches():
+        t, d, f = thumbnails.stats(), marked_cache.stats(), frame_gate.stats()
+        return {"thumbnails": {"hits": t["hits"], "misses": t["misses"], "hit_rate": hit_rate(t["hits"], t["misses"]),
+                               "files": t["files"], "bytes": t["bytes"]},
+                "attendance_dedup": {"hits": d["hits"], "misses": d["misses"],
+                                     "hit_rate": hit_rate(d["hits"], d["misses"]), "entries": d["entries"]},
+                "frame_gate": {"processed": f["processed"], "skipped": f["skipped"], "skip_ratio": f["skip_ratio"]}}
+
+    def indexes():
+        face = dict(recognizer.index.stats(), loaded=recognizer.loaded, available=recognizer.available)
+        return {"face": face, "student_search": student_search.stats(), "results_version": results_store.version}
+
+    return jsonify({
+        "ready": readiness.warm,
+        "load": _section(_saturation),
+        "queues": _section(queues),
+        "caches": _section(caches),
+        "indexes": _section(indexes),
+        "db": _section(lambda: dict(pool_stats(db.engine), storage_backend=storage.backend)),
+        "worker": process_stats(),
+        "profiler": _section(request_profiler.stats),
+    })
 
 
 # Optional helper endpoints — add right after face_recognize for convenience:
 @app.route("/api/get-attendance", methods=["GET"])
 def api_get_attendance():
-    return jsonify(load_json(ATTENDANCE_FILE, default=[]))
+    """All attendance records, or ?month=YYYY-MM / ?from=YYYY-MM&to=YYYY-MM (only those partitions are read)."""
+    month = request.args.get("month")
+    return jsonify(storage.attendance(start=month or request.args.get("from"), end=month or request.args.get("to")))
 
 @app.route("/api/clear-attendance", methods=["POST"])
 def api_clear_attendance():
-    save_json(ATTENDANCE_FILE, [])
+    storage.clear_attendance()
+    marked_cache.clear()
     return jsonify({"ok": True})
 
+@app.route("/blobs/<digest>.<ext>", methods=["GET"])
+def blob_file(digest, ext):
+    """
+    Content-addressed upload: the URL names the bytes, so it can be cached
+    forever (immutable, ETag = digest, conditional requests answer 304).
+    """
+    found = blob_store.lookup(digest) if is_digest(digest) else None
+    if found is None:
+        abort(404)
+    path, _ext = found
+    resp = send_file(path, etag=digest, conditional=True, max_age=365 * 24 * 3600)
+    resp.cache_control.public = True
+    resp.cache_control.immutable = True
+    return resp
+
+@app.route("/thumbs/<int:size>/<digest>.jpg", methods=["GET"])
+def thumbnail(size, digest):
+    """
+    Square avatar of a stored face image, rendered on first request and
+    cached on disk (LRU). The URL is fingerprinted by the blob digest, so the
+    response is immutable; ?v= only changes when the rendering does.
+    """
+    thumbnails.configure(
+        sizes=app.config.get("THUMBNAIL_SIZES"),
+        max_bytes=app.config.get("THUMBNAIL_CACHE_MAX_BYTES"),
+        quality=app.config.get("THUMBNAIL_JPEG_QUALITY"),
+    )
+    if size <= 0:
+        abort(404)
+    size = thumbnails.snap(size)
+    found = blob_store.lookup(digest) if is_digest(digest) else None
+    path = thumbnails.get(digest, size, found[0]) if found else None
+    if path is None:
+        abort(404)
+    resp = send_file(path, mimetype="image/jpeg", etag=thumbnails.etag(digest, size),
+                     conditional=True, max_age=365 * 24 * 3600)
+    resp.cache_control.public = True
+    resp.cache_control.immutable = True
+    return resp
+
+@app.route("/api/thumbnails/stats", methods=["GET"])
+def api_thumbnail_stats():
+    """Thumbnail cache hits / renders / evictions and its size on disk."""
+    return jsonify(thumbnails.stats())
+
+@app.route("/captures/<path:filename>", methods=["GET"])
+def capture_image(filename):
+    """A capture image, whether still in static/uploads/captures or packed into its monthly archive bundle."""
+    data = open_capture(filename, CAPTURE_DIR)
+    if data is None:
+        abort(404)
+    mimetype = "image/png" if filename.lower().endswith(".png") else "image/jpeg"
+    return send_file(io.BytesIO(data), mimetype=mimetype, max_age=86400)
+
 
 # -------------- Report generation --------------
 @app.route("/report/<roll_no>", methods=["GET"])
@@ -418,39 +831,19 @@ def generate_report(roll_no):
     Renders report_template.html for a given roll_no.
     If query param ?pdf=1 is present and pdfkit is installed + wkhtmltopdf available, returns PDF.
     """
-    # load semester results wrapper
-    raw = load_json(SEMESTER_RESULTS_FILE, default=None)
-    records = []
-    meta = {}
-    if raw is None:
+    # precomputed analytics snapshot for the current published version
+    analytics = results_store.analytics()
+    if analytics is None:
         return "No semester results available on server. Upload via /api/publish-semester-results or use admin upload.", 404
-    if isinstance(raw, dict) and raw.get("records"):
-        records = raw["records"]
-        meta = raw.get("_meta", {})
-    elif isinstance(raw, list):
-        records = raw
-    else:
-        return "Unexpected data format in semester results file", 500
-
-    # find the student
-    student = None
-    for r in records:
-        # match by roll_no (string)
-        if str(r.get("roll_no")) == str(roll_no) or str(r.get("student_id")) == str(roll_no):
-            student = r
-            break
+    meta = analytics.meta
+
+    # find the student (roll_no or student_id)
+    student = analytics.record(roll_no)
     if not student:
         return f"No results found for roll no {roll_no}", 404
-
-    total_marks = 0
-    gpa_sum = 0
-    gpa_count = 0
-    for s in student.get("semesters", []):
-        if isinstance(s.get("marks"), (int, float)):
-            total_marks += s["marks"]
-        if isinstance(s.get("gpa"), (int, float)):
-            gpa_sum += s["gpa"]; gpa_count += 1
-    avg_gpa = round(gpa_sum / gpa_count, 2) if gpa_count else None
+    stats = analytics.student(roll_no)
+    total_marks = stats["total_marks"]
+    avg_gpa = stats["cgpa"]
 
     context = {
         "student": student,
@@ -458,6 +851,7 @@ def generate_report(roll_no):
         "prepared_by": meta.get("lastSavedBy", {"name": "System"}).get("name", "System"),
         "total_marks": total_marks if total_marks else "-",
         "avg_gpa": avg_gpa if avg_gpa is not None else "-",
+        "stats": stats,
         "remarks": meta.get("remarks", "")
     }
 
@@ -473,14 +867,14 @@ def generate_report(roll_no):
                              as_attachment=True, download_name=f"report_{roll_no}.pdf")
         except Exception as e:
             # fallback to HTML if PDF generation failed
-            print("PDF generation failed:", e)
+            log.warning("PDF generation failed: %s", e, extra={"roll_no": roll_no})
             return render_template("report_template.html", **context)
     return render_template("report_template.html", **context)
 
 # -------------- Simple downloads / admin helpers --------------
 @app.route("/download/sessional_marks")
 def download_sessional_marks():
-    obj = load_json(SESSIONAL_MARKS_FILE, default=None)
+    obj = storage.sessional_marks(default=None)
     if not obj:
         return "No sessional marks stored", 404
     return jsonify(obj)
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+bench_close_session.py - set-based close-session reconciliation vs a per-student loop.
+
+Usage:
+  python benchmarks/bench_close_session.py
+  python benchmarks/bench_close_session.py --sections 300 600 900 --present 0.8 --late 0.1
+
+Each run builds a throwaway SQLite database (in a temp dir) holding one
+section of N students, recognizes a fraction of them in a class session and
+closes it. "set-based" is services.reconcile.close_session (one roster query,
+set difference, one executemany INSERT, one commit). "per-student" is the
+straightforward ORM loop: look every roster student up, add one Attendance row
+at a time and commit each.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask  # noqa: E402
+from sqlalchemy import func, select  # noqa: E402
+
+from database.models import Attendance, Student, db  # noqa: E402
+from recognition.sessions import ClassSession  # noqa: E402
+from services import reconcile, roster  # noqa: E402
+
+
+def make_app(path):
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///" + path
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    db.init_app(app)
+    return app
+
+
+def seed(n, present, late, seed=0):
+    rng = random.Random(seed)
+    db.session.execute(db.insert(Student), [
+        {"student_id": f"STD-{i:05d}", "name": f"Student {i}", "class_name": "CS-B"} for i in range(n)
+    ] + [
+        {"student_id": f"OTH-{i:05d}", "name": f"Other {i}", "class_name": "ME-A"} for i in range(n)
+    ])
+    db.session.commit()
+    started = datetime(2026, 1, 5, 9, 0, 0)
+    cs = ClassSession("CS-B")
+    cs.started_at = started.isoformat()
+    for i in range(n):
+        r = rng.random()
+        if r < present:
+            cs.note_recognized(f"STD-{i:05d}", (started + timedelta(minutes=rng.uniform(0, 9))).isoformat())
+        elif r < present + late:
+            cs.note_recognized(f"STD-{i:05d}", (started + timedelta(minutes=rng.uniform(11, 40))).isoformat())
+    return cs
+
+
+def per_student(cs, late_after_minutes=10):
+    started = datetime.fromisoformat(cs.started_at)
+    cutoff = started + timedelta(minutes=late_after_minutes)
+    students = Student.query.all()
+    for s in students:
+        if (s.class_name or "").replace("-", "").upper() != "CSB":
+            continue
+        ts = cs.recognized.get(s.student_id)
+        if ts is None:
+            status, ts = "absent", cs.started_at
+        else:
+            status = "late" if datetime.fromisoformat(ts) > cutoff else "present"
+        db.session.add(Attendance(student_id=s.student_id, timestamp=ts, status=status, session_id=cs.id))
+        db.session.commit()
+
+
+def run(n, present, late):
+    out = {}
+    for name in ("set-based", "per-student"):
+        with tempfile.TemporaryDirectory() as tmp:
+            app = make_app(os.path.join(tmp, "bench.sqlite3"))
+            with app.app_context():
+                db.create_all()
+                cs = seed(n, present, late)
+                roster._seeded = True  # tables were filled directly; skip the JSON seed
+                t0 = time.perf_counter()
+                if name == "set-based":
+                    reconcile.close_session(cs)
+                else:
+                    per_student(cs)
+                out[name] = (time.perf_counter() - t0) * 1000.0
+                rows = db.session.execute(
+                    select(Attendance.status, func.count()).group_by(Attendance.status)).all()
+                out[name + " rows"] = dict(rows)
+                db.session.remove()
+                db.engine.dispose()
+    return out
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    p.add_argument("--sections", type=int, nargs="+", default=[300, 600, 900])
+    p.add_argument("--present", type=float, default=0.75)
+    p.add_argument("--late", type=float, default=0.1)
+    args = p.parse_args()
+
+    print(f"{'students':>9} {'set-based ms':>13} {'per-student ms':>15} {'speedup':>8}  register")
+    for n in args.sections:
+        r = run(n, args.present, args.late)
+        assert r["set-based rows"] == r["per-student rows"], r
+        print(f"{n:>9} {r['set-based']:>13.1f} {r['per-student']:>15.1f} {r['per-student'] / r['set-based']:>7.1f}x  "
+              f"{r['set-based rows']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+bench_detection.py - single-stage vs two-stage face detection on stored uploads.
+
+Usage:
+  python benchmarks/bench_detection.py
+  python benchmarks/bench_detection.py --dir static/uploads --max-side 480 --model hog --repeat 5
+  python benchmarks/bench_detection.py --reencode jpeg
+
+Single-stage decodes every image at full resolution and runs the detector on
+it. Two-stage is recognition.detector.detect_and_embed (downscaled detection,
+full-res decode + crop only when a face was found). Without face_recognition
+installed only the decode stages are timed.
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from recognition.detector import detect_and_embed, face_recognition, Image  # noqa: E402
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def find_images(root):
+    for dirpath, _dirs, files in os.walk(root):
+        for f in sorted(files):
+            if f.rsplit(".", 1)[-1].lower() in ("jpg", "jpeg", "png"):
+                yield os.path.join(dirpath, f)
+
+
+def single_stage(data, model):
+    timings = {}
+    t0 = time.perf_counter()
+    import numpy as np
+    rgb = np.asarray(Image.open(io.BytesIO(data)).convert("RGB"))
+    timings["decode_full"] = (time.perf_counter() - t0) * 1000.0
+    if face_recognition is not None:
+        t0 = time.perf_counter()
+        boxes = face_recognition.face_locations(rgb, model=model)
+        timings["detect"] = (time.perf_counter() - t0) * 1000.0
+        t0 = time.perf_counter()
+        face_recognition.face_encodings(rgb, known_face_locations=boxes)
+        timings["embed"] = (time.perf_counter() - t0) * 1000.0
+    return timings
+
+
+def add(acc, timings):
+    for k, v in timings.items():
+        acc[k] = acc.get(k, 0.0) + v
+
+
+def fmt(acc, n):
+    total = sum(acc.values())
+    parts = ", ".join(f"{k} {v / n:.1f}" for k, v in acc.items())
+    return f"{total / n:8.1f} ms/image  ({parts})"
+
+
+def main():
+    p = argparse.ArgumentParser(description="Benchmark the two-stage face detector")
+    p.add_argument("--dir", default=os.path.join(BASE_DIR, "static", "uploads"))
+    p.add_argument("--model", default="hog", choices=["hog", "cnn"])
+    p.add_argument("--max-side", type=int, default=480)
+    p.add_argument("--repeat", type=int, default=3)
+    p.add_argument("--reencode", choices=["png", "jpeg"],
+                   help="re-encode each image at 1920x1080 (camera.html sends PNG frames)")
+    args = p.parse_args()
+
+    if Image is None:
+        sys.exit("Pillow is required")
+    images = []
+    for path in find_images(args.dir):
+        with open(path, "rb") as fh:
+            data = fh.read()
+        if args.reencode:
+            buf = io.BytesIO()
+            Image.open(io.BytesIO(data)).convert("RGB").resize((1920, 1080)).save(buf, args.reencode.upper())
+            data = buf.getvalue()
+        images.append((path, data))
+    if not images:
+        sys.exit(f"no images under {args.dir}")
+    print(f"{len(images)} images, model={args.model}, max_side={args.max_side}"
+          + ("" if face_recognition is not None else " (face_recognition not installed: decode only)"))
+
+    one, two = {}, {}
+    n = 0
+    for _ in range(args.repeat):
+        for _path, data in images:
+            add(one, single_stage(data, args.model))
+            add(two, detect_and_embed(data, model=args.model, max_side=args.max_side)[2])
+            n += 1
+    print("single-stage:", fmt(one, n))
+    print("two-stage   :", fmt(two, n))
+
+
+if __name__ == "__main__":
+    main()
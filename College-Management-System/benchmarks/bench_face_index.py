@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+bench_face_index.py - recall/latency of the IVF face index against exact search.
+
+Usage:
+  python benchmarks/bench_face_index.py --students 50000 --queries 500
+  python benchmarks/bench_face_index.py --nprobe 4 8 16
+
+Embeddings are synthetic: unit 128-d vectors with a few noisy photos per
+student, queried with a fresh noisy capture of a random student.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from recognition.ann import IVFIndex  # noqa: E402
+from recognition.index import FaceIndex  # noqa: E402
+
+
+def synth(students, photos, dim, noise, seed=0):
+    rng = np.random.default_rng(seed)
+    base = rng.normal(size=(students, dim)).astype(np.float32)
+    base /= np.linalg.norm(base, axis=1, keepdims=True)
+    vecs = np.repeat(base, photos, axis=0) + rng.normal(scale=noise, size=(students * photos, dim)).astype(np.float32)
+    ids = np.repeat(np.arange(students), photos)
+    return base, vecs, ids
+
+
+def timed_search(index, queries):
+    out = []
+    t0 = time.perf_counter()
+    for q in queries:
+        hits = index.search(q, k=1)
+        out.append(hits[0][0] if hits else None)
+    return out, (time.perf_counter() - t0) / len(queries) * 1000.0
+
+
+def main():
+    p = argparse.ArgumentParser(description="Benchmark exact vs IVF face index")
+    p.add_argument("--students", type=int, default=20000)
+    p.add_argument("--photos", type=int, default=2, help="enrolled photos per student")
+    p.add_argument("--queries", type=int, default=300)
+    p.add_argument("--dim", type=int, default=128)
+    p.add_argument("--noise", type=float, default=0.03)
+    p.add_argument("--nlist", type=int, default=0)
+    p.add_argument("--nprobe", type=int, nargs="+", default=[4, 8, 16])
+    args = p.parse_args()
+
+    base, vecs, ids = synth(args.students, args.photos, args.dim, args.noise)
+    rng = np.random.default_rng(1)
+    who = rng.integers(0, args.students, size=args.queries)
+    queries = base[who] + rng.normal(scale=args.noise, size=(args.queries, args.dim)).astype(np.float32)
+
+    exact = FaceIndex(dim=args.dim)
+    for sid, v in zip(ids, vecs):
+        exact.add(int(sid), v)
+    truth, exact_ms = timed_search(exact, queries)
+    print(f"exact       : {len(exact)} embeddings, {exact_ms:.3f} ms/query")
+
+    for nprobe in args.nprobe:
+        ivf = IVFIndex(dim=args.dim, nlist=args.nlist, nprobe=nprobe)
+        t0 = time.perf_counter()
+        for sid, v in zip(ids, vecs):
+            ivf.add(int(sid), v)
+        build_s = time.perf_counter() - t0
+        got, ivf_ms = timed_search(ivf, queries)
+        recall = sum(a == b for a, b in zip(got, truth)) / len(truth)
+        st = ivf.stats()
+        print(f"ivf nprobe={nprobe:<3}: nlist={st['nlist']}, build {build_s:.2f}s, "
+              f"{ivf_ms:.3f} ms/query ({exact_ms / ivf_ms:.1f}x), recall@1={recall:.3f}")
+
+    # incremental delete/insert on the last IVF index
+    t0 = time.perf_counter()
+    for sid in range(0, args.students, max(1, args.students // 50)):
+        ivf.remove(sid)
+    t1 = time.perf_counter()
+    for sid in range(0, args.students, max(1, args.students // 50)):
+        ivf.add(sid, base[sid])
+    t2 = time.perf_counter()
+    print(f"incremental : 50 deletes {(t1 - t0) * 1000:.1f} ms, 50 inserts {(t2 - t1) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
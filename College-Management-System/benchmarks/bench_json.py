@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+bench_json.py - JSON encode/decode/response cost: stdlib (indented / compact) vs orjson.
+
+Usage:
+  python benchmarks/bench_json.py
+  python benchmarks/bench_json.py --students 1000 5000 20000 --repeat 5
+
+For each size a synthetic semester_results document (students x semesters x
+subjects, the shape /api/get-semester-results returns) and an attendance list
+of the same order of magnitude are built, then timed through:
+
+  dumps     encode to bytes
+  loads     decode those bytes
+  jsonify   a full Flask response for the document (what the API pays per request)
+
+"stdlib indent" is what the app did before (json.dump(..., indent=2) for
+files, Flask's default provider for responses), "stdlib compact" is
+services.serialization on the standard library, "orjson" the same module on
+orjson (skipped when it is not installed). Sizes are the encoded byte counts.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask, jsonify  # noqa: E402
+from flask.json.provider import DefaultJSONProvider  # noqa: E402
+
+from services import serialization  # noqa: E402
+
+SUBJECTS = ["Mathematics", "Physics", "Chemistry", "Programming", "Electronics", "Mechanics"]
+
+
+def make_results(n, semesters=6, seed=0):
+    rng = random.Random(seed)
+    students = []
+    for i in range(n):
+        sems = []
+        for s in range(1, semesters + 1):
+            marks = {sub: rng.randint(35, 100) for sub in SUBJECTS}
+            sems.append({"sem": s, "year": 2020 + (s + 1) // 2, "marks": marks,
+                         "gpa": round(sum(marks.values()) / len(marks) / 10, 2)})
+        students.append({"student_id": f"STD-{i:06d}", "roll_no": f"22EB{i:06d}", "name": f"Student {i}",
+                         "class": f"CS-{'ABCD'[i % 4]}", "semesters": sems})
+    return {"students": students, "_meta": {"version": 1, "saved_at": "2026-01-05T09:00:00"}}
+
+
+def make_attendance(n, seed=0):
+    rng = random.Random(seed)
+    return [{"student_id": f"STD-{rng.randrange(n):06d}", "name": f"Student {i}",
+             "timestamp": f"2026-01-{1 + i % 28:02d}T09:{i % 60:02d}:00", "ts_epoch": 1767600000 + i * 60,
+             "status": rng.choice(("present", "present", "present", "late", "absent"))}
+            for i in range(n * 5)]
+
+
+def best(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t0) * 1000.0)
+    return min(times)
+
+
+def variants():
+    out = [("stdlib indent", "json", True), ("stdlib compact", "json", False)]
+    if serialization.orjson is not None:
+        out.append(("orjson", "orjson", False))
+    return out
+
+
+def run(doc, repeat):
+    rows = []
+    for name, backend, pretty in variants():
+        serialization.use_backend(backend)
+        app = Flask(__name__)
+        if pretty:
+            app.json = DefaultJSONProvider(app)
+            app.json.compact = False
+            enc = lambda: json.dumps(doc, ensure_ascii=False, indent=2).encode("utf-8")  # noqa: E731
+        else:
+            app.json = serialization.FastJSONProvider(app)
+            enc = lambda: serialization.dumps(doc)  # noqa: E731
+        data = enc()
+        dec = (lambda: json.loads(data)) if pretty else (lambda: serialization.loads(data))  # noqa: E731
+
+        def respond():
+            with app.test_request_context("/"):
+                return jsonify(doc).get_data()
+
+        assert json.loads(respond()) == json.loads(data)
+        rows.append((name, len(data), best(enc, repeat), best(dec, repeat), best(respond, repeat)))
+    serialization.use_backend("orjson" if serialization.orjson is not None else "json")
+    return rows
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    p.add_argument("--students", type=int, nargs="+", default=[1000, 5000, 20000])
+    p.add_argument("--repeat", type=int, default=5)
+    args = p.parse_args()
+    if serialization.orjson is None:
+        print("orjson is not installed; comparing the stdlib variants only (pip install orjson)\n")
+
+    print(f"{'document':<22} {'variant':<15} {'bytes':>11} {'dumps ms':>9} {'loads ms':>9} {'jsonify ms':>11}")
+    for n in args.students:
+        for label, doc in ((f"results x{n}", make_results(n)), (f"attendance x{n * 5}", make_attendance(n))):
+            rows = run(doc, args.repeat)
+            base = rows[0]
+            for name, size, d, l, j in rows:
+                print(f"{label:<22} {name:<15} {size:>11,} {d:>9.1f} {l:>9.1f} {j:>11.1f}"
+                      + (f"   ({base[4] / j:.1f}x)" if name != base[0] else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -33,6 +33,10 @@ class BaseConfig:
     TEACHER_DB = os.path.join(DATA_DIR, "teachers.json")
     SESSIONAL_MARKS_DB = os.path.join(DATA_DIR, "sessional_marks.json")
     SEMESTER_RESULTS_DB = os.path.join(DATA_DIR, "semester_results.json")
+    RESULTS_JOURNAL_COMPACT_EVERY = 200  # delta updates journaled before semester_results.json is rewritten
+    INGEST_CHUNK_SIZE = 64 * 1024  # bytes read per step when streaming large JSON uploads
+    INGEST_MAX_CONTENT_LENGTH = 1024 * 1024 * 1024  # upload limit for ?stream=1 uploads (1 GB)
+    INGEST_MAX_ELEMENT_SIZE = 16 * 1024 * 1024  # characters one array element of a ?stream=1 upload may take
 
     # -----------------------------
     # Database (SQLite by default)
@@ -53,8 +57,53 @@ class BaseConfig:
     # Face Recognition Settings
     # -----------------------------
     FACE_DETECTION_MODEL = "hog"  # options: 'hog' or 'cnn'
+    FACE_DETECT_MAX_SIDE = 480    # detection runs on a copy downscaled to this (crops use full res)
     FACE_MATCH_THRESHOLD = 0.45   # lower = stricter (0.35–0.6 recommended)
     EMBEDDINGS_MODEL = "facenet"  # or 'dlib', 'torch', your custom model
+    FACE_INDEX_BACKEND = "exact"  # 'exact' (brute force) or 'ivf' (approximate, k-means cells)
+    FACE_IVF_NLIST = 0            # k-means cells; 0 = about sqrt(enrolled embeddings)
+    FACE_IVF_NPROBE = 8           # cells scanned per query (higher = better recall, slower)
+
+    # Frame gate: skip camera frames that look the same as the last processed one
+    FRAME_GATE_ENABLED = True
+    FRAME_GATE_HASH_SIZE = 8          # dHash grid (8 -> 64-bit hash)
+    FRAME_GATE_THRESHOLD = 5          # max differing bits still treated as "unchanged"
+    FRAME_GATE_MAX_SKIP_SECONDS = 10  # force a frame through at least this often
+
+    # Attendance de-duplication: a student is recorded once per class session window
+    ATTENDANCE_DEDUP_TTL_SECONDS = 2 * 60 * 60
+    ATTENDANCE_DEDUP_MAX_ENTRIES = 50000
+    ATTENDANCE_LATE_AFTER_MINUTES = 10  # first seen later than this after session start -> "late"
+
+    # Retention (python retention.py, e.g. nightly from cron)
+    CAPTURE_ARCHIVE_AFTER_DAYS = 30         # captures older than this move into monthly zip bundles
+    CAPTURE_ORPHAN_GRACE_DAYS = 7           # captures no attendance record points at are deleted after this
+    CAPTURE_DELETE_AFTER_DAYS = 0           # delete whole bundles this long after their month ends (0 = keep)
+    ATTENDANCE_COMPRESS_AFTER_MONTHS = 2    # gzip attendance partitions older than this many months
+    RETENTION_MAX_FILES_PER_RUN = 5000      # I/O budget per run; the next run continues
+    RETENTION_MAX_BYTES_PER_RUN = 512 * 1024 * 1024
+
+    # Face thumbnails (/thumbs/<size>/<digest>.jpg), rendered on demand and cached on disk
+    THUMBNAIL_SIZES = (48, 96, 192)             # variants that are rendered; other sizes snap up
+    THUMBNAIL_CACHE_MAX_BYTES = 64 * 1024 * 1024  # least recently used thumbnails are evicted past this
+    THUMBNAIL_JPEG_QUALITY = 82
+
+    # Recognition admission control: bounded queue in front of /face/recognize
+    RECOGNITION_MAX_CONCURRENT = 2      # recognitions running at once
+    RECOGNITION_MAX_QUEUE = 8           # frames waiting across all sessions; more -> 503
+    RECOGNITION_MAX_PER_SESSION = 2     # frames one session / camera may have waiting
+    RECOGNITION_MAX_WAIT_SECONDS = 5.0  # a queued frame gives up (503) after this long
+    WAITRESS_THREADS = 12               # run.py --waitress; leaves threads free for other pages
+
+    # Async recognition jobs (/face/recognize/async + /face/jobs/<id>)
+    RECOGNITION_JOB_WORKERS = 1              # background workers draining the job queue
+    RECOGNITION_BATCH_SIZE = 8               # captures matched together in one recognizer call
+    RECOGNITION_BATCH_WAIT_MS = 50           # how long a worker waits for a batch to fill
+    RECOGNITION_JOB_MAX_PENDING = 64         # queued jobs before submit answers 503
+    RECOGNITION_JOB_MAX_WAIT_SECONDS = 25    # cap for ?wait= long-polling
+
+    # Offline ingestion worker (ingest_worker.py / run.py --ingest)
+    INGEST_WORKER_FPS = 2.0  # frames sampled per second of video
 
     # -----------------------------
     # PDF Rendering
@@ -63,10 +112,53 @@ class BaseConfig:
     WKHTMLTOPDF_PATH = os.environ.get("WKHTMLTOPDF_PATH", "/usr/bin/wkhtmltopdf")
     PDFKIT_CONFIG = None  # Will be initialized in app.py if available
 
+    # -----------------------------
+    # Request profiling (services/profiling.py, admin view at /admin/profiles)
+    # -----------------------------
+    PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0"))  # fraction of requests profiled (0 = only on demand)
+    PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN", "")  # X-Profile: <token> profiles a request without an admin session
+    PROFILE_KEEP = 200                                   # newest captures kept in data/profiles/
+
     # -----------------------------
     # Logging
     # -----------------------------
-    LOG_LEVEL = "DEBUG"
+    LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+    LOG_FORMAT = os.environ.get("LOG_FORMAT", "json")  # json lines, or "text" for reading in a terminal
+    LOG_QUEUE_SIZE = 10000           # records waiting for the writer thread; more are dropped, never blocking
+    LOG_REPEAT_WINDOW_SECONDS = 60   # the same message is let through LOG_REPEAT_BURST times per window
+    LOG_REPEAT_BURST = 5             # (0 disables repeat suppression)
+    LOG_REQUESTS = True              # one access record per request (status, duration_ms, request_id)
+
+    # -----------------------------
+    # Bulk enrollment (roster CSV + photo ZIP: POST /admin/enroll/bulk, enroll_bulk.py)
+    # -----------------------------
+    BULK_ENROLL_WORKERS = 0                      # photo worker processes; 0 = one per core, at most 8
+    BULK_ENROLL_BATCH_SIZE = 200                 # rows committed per transaction / students.json write
+    BULK_ENROLL_PHOTO_MAX_SIDE = 800             # photos are stored as JPEG with at most this longest side
+    BULK_ENROLL_JPEG_QUALITY = 90
+    BULK_ENROLL_MAX_PHOTO_BYTES = 10 * 1024 * 1024        # larger archive members fail their row
+    BULK_ENROLL_MAX_CONTENT_LENGTH = 2 * 1024 * 1024 * 1024  # upload limit for the endpoint
+    BULK_ENROLL_START_METHOD = ""                # "" = fork where available (workers skip re-importing the app), else spawn
+
+    # -----------------------------
+    # JSON
+    # -----------------------------
+    # data/*.json are written compact; set to True for indented files you want to read or diff by hand.
+    # API responses are compact too, except in debug mode or with ?pretty=1.
+    JSON_PRETTY_FILES = os.environ.get("JSON_PRETTY_FILES", "0") == "1"
+
+    # -----------------------------
+    # Health / readiness (/healthz, /readyz, /api/stats)
+    # -----------------------------
+    READINESS_CACHE_SECONDS = 2.0         # /readyz re-checks the database at most this often
+    READYZ_FAIL_WHEN_SATURATED = False    # also 503 while the recognition queues are full
+
+    # -----------------------------
+    # Storage backend (services/storage.py)
+    # -----------------------------
+    # json = data/*.json only; dual = write both, read each store from its table once
+    # `python migrate_json.py` has imported it; sql = tables only. Roll back by going to json.
+    STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "json")
 
     # -----------------------------
     # Teacher Upload Protection
@@ -77,6 +169,7 @@ class BaseConfig:
 class DevelopmentConfig(BaseConfig):
     DEBUG = True
     ENV = "development"
+    LOG_LEVEL = os.environ.get("LOG_LEVEL", "DEBUG")
     FACE_MATCH_THRESHOLD = 0.50  # more relaxed during testing
 
 
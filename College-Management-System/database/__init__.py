@@ -6,8 +6,11 @@ This file allows `from database import db` or `from database.models import Stude
 """
 
 from .models import db, create_all_if_needed
+from .migrations import backfill_epochs, upgrade_schema
 
 __all__ = [
+    "backfill_epochs",
     "db",
     "create_all_if_needed",
+    "upgrade_schema",
 ]
@@ -0,0 +1,116 @@
+# database/migrations.py
+
+"""
+Minimal in-place schema upgrades for existing SQLite databases.
+
+db.create_all() only creates missing tables; it never touches tables that
+already exist (e.g. the committed instance/database.sqlite3). upgrade_schema()
+adds any model columns a table is missing and creates the indexes the models
+declare, so new columns can be introduced without dropping data.
+backfill_epochs() then fills derived integer-epoch columns for old rows.
+"""
+
+import logging
+
+from sqlalchemy import UniqueConstraint, bindparam, inspect, select, text, update
+
+log = logging.getLogger(__name__)
+
+
+def _default_sql(column):
+    default = column.default
+    if default is None or not getattr(default, "is_scalar", False):
+        return ""
+    value = default.arg
+    if isinstance(value, bool):
+        return f" DEFAULT {int(value)}"
+    if isinstance(value, (int, float)):
+        return f" DEFAULT {value}"
+    return " DEFAULT '" + str(value).replace("'", "''") + "'"
+
+
+def upgrade_schema(db):
+    """
+    Call inside an app context after db.create_all().
+    Returns a list of the statements that were executed.
+    """
+    engine = db.engine
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    executed = []
+    with engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            have = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in have:
+                    continue
+                col_type = column.type.compile(dialect=engine.dialect)
+                # ADD COLUMN cannot carry NOT NULL without a default; keep it nullable
+                stmt = f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {col_type}{_default_sql(column)}'
+                conn.execute(text(stmt))
+                executed.append(stmt)
+            unique = {tuple(u["column_names"]) for u in inspector.get_unique_constraints(table.name)}
+            unique |= {tuple(i["column_names"]) for i in inspector.get_indexes(table.name) if i.get("unique")}
+            for constraint in table.constraints:
+                cols = getattr(constraint, "columns", None)
+                if not isinstance(constraint, UniqueConstraint) or not constraint.name or not cols:
+                    continue
+                if tuple(c.name for c in cols) in unique:
+                    continue
+                names = ", ".join(f'"{c.name}"' for c in cols)
+                stmt = f'CREATE UNIQUE INDEX IF NOT EXISTS "{constraint.name}" ON "{table.name}" ({names})'
+                try:
+                    conn.execute(text(stmt))
+                    executed.append(stmt)
+                except Exception as e:
+                    log.warning("could not create unique index %s: %s", constraint.name, e)
+            have_indexes = {i["name"] for i in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in have_indexes:
+                    index.create(conn, checkfirst=True)
+                    executed.append(f"CREATE INDEX {index.name}")
+    return executed
+
+
+# (model name, ISO string column, integer epoch column)
+EPOCH_COLUMNS = (
+    ("Attendance", "timestamp", "ts_epoch"),
+    ("Mark", "updated_at", "updated_epoch"),
+)
+
+
+def backfill_epochs(db, batch_size=5000):
+    """
+    Fill integer epoch columns that are still NULL from their ISO string
+    column, in batches (one executemany UPDATE per batch). Rows whose
+    timestamp cannot be parsed are left NULL. Returns {table: rows filled}.
+    """
+    from .models import epoch_of
+
+    models = {m.class_.__name__: m.class_ for m in db.Model.registry.mappers}
+    filled = {}
+    for model_name, iso_col, epoch_col in EPOCH_COLUMNS:
+        model = models.get(model_name)
+        if model is None:
+            continue
+        table = model.__table__
+        iso, epoch, pk = table.c[iso_col], table.c[epoch_col], table.c["id"]
+        stmt = update(table).where(pk == bindparam("_id")).values({epoch_col: bindparam("_epoch")})
+        done, last_id = 0, 0
+        while True:
+            rows = db.session.execute(
+                select(pk, iso).where(epoch.is_(None), iso.is_not(None), pk > last_id)
+                .order_by(pk).limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            params = [{"_id": rid, "_epoch": e} for rid, e in ((r[0], epoch_of(r[1])) for r in rows) if e is not None]
+            if params:
+                db.session.execute(stmt, params)
+                done += len(params)
+            db.session.commit()
+        filled[table.name] = done
+    return filled
@@ -1,4 +1,5 @@
 # database/models.py
+import calendar
 from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
 
@@ -9,13 +10,39 @@ def now_iso():
     return datetime.utcnow().isoformat()
 
 
+def epoch_of(value):
+    """
+    Integer seconds since the epoch (UTC) for an ISO timestamp, datetime or
+    number; None if it cannot be read. Naive values are UTC, like now_iso().
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return int(value)
+    if not isinstance(value, datetime):
+        try:
+            value = datetime.fromisoformat(str(value).strip().replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if value.tzinfo is not None:
+        return int(value.timestamp())
+    return calendar.timegm(value.timetuple())
+
+
+def _epoch_from(column):
+    """Column default: the epoch of `column` in the same INSERT (works for executemany too)."""
+    def default(context):
+        return epoch_of(context.get_current_parameters().get(column))
+    return default
+
+
 class Student(db.Model):
     __tablename__ = "students"
 
     id = db.Column(db.Integer, primary_key=True)
     student_id = db.Column(db.String(120), unique=True, nullable=False, index=True)  # e.g. STD-2025-01
-    name = db.Column(db.String(255), nullable=False)
-    class_name = db.Column(db.String(64), nullable=True)   # called `class` in UI, but `class` is reserved
+    name = db.Column(db.String(255), nullable=False, index=True)
+    class_name = db.Column(db.String(64), nullable=True, index=True)   # called `class` in UI, but `class` is reserved
     roll_no = db.Column(db.String(64), nullable=True, index=True)
     face_image = db.Column(db.String(1024), nullable=True)  # path to stored image
     enrolled_at = db.Column(db.String(64), default=now_iso)
@@ -52,8 +79,8 @@ class Teacher(db.Model):
 
     id = db.Column(db.Integer, primary_key=True)
     teacher_id = db.Column(db.String(120), unique=True, nullable=False, index=True)
-    name = db.Column(db.String(255), nullable=False)
-    department = db.Column(db.String(128), nullable=True)
+    name = db.Column(db.String(255), nullable=False, index=True)
+    department = db.Column(db.String(128), nullable=True, index=True)
     assigned_classes = db.Column(db.String(255), nullable=True)  # comma-separated e.g. "10A,11B"
     face_image = db.Column(db.String(1024), nullable=True)
     enrolled_at = db.Column(db.String(64), default=now_iso)
@@ -81,6 +108,14 @@ class Attendance(db.Model):
     timestamp = db.Column(db.String(64), default=now_iso, index=True)
     status = db.Column(db.String(64), default="present")  # present / absent / late / excused
     extra = db.Column(db.String(1024), nullable=True)     # optional JSON or note
+    session_id = db.Column(db.String(64), nullable=True, index=True)  # class session that wrote the row (close-session reconciliation)
+    ts_epoch = db.Column(db.Integer, nullable=True, default=_epoch_from("timestamp"))  # `timestamp` as UTC epoch seconds
+    source = db.Column(db.String(16), nullable=True)  # "capture" for recognized captures (every STORAGE_BACKEND), NULL for registers
+
+    __table_args__ = (
+        # range scans and hour/day/week buckets are answered from this index alone
+        db.Index("ix_attendance_epoch_status", "ts_epoch", "status"),
+    )
 
     def __repr__(self):
         return f"<Attendance {self.student_id} {self.timestamp} {self.status}>"
@@ -92,6 +127,9 @@ class Attendance(db.Model):
             "timestamp": self.timestamp,
             "status": self.status,
             "extra": self.extra,
+            "session_id": self.session_id,
+            "ts_epoch": self.ts_epoch,
+            "source": self.source,
         }
 
 
@@ -100,22 +138,105 @@ class Mark(db.Model):
 
     id = db.Column(db.Integer, primary_key=True)
     student_id = db.Column(db.String(120), db.ForeignKey("students.student_id"), nullable=False, index=True)
-    semester = db.Column(db.Integer, nullable=False, index=True)  # which semester this mark belongs to
+    semester = db.Column(db.Integer, nullable=False, index=True)  # which semester this mark belongs to (0 = sessional)
+    name = db.Column(db.String(255), nullable=True)
+    class_name = db.Column(db.String(64), nullable=True)
+    roll_no = db.Column(db.String(64), nullable=True)
     marks = db.Column(db.Float, nullable=True)
     gpa = db.Column(db.Float, nullable=True)
     updated_at = db.Column(db.String(64), default=now_iso)
+    updated_by = db.Column(db.String(120), nullable=True)
+    updated_epoch = db.Column(db.Integer, nullable=True, index=True, default=_epoch_from("updated_at"))  # `updated_at` as UTC epoch seconds
+
+    # delta sync: `version` is bumped on every write of this row (optimistic concurrency),
+    # `seq` is the global change cursor at the time of the last write, `deleted` a tombstone
+    version = db.Column(db.Integer, nullable=False, default=1)
+    seq = db.Column(db.Integer, nullable=False, default=0, index=True)
+    deleted = db.Column(db.Boolean, nullable=False, default=False)
+
+    __table_args__ = (
+        db.UniqueConstraint("student_id", "semester", name="uq_mark_student_sem"),
+    )
 
     def __repr__(self):
-        return f"<Mark {self.student_id} sem:{self.semester} marks:{self.marks} gpa:{self.gpa}>"
+        return f"<Mark {self.student_id} sem:{self.semester} marks:{self.marks} gpa:{self.gpa} v{self.version}>"
 
     def to_dict(self):
         return {
             "id": self.id,
             "student_id": self.student_id,
             "semester": self.semester,
+            "name": self.name,
+            "class": self.class_name,
+            "roll_no": self.roll_no,
             "marks": self.marks,
             "gpa": self.gpa,
             "updated_at": self.updated_at,
+            "updated_by": self.updated_by,
+            "updated_epoch": self.updated_epoch,
+            "version": self.version,
+            "seq": self.seq,
+            "deleted": bool(self.deleted),
+        }
+
+
+class SyncCounter(db.Model):
+    """Monotonic change counters (one row per synced table), e.g. name="marks"."""
+    __tablename__ = "sync_counters"
+
+    name = db.Column(db.String(64), primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<SyncCounter {self.name}={self.value}>"
+
+
+class StoreMeta(db.Model):
+    """
+    Document-level state of a data store kept in the tables (services/storage.py):
+    the version, last save time / author. Its presence marks a store as migrated.
+    """
+    __tablename__ = "store_meta"
+
+    name = db.Column(db.String(64), primary_key=True)   # students / teachers / sessional_marks / ...
+    version = db.Column(db.Integer, nullable=False, default=0)
+    saved_at = db.Column(db.String(64), nullable=True)
+    saved_by = db.Column(db.String(1024), nullable=True)  # JSON {id, name}
+    migrated_at = db.Column(db.String(64), default=now_iso)
+
+    def __repr__(self):
+        return f"<StoreMeta {self.name} v{self.version}>"
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "version": self.version,
+            "saved_at": self.saved_at,
+            "saved_by": self.saved_by,
+            "migrated_at": self.migrated_at,
+        }
+
+
+class Blob(db.Model):
+    """Reference-counted entry of the content-addressed upload store (services/blobstore.py)."""
+    __tablename__ = "blobs"
+
+    digest = db.Column(db.String(64), primary_key=True)      # sha256 of the file bytes
+    ext = db.Column(db.String(8), nullable=False)            # jpg / png
+    size = db.Column(db.Integer, nullable=False, default=0)
+    refcount = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.String(64), default=now_iso)
+
+    def __repr__(self):
+        return f"<Blob {self.digest[:12]} refs:{self.refcount}>"
+
+    def to_dict(self):
+        return {
+            "digest": self.digest,
+            "ext": self.ext,
+            "size": self.size,
+            "refcount": self.refcount,
+            "created_at": self.created_at,
         }
 
 
@@ -147,6 +268,68 @@ class Semester(db.Model):
         }
 
 
+class ResultRecord(db.Model):
+    """
+    One published semester_results record when results live in the tables
+    (services/storage.py). Keyed like the JSON document (student_id, else
+    roll_no) and independent of enrollment: a result is not a Student.
+    """
+    __tablename__ = "result_records"
+
+    id = db.Column(db.Integer, primary_key=True)   # publish order
+    key = db.Column(db.String(120), unique=True, nullable=False, index=True)
+    student_id = db.Column(db.String(120), nullable=True, index=True)
+    roll_no = db.Column(db.String(64), nullable=True, index=True)
+    name = db.Column(db.String(255), nullable=True)
+    class_name = db.Column(db.String(64), nullable=True)
+    extra = db.Column(db.Text, nullable=True)  # JSON: the record's other top-level fields
+
+    def __repr__(self):
+        return f"<ResultRecord {self.key}>"
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "key": self.key,
+            "student_id": self.student_id,
+            "roll_no": self.roll_no,
+            "name": self.name,
+            "class_name": self.class_name,
+            "extra": self.extra,
+        }
+
+
+class ResultSemester(db.Model):
+    """One semester entry of a ResultRecord."""
+    __tablename__ = "result_semesters"
+
+    id = db.Column(db.Integer, primary_key=True)
+    record_key = db.Column(db.String(120), db.ForeignKey("result_records.key"), nullable=False, index=True)
+    sem_number = db.Column(db.Integer, nullable=False)
+    year = db.Column(db.Integer, nullable=True)
+    marks = db.Column(db.Float, nullable=True)
+    gpa = db.Column(db.Float, nullable=True)
+    extra = db.Column(db.Text, nullable=True)  # JSON: other fields of the entry
+
+    __table_args__ = (
+        db.UniqueConstraint("record_key", "sem_number", name="uq_result_sem"),
+    )
+
+    def __repr__(self):
+        return f"<ResultSemester {self.record_key} sem:{self.sem_number}>"
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "record_key": self.record_key,
+            "sem": self.sem_number,
+            "year": self.year,
+            "marks": self.marks,
+            "gpa": self.gpa,
+            "extra": self.extra,
+        }
+
+
 # Helper to create tables (for quick development)
 def create_all_if_needed(app=None):
     """
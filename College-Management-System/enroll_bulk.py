@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+enroll_bulk.py - enroll a whole roster from a CSV and a ZIP of photos.
+
+Usage:
+  python enroll_bulk.py roster.csv photos.zip                    # students, one worker per core (max 8)
+  python enroll_bulk.py staff.csv staff_photos.zip --kind teacher
+  python enroll_bulk.py roster.csv photos.zip --workers 4 --batch 500
+  python enroll_bulk.py roster.csv photos.zip --dry-run          # check every row and photo, write nothing
+
+The CSV needs an id column (student_id / teacher_id / id) and a name column;
+class / class_section, roll_no, department, assigned_classes and kind are
+picked up when present. A row's photo is the archive member named in its
+`photo` column, or else <id>.jpg / <id>.png anywhere in the archive.
+Photos are normalized (and embedded when face_recognition is installed)
+across a process pool, and each batch is committed in one go
+(services/bulk_enroll.py). Failed rows are listed with their CSV line,
+followed by a throughput summary. --json prints the whole report.
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Enroll students or teachers from a roster CSV and a photo ZIP")
+    p.add_argument("roster", help="roster CSV")
+    p.add_argument("photos", help="ZIP of photos")
+    p.add_argument("--kind", choices=("student", "teacher"), default="student",
+                   help="for rows without a kind column (default student)")
+    p.add_argument("--workers", type=int, default=None, help="photo worker processes (default BULK_ENROLL_WORKERS)")
+    p.add_argument("--batch", type=int, default=None, help="rows per commit (default BULK_ENROLL_BATCH_SIZE)")
+    p.add_argument("--allow-missing-photos", action="store_true", help="enroll rows without a photo instead of failing them")
+    p.add_argument("--dry-run", action="store_true")
+    p.add_argument("--json", action="store_true", help="print the full report as JSON")
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    # imported here rather than at the top: photo workers started with "spawn"
+    # re-import this script, and they need none of the app
+    from app import app
+    from recognition import recognizer
+    from run import configure_app_from_env
+    from services.bulk_enroll import BulkEnrollError, bulk_enroll
+
+    configure_app_from_env()
+    with app.app_context(), open(args.roster, "rb") as roster_file:
+        try:
+            report = bulk_enroll(roster_file, args.photos, kind=args.kind, workers=args.workers,
+                                 batch_size=args.batch, allow_missing_photos=args.allow_missing_photos,
+                                 embed=recognizer.available, dry_run=args.dry_run)
+        except BulkEnrollError as e:
+            print(f"error: {e}", file=sys.stderr)
+            return 2
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for f in report["failures"]:
+            print(f"line {f['line']:>6}  {f['id'] or '-':<16} {f['error']}")
+        print(f"{report['rows']} rows: {report['enrolled']} enrolled, {report['updated']} updated, "
+              f"{report['failed']} failed; {report['photos']} photos ({report['embedded']} embedded) "
+              f"in {report['seconds']}s = {report['rows_per_second']} rows/s with {report['workers']} workers"
+              + (" [dry run]" if args.dry_run else ""))
+    return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
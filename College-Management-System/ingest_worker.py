@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+ingest_worker.py - offline attendance from a video file or camera stream.
+
+Usage:
+  # recorded lecture, 2 frames per second, matched against the CS-B roster first
+  python ingest_worker.py recordings/cs-b-monday.mp4 --fps 2 --class CS-B
+
+  # camera device 0 / an RTSP stream, until interrupted
+  python ingest_worker.py 0 --camera-id room-101
+  python ingest_worker.py rtsp://10.0.0.12/stream --camera-id gate
+
+  # directory of stills or an animated GIF (no OpenCV needed)
+  python ingest_worker.py captures/ --fps 1
+
+  # alongside the web app
+  python run.py --waitress --ingest 0 --ingest rtsp://10.0.0.12/stream
+
+Sampled frames go through the same path as /face/recognize: frame gate,
+recognition (class roster first, then everyone) and the attendance write
+(data/attendance/<YYYY-MM>.jsonl + static/uploads/captures/), in batches of
+RECOGNITION_BATCH_SIZE. A throughput line (frames per second) is printed
+every --report-every seconds and once more at the end.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import app, _recognize_batch  # noqa: E402
+from recognition import class_sessions, frame_gate, roster_for_class  # noqa: E402
+from recognition.video import SourceError, sample_frames  # noqa: E402
+from run import configure_app_from_env  # noqa: E402
+from services import storage  # noqa: E402
+
+log = logging.getLogger(__name__)
+
+
+class Throughput:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.counts = Counter()
+
+    def line(self, sampler):
+        elapsed = max(time.perf_counter() - self.start, 1e-9)
+        c = self.counts
+        return (f"[ingest] {elapsed:7.1f}s  read {sampler.frames_read}  sampled {sampler.frames_sampled}  "
+                f"{sampler.frames_sampled / elapsed:6.2f} fps  ({sampler.frames_read / elapsed:.1f} read fps)  "
+                f"gate-skipped {c['skipped']}  recognized {c['recognized']}  marked {c['marked']}  "
+                f"already {c['already_marked']}  unknown {c['unknown']}  errors {c['error']}")
+
+    def summary(self, sampler):
+        elapsed = max(time.perf_counter() - self.start, 1e-9)
+        out = dict(self.counts)
+        out.update({"seconds": round(elapsed, 3), "frames_read": sampler.frames_read,
+                    "frames_sampled": sampler.frames_sampled,
+                    "fps": round(sampler.frames_sampled / elapsed, 2),
+                    "read_fps": round(sampler.frames_read / elapsed, 2)})
+        return out
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Mark attendance from a video file or camera stream")
+    p.add_argument("source", help="video file, directory of frames, animated image, device index or stream URL")
+    p.add_argument("--fps", type=float, default=None, help="frames sampled per second (default INGEST_WORKER_FPS)")
+    p.add_argument("--camera-id", default=None, help="session key for de-duplication (default: the source)")
+    p.add_argument("--class", dest="class_name", default=None,
+                   help="match against this class roster first (starts a local class session)")
+    p.add_argument("--batch", type=int, default=None, help="frames per recognizer call (default RECOGNITION_BATCH_SIZE)")
+    p.add_argument("--max-frames", type=int, default=None, help="stop after this many sampled frames")
+    p.add_argument("--no-gate", action="store_true", help="process every sampled frame (skip the frame gate)")
+    p.add_argument("--report-every", type=float, default=5.0, help="seconds between throughput lines")
+    p.add_argument("--json", action="store_true", help="print the final summary as JSON")
+    return p.parse_args()
+
+
+def flush(batch, meter):
+    if not batch:
+        return
+    with app.app_context():
+        try:
+            results = _recognize_batch(batch)
+        except Exception:
+            log.exception("recognition failed for a batch of %d frames", len(batch))
+            meter.counts["error"] += len(batch)
+            batch.clear()
+            return
+    for body, code in results:
+        if code >= 400 or (not body.get("ok") and body.get("status") != "unknown"):
+            meter.counts["error"] += 1
+        elif body.get("status") == "unknown":
+            meter.counts["unknown"] += 1
+        else:
+            meter.counts["recognized"] += 1
+            meter.counts["already_marked" if body.get("already_marked") else "marked"] += 1
+    batch.clear()
+
+
+def main():
+    args = parse_args()
+    configure_app_from_env()
+    cfg = app.config
+    fps = args.fps or cfg.get("INGEST_WORKER_FPS", 2.0)
+    batch_size = max(1, args.batch or cfg.get("RECOGNITION_BATCH_SIZE", 8))
+
+    session_key = args.camera_id or f"worker:{args.source}"
+    if args.class_name:
+        with app.app_context():
+            students = storage.profiles("student")
+        session = class_sessions.start(args.class_name, roster=roster_for_class(students, args.class_name))
+        session_key = session.id
+        print(f"[ingest] class session {session.id} for {args.class_name} ({len(session.roster)} students)")
+
+    gate = cfg.get("FRAME_GATE_ENABLED", True) and not args.no_gate
+    frame_gate.configure(
+        threshold=cfg.get("FRAME_GATE_THRESHOLD"),
+        max_skip_seconds=cfg.get("FRAME_GATE_MAX_SKIP_SECONDS"),
+        hash_size=cfg.get("FRAME_GATE_HASH_SIZE"),
+    )
+
+    sampler = sample_frames(args.source, fps=fps, max_frames=args.max_frames)
+    meter = Throughput()
+    batch = []
+    next_report = time.perf_counter() + args.report_every
+    try:
+        for _pos, frame in sampler:
+            if gate:
+                process, _distance = frame_gate.check(session_key, frame)
+                if not process:
+                    meter.counts["skipped"] += 1
+                    continue
+            batch.append((frame, "jpg", session_key))
+            if len(batch) >= batch_size:
+                flush(batch, meter)
+            if time.perf_counter() >= next_report:
+                print(meter.line(sampler), flush=True)
+                next_report += args.report_every
+    except SourceError as e:
+        print(f"[ingest] {e}", file=sys.stderr)
+        return 2
+    except KeyboardInterrupt:
+        pass
+    flush(batch, meter)
+    print(meter.line(sampler), flush=True)
+    if args.json:
+        print(json.dumps(meter.summary(sampler)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
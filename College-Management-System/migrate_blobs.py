@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+migrate_blobs.py - move legacy face images into the content-addressed blob store.
+
+Usage:
+  python migrate_blobs.py --dry-run      # report how many files / bytes would be saved
+  python migrate_blobs.py                # migrate, then recount references and collect garbage
+  python migrate_blobs.py --recount-only # only rebuild Blob.refcount from the profiles
+
+Every face_image in data/students.json and data/teachers.json that still
+points into static/uploads/student_faces or teacher_faces is hashed and
+stored once under static/uploads/blobs/, the profile is rewritten to the blob
+path (plus face_blob / face_url), and the old file is removed (--keep-legacy
+keeps it). Reference counts are then rebuilt from the profiles, and blobs no
+profile references (older than --grace-days) are deleted.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import app, BASE_DIR, DATA_DIR, load_json, save_json  # noqa: E402
+from run import configure_app_from_env  # noqa: E402
+from services import roster  # noqa: E402
+from services.blobstore import blob_store, digest_of_path  # noqa: E402
+
+PROFILE_FILES = (("students.json", "student"), ("teachers.json", "teacher"))
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Move face images into the blob store")
+    p.add_argument("--dry-run", action="store_true")
+    p.add_argument("--keep-legacy", action="store_true", help="do not delete the migrated legacy files")
+    p.add_argument("--recount-only", action="store_true")
+    p.add_argument("--grace-days", type=float, default=1.0, help="unreferenced blobs younger than this are kept")
+    return p.parse_args()
+
+
+def migrate(dry_run=False, keep_legacy=False):
+    report = {"profiles": 0, "missing": 0, "files": 0, "bytes": 0, "stored_files": 0, "stored_bytes": 0}
+    seen_digests, legacy_files = set(), set()
+    for fname, kind in PROFILE_FILES:
+        path = os.path.join(DATA_DIR, fname)
+        profiles = load_json(path, default=[])
+        changed = []
+        for profile in profiles:
+            rel = profile.get("face_image")
+            if not rel or digest_of_path(rel):
+                continue
+            report["profiles"] += 1
+            src = os.path.join(BASE_DIR, str(rel).replace("\\", "/"))
+            if not os.path.exists(src):
+                report["missing"] += 1
+                continue
+            with open(src, "rb") as f:
+                data = f.read()
+            if src not in legacy_files:
+                legacy_files.add(src)
+                report["files"] += 1
+                report["bytes"] += len(data)
+            digest = hashlib.sha256(data).hexdigest()
+            if digest not in seen_digests:
+                seen_digests.add(digest)
+                report["stored_files"] += 1
+                report["stored_bytes"] += len(data)
+            if dry_run:
+                continue
+            blob = blob_store.put(data, src.rsplit(".", 1)[-1])
+            profile["face_image"], profile["face_blob"], profile["face_url"] = blob["path"], blob["digest"], blob["url"]
+            changed.append(profile)
+        if changed:
+            save_json(path, profiles)
+            for profile in changed:
+                (roster.add_student if kind == "student" else roster.add_teacher)(profile)
+    if not dry_run and not keep_legacy:
+        for src in legacy_files:
+            os.remove(src)
+    report["saved_bytes"] = report["bytes"] - report["stored_bytes"]
+    return report
+
+
+def references():
+    refs = Counter()
+    for fname, _kind in PROFILE_FILES:
+        for profile in load_json(os.path.join(DATA_DIR, fname), default=[]):
+            digest = profile.get("face_blob") or digest_of_path(profile.get("face_image"))
+            if digest:
+                refs[digest] += 1
+    return refs
+
+
+def main():
+    args = parse_args()
+    configure_app_from_env()
+    out = {}
+    with app.app_context():
+        if not args.recount_only:
+            out["migrate"] = migrate(dry_run=args.dry_run, keep_legacy=args.keep_legacy)
+        out["recount"] = blob_store.recount(references(), grace_days=args.grace_days, dry_run=args.dry_run)
+    print(json.dumps(out, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
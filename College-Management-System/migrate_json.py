@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+migrate_json.py - load the JSON data stores into the database tables.
+
+Usage:
+  python migrate_json.py --dry-run                 # import in a transaction that is rolled back, print the counts
+  python migrate_json.py                           # import every store (safe to re-run)
+  python migrate_json.py --only students teachers  # just these stores
+  python migrate_json.py --verify                  # compare JSON keys with the tables, change nothing
+
+Stores: students, teachers, sessional_marks, attendance, semester_results.
+Each one is imported in its own transaction (services/json_import.py), with
+batched multi-row inserts and de-duplication by natural key.
+
+Cutover: run this with STORAGE_BACKEND=json (or with the app stopped), check
+with --verify, then start the app with STORAGE_BACKEND=dual. Dual mode
+writes both copies and reads every imported store from its table. Go to
+STORAGE_BACKEND=sql once nothing reads the files any more. Switching back to
+json reads the files again, and in dual mode they were kept up to date.
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import app  # noqa: E402
+from run import configure_app_from_env  # noqa: E402
+from services.json_import import STORES, JsonImporter  # noqa: E402
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Import the JSON stores into the database tables")
+    p.add_argument("--only", nargs="+", choices=STORES, help="stores to import (default all)")
+    p.add_argument("--batch", type=int, default=1000, help="rows per multi-row INSERT (default 1000)")
+    p.add_argument("--dry-run", action="store_true", help="roll every store back after importing it")
+    p.add_argument("--verify", action="store_true", help="only compare the JSON stores with the tables")
+    p.add_argument("--json", action="store_true", help="print the full report as JSON")
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    configure_app_from_env()
+    with app.app_context():
+        importer = JsonImporter(batch_size=args.batch, dry_run=args.dry_run)
+        report = importer.verify() if args.verify else importer.run(args.only)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    elif args.verify:
+        for store, row in report.items():
+            print(f"{store:<18} json {row['json']:>8}  table {row['table']:>8}  missing {row['missing']:>6}  "
+                  f"{'ok' if row['ok'] else 'MISSING ' + ', '.join(row['missing_sample'][:5])}"
+                  f"{'' if row['migrated'] else '  (not migrated)'}")
+    else:
+        for store, row in report.items():
+            details = ", ".join(f"{k} {v}" for k, v in row.items() if k != "seconds")
+            print(f"{store:<18} {details}  ({row['seconds']}s)" + (" [dry run]" if args.dry_run else ""))
+    failed = any("error" in row for row in report.values()) or (args.verify and not all(
+        row["ok"] for row in report.values()))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,41 @@
+# recognition/__init__.py
+
+"""
+Recognition package for the Advanced Face Attendance System.
+Holds the capture pre-filters and matching helpers used by /face/recognize.
+"""
+
+from .frame_gate import FrameGate, frame_gate, dhash
+from .dedup import MarkedCache, marked_cache
+from .index import FaceIndex, normalize_class
+from .ann import IVFIndex, make_index
+from .detector import detect_and_embed
+from .sessions import ClassSession, SessionRegistry, class_sessions
+from .engine import Recognizer, recognizer, roster_for_class
+from .admission import AdmissionController, FairQueue, Saturated, admission
+from .jobs import RecognitionJobs, recognition_jobs
+
+__all__ = [
+    "FrameGate",
+    "frame_gate",
+    "dhash",
+    "MarkedCache",
+    "marked_cache",
+    "FaceIndex",
+    "normalize_class",
+    "IVFIndex",
+    "make_index",
+    "detect_and_embed",
+    "ClassSession",
+    "SessionRegistry",
+    "class_sessions",
+    "Recognizer",
+    "recognizer",
+    "roster_for_class",
+    "AdmissionController",
+    "FairQueue",
+    "Saturated",
+    "admission",
+    "RecognitionJobs",
+    "recognition_jobs",
+]
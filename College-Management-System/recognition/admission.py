@@ -0,0 +1,202 @@
+# recognition/admission.py
+"""
+Admission control for the recognition path.
+
+At most `max_concurrent` recognitions run at once. Further requests wait in
+per-session FIFO queues that are served round-robin, so one busy camera cannot
+starve the others. The number of waiters is bounded (overall and per
+session) and a waiter gives up after `max_wait_seconds`; in both cases the
+caller gets a Saturated error carrying a Retry-After estimate, and answers
+503 straight away instead of tying up a server thread.
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+
+
+class Saturated(Exception):
+    """The recognition queue is full (or the wait timed out)."""
+
+    def __init__(self, retry_after, reason="queue full"):
+        super().__init__(reason)
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class _Waiter:
+    __slots__ = ("event", "granted", "enqueued")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.granted = False
+        self.enqueued = time.monotonic()
+
+
+class FairQueue:
+    """Per-key FIFO queues served round-robin (not thread-safe; callers lock)."""
+
+    def __init__(self):
+        self._queues = OrderedDict()  # key -> deque, rotation order
+
+    def __len__(self):
+        return sum(len(q) for q in self._queues.values())
+
+    def depth(self, key):
+        q = self._queues.get(key)
+        return len(q) if q else 0
+
+    def depths(self):
+        return {k: len(q) for k, q in self._queues.items()}
+
+    def put(self, key, item):
+        self._queues.setdefault(key, deque()).append(item)
+
+    def pop(self):
+        """Next item from the key at the head of the rotation; that key moves to the back."""
+        while self._queues:
+            key, q = next(iter(self._queues.items()))
+            if not q:
+                del self._queues[key]
+                continue
+            item = q.popleft()
+            if q:
+                self._queues.move_to_end(key)
+            else:
+                del self._queues[key]
+            return key, item
+        return None, None
+
+    def remove(self, key, item):
+        q = self._queues.get(key)
+        if q is None:
+            return False
+        try:
+            q.remove(item)
+        except ValueError:
+            return False
+        if not q:
+            del self._queues[key]
+        return True
+
+
+class AdmissionController:
+    """
+    max_concurrent   : recognitions running at once
+    max_queue        : waiters across all sessions
+    max_per_session  : waiters from one session / camera
+    max_wait_seconds : how long a waiter may queue before giving up
+    """
+
+    def __init__(self, max_concurrent=2, max_queue=8, max_per_session=2, max_wait_seconds=5.0, window=512):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_per_session = max_per_session
+        self.max_wait_seconds = max_wait_seconds
+        self._lock = threading.Lock()
+        self._queue = FairQueue()
+        self._running = 0
+        self._waits = deque(maxlen=window)     # queue time of admitted requests (s)
+        self._service = deque(maxlen=window)   # time holding a slot (s)
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    def configure(self, max_concurrent=None, max_queue=None, max_per_session=None, max_wait_seconds=None):
+        with self._lock:
+            if max_concurrent is not None:
+                self.max_concurrent = max(1, int(max_concurrent))
+            if max_queue is not None:
+                self.max_queue = max(0, int(max_queue))
+            if max_per_session is not None:
+                self.max_per_session = max(1, int(max_per_session))
+            if max_wait_seconds is not None:
+                self.max_wait_seconds = float(max_wait_seconds)
+
+    def _retry_after(self):
+        """Seconds until a slot is likely free: queued work / throughput, at least 1."""
+        service = (sum(self._service) / len(self._service)) if self._service else 1.0
+        backlog = len(self._queue) + self._running
+        return max(1, min(60, math.ceil(service * backlog / max(1, self.max_concurrent))))
+
+    def acquire(self, key):
+        """Block until a slot is free; raises Saturated instead of queueing past the limits."""
+        with self._lock:
+            if self._running < self.max_concurrent and not len(self._queue):
+                self._running += 1
+                self.admitted += 1
+                self._waits.append(0.0)
+                return time.monotonic()
+            if len(self._queue) >= self.max_queue or self._queue.depth(key) >= self.max_per_session:
+                self.rejected += 1
+                raise Saturated(self._retry_after())
+            waiter = _Waiter()
+            self._queue.put(key, waiter)
+
+        waiter.event.wait(self.max_wait_seconds)
+        with self._lock:
+            if not waiter.granted:
+                self._queue.remove(key, waiter)
+                self.timed_out += 1
+                raise Saturated(self._retry_after(), reason="timed out waiting for a recognition slot")
+            now = time.monotonic()
+            self.admitted += 1
+            self._waits.append(now - waiter.enqueued)
+            return now
+
+    def release(self, started):
+        """Hand the slot to the next waiter (round-robin across sessions) or free it."""
+        with self._lock:
+            self._service.append(time.monotonic() - started)
+            _, waiter = self._queue.pop()
+            if waiter is not None:
+                waiter.granted = True  # the slot passes over; _running is unchanged
+                waiter.event.set()
+            else:
+                self._running -= 1
+
+    def slot(self, key):
+        """Context manager: `with admission.slot(session_key): ...`"""
+        return _Slot(self, key)
+
+    def stats(self):
+        with self._lock:
+            waits = sorted(self._waits)
+            service = sorted(self._service)
+
+            def pct(values, p):
+                return round(values[min(len(values) - 1, int(p * len(values)))] * 1000.0, 2) if values else None
+
+            return {
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                "max_per_session": self.max_per_session,
+                "running": self._running,
+                "queued": len(self._queue),
+                "queued_by_session": self._queue.depths(),
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+                "queue_ms": {"p50": pct(waits, 0.5), "p95": pct(waits, 0.95), "max": pct(waits, 1.0)},
+                "service_ms": {"p50": pct(service, 0.5), "p95": pct(service, 0.95)},
+            }
+
+
+class _Slot:
+    def __init__(self, controller, key):
+        self.controller = controller
+        self.key = key
+        self.started = None
+
+    def __enter__(self):
+        self.started = self.controller.acquire(self.key)
+        return self
+
+    def __exit__(self, *exc):
+        self.controller.release(self.started)
+        return False
+
+
+# shared controller used by /face/recognize
+admission = AdmissionController()
@@ -0,0 +1,161 @@
+# recognition/ann.py
+"""
+Approximate nearest-neighbour backend for the face index (IVF, pure NumPy).
+
+Embeddings are clustered with k-means into `nlist` cells; a query is compared
+only against the rows of the `nprobe` cells whose centroids are closest.
+Inserts are assigned to their nearest centroid and deletes drop rows from
+their cell (see FaceIndex.remove), so enrollment changes never retrain.
+The quantizer is retrained when the index has doubled since the last training.
+
+Roster-restricted searches (class sessions) stay exact: the subset is small.
+"""
+
+import numpy as np
+
+from .index import FaceIndex
+
+
+def kmeans(x, k, iters=10, seed=0):
+    """Lloyd's k-means. Returns (centroids[k, d], assignment[n])."""
+    rng = np.random.default_rng(seed)
+    n = x.shape[0]
+    k = max(1, min(k, n))
+    centroids = x[rng.choice(n, size=k, replace=False)].copy()
+    assign = np.zeros(n, dtype=np.int32)
+    for _ in range(iters):
+        assign = nearest_centroids(x, centroids, 1)[:, 0]
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, x)
+        counts = np.bincount(assign, minlength=k).astype(np.float32)
+        empty = counts == 0
+        if empty.any():
+            # re-seed empty cells from random points
+            sums[empty] = x[rng.choice(n, size=int(empty.sum()), replace=False)]
+            counts[empty] = 1.0
+        centroids = sums / counts[:, None]
+    return centroids.astype(np.float32), nearest_centroids(x, centroids, 1)[:, 0]
+
+
+def nearest_centroids(x, centroids, nprobe):
+    """Indices of the `nprobe` closest centroids for every row of x."""
+    # |x - c|^2 = |x|^2 - 2 x.c + |c|^2 ; |x|^2 is constant per row
+    d = -2.0 * (x @ centroids.T) + (centroids * centroids).sum(axis=1)[None, :]
+    if nprobe >= centroids.shape[0]:
+        return np.argsort(d, axis=1).astype(np.int32)
+    part = np.argpartition(d, nprobe - 1, axis=1)[:, :nprobe]
+    return part.astype(np.int32)
+
+
+class IVFIndex(FaceIndex):
+    """
+    nlist      : number of k-means cells (0 = about sqrt(n) at training time)
+    nprobe     : cells scanned per query
+    min_train  : below this many embeddings searches are exact and nothing is trained
+    """
+
+    backend = "ivf"
+
+    def __init__(self, dim=128, nlist=0, nprobe=8, min_train=2048):
+        super().__init__(dim=dim)
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.min_train = min_train
+        self._centroids = None
+        self._assign = np.empty(self._buf.shape[0], dtype=np.int32)
+        self._lists = None      # cell -> row array; built lazily after training
+        self._trained_at = 0
+
+    @property
+    def trained(self):
+        return self._centroids is not None
+
+    def train(self):
+        with self._lock:
+            n = self._n
+            if n == 0:
+                return
+            k = self.nlist or max(1, int(np.sqrt(n)))
+            self._centroids, assign = kmeans(self._buf[:n], k)
+            self._assign = np.empty(self._buf.shape[0], dtype=np.int32)
+            self._assign[:n] = assign
+            self._lists = None
+            self._trained_at = n
+
+    def _on_add(self, row):
+        if self._assign.shape[0] < self._buf.shape[0]:
+            grown = np.empty(self._buf.shape[0], dtype=np.int32)
+            grown[:self._assign.shape[0]] = self._assign
+            self._assign = grown
+        if self._centroids is None:
+            if self._n >= self.min_train:
+                self.train()
+            return
+        if self._n >= 2 * self._trained_at:
+            self.train()
+            return
+        cell = int(nearest_centroids(self._buf[row:row + 1], self._centroids, 1)[0, 0])
+        self._assign[row] = cell
+        if self._lists is not None:
+            self._lists[cell] = np.append(self._lists[cell], row)
+
+    def _on_remove(self, row):
+        if self._centroids is None or self._lists is None:
+            return
+        cell = self._assign[row]
+        self._lists[cell] = self._lists[cell][self._lists[cell] != row]
+
+    def _on_move(self, src, dst):
+        if self._centroids is None:
+            return
+        cell = self._assign[src]
+        self._assign[dst] = cell
+        if self._lists is not None:
+            lst = self._lists[cell]
+            lst[lst == src] = dst
+
+    def _cell_lists(self):
+        if self._lists is None:
+            assign = self._assign[:self._n]
+            order = np.argsort(assign, kind="stable")
+            bounds = np.searchsorted(assign[order], np.arange(self._centroids.shape[0] + 1))
+            self._lists = [order[bounds[c]:bounds[c + 1]] for c in range(self._centroids.shape[0])]
+        return self._lists
+
+    def search(self, vector, rows=None, k=1, student_ids=None):
+        if rows is not None or student_ids is not None or self._centroids is None:
+            return super().search(vector, rows=rows, k=k, student_ids=student_ids)
+        q = np.asarray(vector, dtype=np.float32).reshape(1, -1)
+        with self._lock:
+            if self._n == 0:
+                return []
+            cells = nearest_centroids(q, self._centroids, self.nprobe)[0]
+            lists = self._cell_lists()
+            cand_rows = np.concatenate([lists[c] for c in cells])
+            if cand_rows.size == 0:
+                return []
+            return self._rank(q[0], self._buf[cand_rows], cand_rows, k)
+
+    def search_many(self, vectors, rows=None, k=1, student_ids=None):
+        if rows is not None or student_ids is not None or self._centroids is None:
+            return super().search_many(vectors, rows=rows, k=k, student_ids=student_ids)
+        # probes land in different cells; scan each probe's own cells
+        return [self.search(v, k=k) for v in np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)]
+
+    def stats(self):
+        out = super().stats()
+        out.update({
+            "trained": self.trained,
+            "nlist": 0 if self._centroids is None else int(self._centroids.shape[0]),
+            "nprobe": self.nprobe,
+        })
+        return out
+
+
+def make_index(backend="exact", dim=128, **kwargs):
+    """Index factory driven by FACE_INDEX_BACKEND ('exact' or 'ivf')."""
+    if backend == "ivf":
+        return IVFIndex(dim=dim, **kwargs)
+    if backend not in (None, "", "exact"):
+        raise ValueError(f"unknown face index backend: {backend}")
+    return FaceIndex(dim=dim)
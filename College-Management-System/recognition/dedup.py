@@ -0,0 +1,84 @@
+# recognition/dedup.py
+"""
+Bounded TTL cache of "already marked" (student_id, class session) pairs.
+
+face_recognize consults it before writing anything, so a student standing in
+front of the camera is recorded once per session window instead of once per
+captured frame.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class MarkedCache:
+    """
+    ttl_seconds : how long a mark suppresses repeats for the same key
+    max_entries : hard bound on remembered keys (oldest evicted first)
+    """
+
+    def __init__(self, ttl_seconds=3600.0, max_entries=10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> time marked (monotonic), oldest first
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def configure(self, ttl_seconds=None, max_entries=None):
+        if ttl_seconds is not None:
+            self.ttl_seconds = ttl_seconds
+        if max_entries is not None:
+            self.max_entries = max_entries
+
+    def _expire(self, now):
+        # entries are kept in the order they were marked and expire by the current TTL,
+        # so expired ones sit at the front even after configure() changed ttl_seconds
+        cutoff = now - self.ttl_seconds
+        while self._entries:
+            key, marked_at = next(iter(self._entries.items()))
+            if marked_at > cutoff:
+                break
+            self._entries.popitem(last=False)
+
+    def check_and_mark(self, key):
+        """
+        Atomically test and set. Returns True if key was already marked
+        (caller should short-circuit), False if it has just been marked now.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            if key in self._entries:
+                self.hits += 1
+                return True
+            self.misses += 1
+            self._entries[key] = now
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return False
+
+    def discard(self, key):
+        """Forget a mark (e.g. the write it guarded failed)."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            self._expire(time.monotonic())
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "ttl_seconds": self.ttl_seconds,
+                "max_entries": self.max_entries,
+            }
+
+
+# shared instance used by app.py
+marked_cache = MarkedCache()
@@ -0,0 +1,116 @@
+# recognition/detector.py
+"""
+Two-stage face detection.
+
+Stage 1 decodes a downscaled copy of the capture (JPEG captures are decoded at
+reduced size via Pillow's draft mode, so the full 1080p frame is never
+materialised just to find faces) and runs the detector configured by
+FACE_DETECTION_MODEL ('hog' or 'cnn') on it.
+Stage 2 maps the boxes back to full resolution, decodes the full image only
+if a face was found, and embeds a crop around each face.
+
+Every call returns per-stage timings in milliseconds.
+"""
+
+import io
+import time
+
+import numpy as np
+
+try:
+    import face_recognition
+except Exception:  # optional heavy dependency
+    face_recognition = None
+
+try:
+    from PIL import Image
+except Exception:
+    Image = None
+
+CROP_MARGIN = 0.2  # context kept around each face for the landmark model
+
+
+def _ms(t0):
+    return round((time.perf_counter() - t0) * 1000.0, 3)
+
+
+def decode_small(image_bytes, max_side):
+    """
+    Decode a copy whose longest side is at most max_side.
+    Returns (rgb ndarray, scale) where full-res coordinate = small * scale.
+    """
+    img = Image.open(io.BytesIO(image_bytes))
+    full_w, full_h = img.size
+    if max(full_w, full_h) > max_side:
+        ratio = max_side / float(max(full_w, full_h))
+        target = (max(1, int(full_w * ratio)), max(1, int(full_h * ratio)))
+        img.draft("RGB", target)  # JPEG: decode at 1/2, 1/4 or 1/8 scale
+        factor = max(img.size) // max_side
+        if factor > 1:
+            img = img.reduce(factor)  # cheap box filter for PNG / leftover JPEG scale
+        img = img.convert("RGB")
+        if max(img.size) > max_side:
+            img.thumbnail((max_side, max_side))
+    else:
+        img = img.convert("RGB")
+    scale = full_w / float(img.size[0])
+    return np.asarray(img), scale
+
+
+def scale_boxes(boxes, scale, full_size):
+    """Map (top, right, bottom, left) boxes from the small copy to full resolution."""
+    full_w, full_h = full_size
+    out = []
+    for top, right, bottom, left in boxes:
+        top, right, bottom, left = (int(round(v * scale)) for v in (top, right, bottom, left))
+        out.append((max(0, top), min(full_w, right), min(full_h, bottom), max(0, left)))
+    return out
+
+
+def detect_and_embed(image_bytes, model="hog", max_side=480, upsample=1):
+    """
+    Returns (embeddings, boxes, timings). boxes are full-resolution
+    (top, right, bottom, left) tuples; timings holds decode_small, detect,
+    decode_full and embed in ms (stages that did not run are absent).
+    """
+    timings = {}
+    if Image is None:
+        return [], [], timings
+
+    t0 = time.perf_counter()
+    try:
+        small, scale = decode_small(image_bytes, max_side)
+    except Exception:
+        return [], [], timings
+    timings["decode_small"] = _ms(t0)
+
+    if face_recognition is None:
+        return [], [], timings
+
+    t0 = time.perf_counter()
+    small_boxes = face_recognition.face_locations(small, number_of_times_to_upsample=upsample, model=model)
+    timings["detect"] = _ms(t0)
+    if not small_boxes:
+        return [], [], timings
+
+    t0 = time.perf_counter()
+    full = Image.open(io.BytesIO(image_bytes)).convert("RGB")
+    timings["decode_full"] = _ms(t0)
+
+    t0 = time.perf_counter()
+    boxes = scale_boxes(small_boxes, scale, full.size)
+    full_w, full_h = full.size
+    embeddings = []
+    for top, right, bottom, left in boxes:
+        pad_y = int((bottom - top) * CROP_MARGIN)
+        pad_x = int((right - left) * CROP_MARGIN)
+        ct, cl = max(0, top - pad_y), max(0, left - pad_x)
+        cb, cr = min(full_h, bottom + pad_y), min(full_w, right + pad_x)
+        crop = np.asarray(full.crop((cl, ct, cr, cb)))
+        # the crop holds exactly one face; tell the encoder where it is
+        inner = (top - ct, right - cl, bottom - ct, left - cl)
+        enc = face_recognition.face_encodings(crop, known_face_locations=[inner])
+        if enc:
+            embeddings.append(enc[0])
+    timings["embed"] = _ms(t0)
+    return embeddings, boxes, timings
@@ -0,0 +1,171 @@
+# recognition/engine.py
+"""
+Glue between captures and the embedding index.
+
+Embeddings come from the `face_recognition` package (dlib, 128-d) when it is
+installed, through the two-stage detector in detector.py. Without it the
+recognizer reports itself unavailable and face_recognize keeps its demo
+behaviour.
+"""
+
+import os
+import threading
+
+from .index import FaceIndex, normalize_class
+from .ann import make_index
+from .detector import detect_and_embed, face_recognition, Image
+
+
+class Recognizer:
+    def __init__(self, index=None, detection_model="hog", detect_max_side=480):
+        self.index = index if index is not None else FaceIndex()
+        self.detection_model = detection_model
+        self.detect_max_side = detect_max_side
+        self._loaded = False
+        self._lock = threading.Lock()        # held for the whole first load
+        self._stats_lock = threading.Lock()  # stage timings only (embed() runs under _lock while loading)
+        self._stage_totals = {}  # stage -> [calls, total ms]
+
+    @property
+    def available(self):
+        return face_recognition is not None and Image is not None
+
+    @property
+    def loaded(self):
+        return self._loaded
+
+    def configure(self, backend=None, detection_model=None, detect_max_side=None, **index_options):
+        """
+        Detection settings apply immediately; the index backend
+        (FACE_INDEX_BACKEND) can only change before the first load.
+        """
+        if detection_model:
+            self.detection_model = detection_model
+        if detect_max_side:
+            self.detect_max_side = detect_max_side
+        if self._loaded or backend is None or backend == self.index.backend:
+            return
+        self.index = make_index(backend, dim=self.index.dim, **index_options)
+
+    def embed(self, image_bytes):
+        """Embeddings of every face in a capture, via the two-stage detector."""
+        if not self.available:
+            return []
+        faces, _boxes, timings = detect_and_embed(image_bytes, model=self.detection_model,
+                                                  max_side=self.detect_max_side)
+        with self._stats_lock:
+            for stage, ms in timings.items():
+                tot = self._stage_totals.setdefault(stage, [0, 0.0])
+                tot[0] += 1
+                tot[1] += ms
+        return faces
+
+    def stage_stats(self):
+        """Average milliseconds per detection stage since startup."""
+        with self._stats_lock:
+            return {stage: {"calls": n, "avg_ms": round(total / n, 3)}
+                    for stage, (n, total) in self._stage_totals.items()}
+
+    def ensure_loaded(self, students, base_dir):
+        """Embed every enrolled student photo once (first call only)."""
+        if self._loaded or not self.available:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            for s in students or []:
+                self.enroll_file(s.get("student_id"), s.get("face_image"), base_dir,
+                                 name=s.get("name"), class_name=s.get("class"))
+            self._loaded = True
+
+    def enroll_file(self, student_id, rel_path, base_dir, name=None, class_name=None, replace=False):
+        """replace=True: a re-enrollment; the student's previous embeddings go even if this photo is unusable."""
+        if not student_id or not self.available:
+            return False
+        data = None
+        if rel_path:
+            path = os.path.join(base_dir, rel_path.replace("\\", os.sep))
+            try:
+                with open(path, "rb") as fh:
+                    data = fh.read()
+            except OSError:
+                pass
+        if data is None:
+            if replace:
+                self.index.remove(student_id)
+            return False
+        return self.enroll_bytes(student_id, data, name=name, class_name=class_name, replace=replace)
+
+    def enroll_bytes(self, student_id, image_bytes, name=None, class_name=None, replace=False):
+        faces = self.embed(image_bytes)
+        if replace:
+            self.index.remove(student_id)  # after embedding, so the student is unmatched only briefly
+        if not faces:
+            return False
+        # enrollment photos should hold a single face; take the first
+        self.index.add(student_id, faces[0], name=name, class_name=class_name)
+        return True
+
+    def identify(self, image_bytes, session=None, threshold=0.45):
+        """
+        Match the first face in a capture. With a class session the roster
+        subset is searched first and the global index only if nothing in the
+        roster is within `threshold`.
+        Returns {student_id, name, class, distance, scope} or None.
+        """
+        return self.identify_batch([(image_bytes, session)], threshold=threshold)[0]
+
+    def identify_batch(self, items, threshold=0.45):
+        """
+        identify() for several captures at once. items: [(image_bytes, session)].
+        Each capture is still detected/embedded on its own (dlib has no batched
+        CPU path), but the probes are then matched together: one distance
+        matrix per class-session roster and one against the whole index.
+        Returns one result (or None) per item.
+        """
+        probes = []
+        for image_bytes, _session in items:
+            faces = self.embed(image_bytes)
+            probes.append(faces[0] if faces else None)
+
+        results = [None] * len(items)
+        unmatched, by_session = [], {}
+        for i, (probe, (_bytes, session)) in enumerate(zip(probes, items)):
+            if probe is None:
+                continue
+            if session is None:
+                unmatched.append(i)
+            else:
+                by_session.setdefault(id(session), (session, []))[1].append(i)
+
+        for session, idx in by_session.values():
+            hits = self.index.search_many([probes[i] for i in idx], student_ids=session.roster, k=1)
+            for i, h in zip(idx, hits):
+                if h and h[0][1] <= threshold:
+                    results[i] = self._result(h[0], "session")
+                else:
+                    unmatched.append(i)
+
+        if unmatched:
+            hits = self.index.search_many([probes[i] for i in unmatched], k=1)
+            for i, h in zip(unmatched, hits):
+                if h and h[0][1] <= threshold:
+                    results[i] = self._result(h[0], "global")
+        return results
+
+    def _result(self, hit, scope):
+        sid, dist = hit
+        meta = self.index.meta(sid)
+        return {"student_id": sid, "name": meta.get("name"), "class": meta.get("class"),
+                "distance": round(dist, 4), "scope": scope}
+
+
+def roster_for_class(students, class_name):
+    """student_ids in students.json whose class matches class_name."""
+    key = normalize_class(class_name)
+    return {s.get("student_id") for s in students or []
+            if s.get("student_id") and normalize_class(s.get("class")) == key}
+
+
+# shared recognizer used by app.py
+recognizer = Recognizer()
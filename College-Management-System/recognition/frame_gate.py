@@ -0,0 +1,137 @@
+# recognition/frame_gate.py
+"""
+Per-session frame gate for /face/recognize.
+
+A camera left running sends mostly identical frames. Each arriving frame is
+reduced to a 64-bit difference hash (dHash) on a tiny grayscale thumbnail;
+if it is within FRAME_GATE_THRESHOLD bits of the last frame that was actually
+processed for the same session, the frame is skipped before anything is saved,
+detected or embedded.
+"""
+
+import io
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    from PIL import Image
+except Exception:  # Pillow is optional; without it every frame is processed
+    Image = None
+
+
+def dhash(image_bytes, hash_size=8):
+    """
+    Difference hash of an encoded image (jpeg/png bytes).
+    Returns an int with hash_size*hash_size bits, or None if the image
+    cannot be decoded.
+    """
+    if Image is None:
+        return None
+    try:
+        img = Image.open(io.BytesIO(image_bytes))
+        # let the JPEG decoder drop resolution up front (no-op for PNG)
+        img.draft("L", (hash_size * 8, hash_size * 8))
+        img = img.convert("L").resize((hash_size + 1, hash_size))
+    except Exception:
+        return None
+    px = img.tobytes()
+    value = 0
+    width = hash_size + 1
+    for row in range(hash_size):
+        base = row * width
+        for col in range(hash_size):
+            value = (value << 1) | (px[base + col] > px[base + col + 1])
+    return value
+
+
+class FrameGate:
+    """
+    Tracks the last processed frame hash per session and decides whether a new
+    frame is different enough to be worth running recognition on.
+
+    threshold       : max Hamming distance (in bits) still counted as "unchanged"
+    max_skip_seconds: force a frame through after this long even if unchanged
+    max_sessions    : number of sessions remembered (least recently seen evicted)
+    """
+
+    def __init__(self, threshold=5, max_skip_seconds=10.0, hash_size=8, max_sessions=256):
+        self.threshold = threshold
+        self.max_skip_seconds = max_skip_seconds
+        self.hash_size = hash_size
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self.processed = 0
+        self.skipped = 0
+
+    def configure(self, threshold=None, max_skip_seconds=None, hash_size=None):
+        if threshold is not None:
+            self.threshold = threshold
+        if max_skip_seconds is not None:
+            self.max_skip_seconds = max_skip_seconds
+        if hash_size is not None and hash_size != self.hash_size:
+            # hashes of different sizes are not comparable
+            self.hash_size = hash_size
+            with self._lock:
+                self._sessions.clear()
+
+    def check(self, session_key, image_bytes):
+        """
+        Returns (should_process, distance). distance is None when there is no
+        previous frame for the session or the frame could not be hashed.
+        """
+        h = dhash(image_bytes, self.hash_size)
+        now = time.monotonic()
+        with self._lock:
+            state = self._sessions.get(session_key)
+            if state is None:
+                state = {"hash": None, "at": 0.0, "processed": 0, "skipped": 0}
+                self._sessions[session_key] = state
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            else:
+                self._sessions.move_to_end(session_key)
+
+            distance = None
+            if h is not None and state["hash"] is not None:
+                distance = bin(h ^ state["hash"]).count("1")
+                if distance <= self.threshold and now - state["at"] < self.max_skip_seconds:
+                    state["skipped"] += 1
+                    self.skipped += 1
+                    return False, distance
+
+            state["hash"] = h
+            state["at"] = now
+            state["processed"] += 1
+            self.processed += 1
+            return True, distance
+
+    def reset(self, session_key=None):
+        with self._lock:
+            if session_key is None:
+                self._sessions.clear()
+            else:
+                self._sessions.pop(session_key, None)
+
+    def stats(self, session_key=None):
+        with self._lock:
+            if session_key is not None:
+                state = self._sessions.get(session_key)
+                if state is None:
+                    return {"session": session_key, "processed": 0, "skipped": 0}
+                return {"session": session_key, "processed": state["processed"], "skipped": state["skipped"]}
+            total = self.processed + self.skipped
+            return {
+                "processed": self.processed,
+                "skipped": self.skipped,
+                "skip_ratio": round(self.skipped / total, 4) if total else 0.0,
+                "sessions": {
+                    k: {"processed": v["processed"], "skipped": v["skipped"]}
+                    for k, v in self._sessions.items()
+                },
+            }
+
+
+# shared instance used by app.py
+frame_gate = FrameGate()
@@ -0,0 +1,184 @@
+# recognition/index.py
+"""
+In-memory face embedding index.
+
+Rows are embeddings (a student may have several enrolled photos). Besides the
+vector matrix the index keeps student_id -> rows and class -> student_ids maps
+so a class session can restrict matching to its roster.
+"""
+
+import re
+import threading
+
+import numpy as np
+
+
+def normalize_class(name):
+    """'CS-B', 'cs b' and 'CS B ' all map to 'CSB'."""
+    return re.sub(r"[^0-9A-Z]", "", str(name or "").upper())
+
+
+class FaceIndex:
+    """Exact (brute-force) euclidean index over enrolled face embeddings."""
+
+    backend = "exact"
+
+    def __init__(self, dim=128):
+        self.dim = dim
+        self._buf = np.empty((64, dim), dtype=np.float32)
+        self._n = 0
+        self._ids = []       # row -> student_id
+        self._rows = {}      # student_id -> [row, ...]
+        self._meta = {}      # student_id -> {"name": ..., "class": ...}
+        self._by_class = {}  # normalized class -> {student_id, ...}
+        self._lock = threading.RLock()
+        self.version = 0     # bumped on every change so cached row subsets can be invalidated
+
+    def __len__(self):
+        return self._n
+
+    @property
+    def vectors(self):
+        return self._buf[:self._n]
+
+    def student_count(self):
+        return len(self._rows)
+
+    def meta(self, student_id):
+        return self._meta.get(student_id, {})
+
+    def add(self, student_id, vector, name=None, class_name=None):
+        vec = np.asarray(vector, dtype=np.float32).reshape(-1)
+        if vec.shape[0] != self.dim:
+            raise ValueError(f"expected {self.dim}-d embedding, got {vec.shape[0]}")
+        with self._lock:
+            if self._n == self._buf.shape[0]:
+                grown = np.empty((self._buf.shape[0] * 2, self.dim), dtype=np.float32)
+                grown[:self._n] = self._buf[:self._n]
+                self._buf = grown
+            row = self._n
+            self._buf[row] = vec
+            self._n += 1
+            self._ids.append(student_id)
+            self._rows.setdefault(student_id, []).append(row)
+            self._set_meta(student_id, name, class_name)
+            self._on_add(row)
+            self.version += 1
+            return row
+
+    # hooks for approximate backends that keep per-row side structures
+    def _on_add(self, row):
+        pass
+
+    def _on_remove(self, row):
+        pass
+
+    def _on_move(self, src, dst):
+        pass
+
+    def _set_meta(self, student_id, name, class_name):
+        old = self._meta.get(student_id)
+        if old is not None:
+            self._by_class.get(normalize_class(old.get("class")), set()).discard(student_id)
+        meta = {"name": name if name is not None else (old or {}).get("name"),
+                "class": class_name if class_name is not None else (old or {}).get("class")}
+        self._meta[student_id] = meta
+        self._by_class.setdefault(normalize_class(meta["class"]), set()).add(student_id)
+
+    def remove(self, student_id):
+        """Drop every embedding of a student. Returns number of rows removed."""
+        with self._lock:
+            rows = self._rows.pop(student_id, None)
+            if not rows:
+                return 0
+            # swap-remove: the last row fills each hole, so only moved rows are renumbered
+            for row in sorted(rows, reverse=True):
+                last = self._n - 1
+                self._on_remove(row)
+                if row != last:
+                    self._buf[row] = self._buf[last]
+                    moved = self._ids[last]
+                    self._ids[row] = moved
+                    moved_rows = self._rows[moved]
+                    moved_rows[moved_rows.index(last)] = row
+                    self._on_move(last, row)
+                self._ids.pop()
+                self._n -= 1
+            meta = self._meta.pop(student_id, {})
+            self._by_class.get(normalize_class(meta.get("class")), set()).discard(student_id)
+            self.version += 1
+            return len(rows)
+
+    def students_in_class(self, class_name):
+        return set(self._by_class.get(normalize_class(class_name), ()))
+
+    def rows_for(self, student_ids):
+        """
+        Row indices for a set of students (unknown ids ignored). They are only
+        valid until the next add/remove; search(student_ids=...) keeps both in one lock.
+        """
+        with self._lock:
+            rows = [r for sid in student_ids for r in self._rows.get(sid, ())]
+        return np.asarray(rows, dtype=np.int64)
+
+    def search(self, vector, rows=None, k=1, student_ids=None):
+        """
+        Nearest enrolled students to `vector`.
+        rows: optional array of row indices to restrict the search to.
+        student_ids: restrict to these students instead; their rows are looked up
+        under the same lock as the search, so a concurrent add/remove cannot shift them.
+        Returns [(student_id, distance), ...] best first, one entry per student.
+        """
+        q = np.asarray(vector, dtype=np.float32).reshape(-1)
+        with self._lock:
+            if student_ids is not None:
+                rows = self.rows_for(student_ids)
+            if self._n == 0:
+                return []
+            if rows is None:
+                cand = self._buf[:self._n]
+                row_ids = None
+            else:
+                if len(rows) == 0:
+                    return []
+                cand = self._buf[rows]
+                row_ids = rows
+            return self._rank(q, cand, row_ids, k)
+
+    def search_many(self, vectors, rows=None, k=1, student_ids=None):
+        """
+        search() for a batch of probes: one (probes x candidates) distance
+        matrix instead of one pass over the candidates per probe.
+        Returns one result list per probe.
+        """
+        q = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        with self._lock:
+            if student_ids is not None:
+                rows = self.rows_for(student_ids)
+            if self._n == 0 or (rows is not None and len(rows) == 0):
+                return [[] for _ in range(q.shape[0])]
+            cand = self._buf[:self._n] if rows is None else self._buf[rows]
+            # |a - b|^2 = |a|^2 + |b|^2 - 2ab, clipped against rounding below zero
+            sq = (q * q).sum(1)[:, None] + (cand * cand).sum(1)[None, :] - 2.0 * (q @ cand.T)
+            dists = np.sqrt(np.maximum(sq, 0.0))
+            return [self._rank_dists(d, rows, k) for d in dists]
+
+    def _rank(self, q, cand, row_ids, k):
+        return self._rank_dists(np.linalg.norm(cand - q, axis=1), row_ids, k)
+
+    def _rank_dists(self, dists, row_ids, k):
+        order = np.argsort(dists)
+        out, seen = [], set()
+        for i in order:
+            row = int(row_ids[i]) if row_ids is not None else int(i)
+            sid = self._ids[row]
+            if sid in seen:
+                continue
+            seen.add(sid)
+            out.append((sid, float(dists[i])))
+            if len(out) >= k:
+                break
+        return out
+
+    def stats(self):
+        return {"backend": self.backend, "embeddings": self._n, "students": len(self._rows)}
@@ -0,0 +1,204 @@
+# recognition/jobs.py
+"""
+Asynchronous recognition jobs.
+
+/face/recognize/async accepts a capture, queues it and returns a job id at
+once; the result is polled (or long-polled) from /face/jobs/<id>. Background
+workers drain the queue in batches: up to `batch_size` captures submitted
+within `batch_wait_ms` of each other are handed to the processor together, so
+the recognizer can match all of their faces in one index search. Captures
+from different sessions are taken round-robin (FairQueue), and each batch
+holds one slot of the shared admission controller, so synchronous and
+asynchronous recognitions share the same concurrency limit.
+"""
+
+import logging
+import math
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+
+from .admission import FairQueue, Saturated, admission as shared_admission
+
+log = logging.getLogger(__name__)
+
+FINAL_STATES = ("done", "failed")
+
+
+class RecognitionJobs:
+    def __init__(self, workers=1, batch_size=8, batch_wait_ms=50, max_pending=64, keep=1000,
+                 admission=None):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.batch_wait_ms = batch_wait_ms
+        self.max_pending = max_pending
+        self.keep = keep
+        self.admission = admission
+        self._process = None
+        self._threads = []
+        self._cond = threading.Condition()
+        self._queue = FairQueue()
+        self._jobs = OrderedDict()      # job id -> public job dict (bounded by `keep`)
+        self._payloads = {}             # job id -> payload, dropped once processed
+        self._batch_ms = deque(maxlen=256)
+        self._batch_sizes = deque(maxlen=256)
+        self.submitted = 0
+        self.rejected = 0
+
+    def configure(self, workers=None, batch_size=None, batch_wait_ms=None, max_pending=None):
+        with self._cond:
+            if workers is not None:
+                self.workers = max(1, int(workers))
+            if batch_size is not None:
+                self.batch_size = max(1, int(batch_size))
+            if batch_wait_ms is not None:
+                self.batch_wait_ms = max(0, int(batch_wait_ms))
+            if max_pending is not None:
+                self.max_pending = max(1, int(max_pending))
+
+    def set_processor(self, process_batch):
+        """process_batch([payload, ...]) -> [result, ...] (same order)."""
+        self._process = process_batch
+
+    def _ensure_workers(self):
+        self._threads = [t for t in self._threads if t.is_alive()]
+        while len(self._threads) < self.workers:
+            t = threading.Thread(target=self._run, name=f"recognition-job-{len(self._threads)}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    # ---------- submit / poll ----------
+    def _retry_after(self):
+        per_batch = (sum(self._batch_ms) / len(self._batch_ms) / 1000.0) if self._batch_ms else 1.0
+        batches = math.ceil(len(self._queue) / float(self.batch_size)) / max(1, self.workers)
+        return max(1, min(60, math.ceil(per_batch * batches)))
+
+    def submit(self, session_key, payload):
+        """Queue one capture; returns the job dict. Raises Saturated when too much is pending."""
+        if self._process is None:
+            raise RuntimeError("no recognition job processor configured")
+        with self._cond:
+            if len(self._queue) >= self.max_pending:
+                self.rejected += 1
+                raise Saturated(self._retry_after(), reason="too many pending recognition jobs")
+            job_id = uuid.uuid4().hex[:16]
+            job = {"id": job_id, "session": session_key, "state": "queued", "submitted": time.time(),
+                   "started": None, "finished": None, "batch": None, "result": None, "error": None}
+            self._jobs[job_id] = job
+            while len(self._jobs) > self.keep:
+                old_id, old = self._jobs.popitem(last=False)
+                if old["state"] not in FINAL_STATES:  # never evict unfinished work
+                    self._jobs[old_id] = old
+                    self._jobs.move_to_end(old_id, last=False)
+                    break
+            self._payloads[job_id] = payload
+            self._queue.put(session_key, job_id)
+            self.submitted += 1
+            self._ensure_workers()
+            self._cond.notify()
+            return dict(job, position=len(self._queue))
+
+    def get(self, job_id, wait=0.0):
+        """Job dict (copy), or None. With wait > 0, blocks up to `wait` seconds for it to finish."""
+        deadline = time.monotonic() + max(0.0, wait)
+        with self._cond:
+            while True:
+                job = self._jobs.get(job_id)
+                if job is None:
+                    return None
+                remaining = deadline - time.monotonic()
+                if job["state"] in FINAL_STATES or remaining <= 0:
+                    return dict(job)
+                self._cond.wait(remaining)
+
+    # ---------- workers ----------
+    def _take_batch(self):
+        with self._cond:
+            while not len(self._queue):
+                self._cond.wait()
+            # give concurrent submissions a moment to join this batch
+            deadline = time.monotonic() + self.batch_wait_ms / 1000.0
+            while len(self._queue) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            ids = []
+            while len(ids) < self.batch_size:
+                _, job_id = self._queue.pop()
+                if job_id is None:
+                    break
+                ids.append(job_id)
+            now = time.time()
+            for job_id in ids:
+                job = self._jobs.get(job_id)
+                if job is not None:
+                    job["state"], job["started"], job["batch"] = "running", now, len(ids)
+            return ids, [self._payloads.pop(job_id) for job_id in ids]
+
+    def _acquire_slot(self):
+        while self.admission is not None:
+            try:
+                return self.admission.acquire("async-jobs")
+            except Saturated as e:
+                time.sleep(min(e.retry_after, 1))
+        return None
+
+    def _run(self):
+        while True:
+            ids, payloads = self._take_batch()
+            if not ids:
+                continue
+            started = self._acquire_slot()
+            t0 = time.perf_counter()
+            try:
+                results, error = list(self._process(payloads)), None
+            except Exception as e:  # one bad batch must not kill the worker
+                results, error = [], f"{type(e).__name__}: {e}"
+            finally:
+                if started is not None:
+                    self.admission.release(started)
+            missing = error or f"processor returned {len(results)} results for {len(ids)} captures"
+            with self._cond:
+                try:
+                    self._batch_ms.append((time.perf_counter() - t0) * 1000.0)
+                    self._batch_sizes.append(len(ids))
+                    now = time.time()
+                    for i, job_id in enumerate(ids):
+                        job = self._jobs.get(job_id)
+                        if job is None:
+                            continue
+                        job["finished"] = now
+                        if error is None and i < len(results):
+                            job["state"], job["result"], job["error"] = "done", results[i], None
+                        else:  # the batch failed, or came back short: never leave a job running
+                            job["state"], job["result"], job["error"] = "failed", None, missing
+                except Exception:
+                    log.exception("recognition batch bookkeeping failed")
+                finally:
+                    self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            states = {}
+            for job in self._jobs.values():
+                states[job["state"]] = states.get(job["state"], 0) + 1
+            batches = len(self._batch_sizes)
+            return {
+                "workers": self.workers,
+                "batch_size": self.batch_size,
+                "batch_wait_ms": self.batch_wait_ms,
+                "max_pending": self.max_pending,
+                "pending": len(self._queue),
+                "pending_by_session": self._queue.depths(),
+                "submitted": self.submitted,
+                "rejected": self.rejected,
+                "jobs": states,
+                "avg_batch_size": round(sum(self._batch_sizes) / batches, 2) if batches else None,
+                "avg_batch_ms": round(sum(self._batch_ms) / batches, 2) if batches else None,
+            }
+
+
+# shared job queue used by /face/recognize/async
+recognition_jobs = RecognitionJobs(admission=shared_admission)
@@ -0,0 +1,76 @@
+# recognition/sessions.py
+"""
+Class sessions started from the teacher dashboard.
+
+A session pins the roster of one section (e.g. CS-B) so recognition can match a
+probe against that section's embeddings first, and remembers who has been
+recognized so far.
+"""
+
+import threading
+import uuid
+from datetime import datetime
+
+from .index import normalize_class
+
+
+class ClassSession:
+    def __init__(self, class_name, teacher_id=None, roster=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.class_name = class_name
+        self.class_key = normalize_class(class_name)
+        self.teacher_id = teacher_id
+        self.roster = set(roster or ())
+        self.started_at = datetime.utcnow().isoformat()
+        self.ended_at = None
+        self.recognized = {}  # student_id -> first recognized ISO timestamp
+
+    @property
+    def active(self):
+        return self.ended_at is None
+
+    def note_recognized(self, student_id, ts=None):
+        self.recognized.setdefault(student_id, ts or datetime.utcnow().isoformat())
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "class": self.class_name,
+            "teacher_id": self.teacher_id,
+            "started_at": self.started_at,
+            "ended_at": self.ended_at,
+            "roster_size": len(self.roster),
+            "recognized": len(self.recognized),
+        }
+
+
+class SessionRegistry:
+    def __init__(self):
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def start(self, class_name, teacher_id=None, roster=None):
+        session = ClassSession(class_name, teacher_id=teacher_id, roster=roster)
+        with self._lock:
+            self._sessions[session.id] = session
+        return session
+
+    def get(self, session_id):
+        if not session_id:
+            return None
+        return self._sessions.get(session_id)
+
+    def end(self, session_id):
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+        if session is not None:
+            session.ended_at = datetime.utcnow().isoformat()
+        return session
+
+    def active(self):
+        with self._lock:
+            return list(self._sessions.values())
+
+
+# shared registry used by app.py and the teacher blueprint
+class_sessions = SessionRegistry()
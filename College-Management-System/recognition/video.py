@@ -0,0 +1,184 @@
+# recognition/video.py
+"""
+Frame sources for the offline ingestion worker (ingest_worker.py).
+
+sample_frames() turns a video file, a camera device / stream URL, an animated
+image or a directory of still frames into a sequence of JPEG-encoded frames
+sampled at a target rate, i.e. the same bytes camera.html would POST to
+/face/recognize. Video files are sampled by their own timestamps (frames that
+are not sampled are only grabbed, never decoded to pixels), so a recording is
+processed as fast as the machine allows; live devices are sampled by wall
+clock.
+
+OpenCV (cv2) is needed for video files and devices. Without it, directories of
+frames and animated GIF/WebP/PNG files still work through Pillow.
+"""
+
+import io
+import os
+import time
+
+try:
+    import cv2
+except Exception:  # optional: only needed for video files and devices
+    cv2 = None
+
+try:
+    from PIL import Image, ImageSequence
+except Exception:
+    Image = ImageSequence = None
+
+IMAGE_EXTS = ("jpg", "jpeg", "png")
+ANIMATED_EXTS = ("gif", "webp", "apng", "png")
+
+
+class SourceError(Exception):
+    """The frame source cannot be opened (missing file, missing cv2, ...)."""
+
+
+def _is_live(source):
+    s = str(source)
+    return s.isdigit() or s.split("://", 1)[0].lower() in ("rtsp", "rtmp", "http", "https", "udp", "tcp")
+
+
+def _ext(path):
+    return path.rsplit(".", 1)[-1].lower() if "." in os.path.basename(path) else ""
+
+
+def _encode_jpeg_pil(img, quality):
+    buf = io.BytesIO()
+    img.convert("RGB").save(buf, format="JPEG", quality=quality)
+    return buf.getvalue()
+
+
+class FrameSampler:
+    """
+    Iterate (position_seconds, jpeg_bytes) from `source` at `fps` samples per
+    second. Counters: frames_read (decoded or grabbed), frames_sampled.
+    """
+
+    def __init__(self, source, fps=2.0, jpeg_quality=85, max_frames=None):
+        self.source = source
+        self.fps = float(fps)
+        self.jpeg_quality = int(jpeg_quality)
+        self.max_frames = max_frames
+        self.frames_read = 0
+        self.frames_sampled = 0
+        if self.fps <= 0:
+            raise ValueError("fps must be positive")
+
+    def __iter__(self):
+        src = str(self.source)
+        if _is_live(src):
+            gen = self._live()
+        elif os.path.isdir(src):
+            gen = self._directory()
+        elif not os.path.exists(src):
+            raise SourceError(f"no such file or directory: {src}")
+        elif _ext(src) in ANIMATED_EXTS and Image is not None and self._is_animated(src):
+            gen = self._animated()
+        else:
+            gen = self._video_file()
+        for item in gen:
+            self.frames_sampled += 1
+            yield item
+            if self.max_frames and self.frames_sampled >= self.max_frames:
+                return
+
+    # ---------- OpenCV sources ----------
+    def _capture(self, src):
+        if cv2 is None:
+            raise SourceError("opencv-python (cv2) is required for video files and camera devices")
+        cap = cv2.VideoCapture(int(src) if src.isdigit() else src)
+        if not cap.isOpened():
+            raise SourceError(f"cannot open video source: {src}")
+        return cap
+
+    def _encode(self, frame):
+        ok, buf = cv2.imencode(".jpg", frame, [int(cv2.IMWRITE_JPEG_QUALITY), self.jpeg_quality])
+        return buf.tobytes() if ok else None
+
+    def _video_file(self):
+        cap = self._capture(str(self.source))
+        try:
+            native = cap.get(cv2.CAP_PROP_FPS) or 25.0
+            step = 1.0 / self.fps
+            next_at = 0.0
+            index = 0
+            while cap.grab():  # grab() skips the pixel conversion for frames we drop
+                self.frames_read += 1
+                pos = index / native
+                index += 1
+                if pos + 1e-9 < next_at:
+                    continue
+                ok, frame = cap.retrieve()
+                if not ok:
+                    continue
+                next_at += step * (int((pos - next_at) / step) + 1)
+                data = self._encode(frame)
+                if data:
+                    yield pos, data
+        finally:
+            cap.release()
+
+    def _live(self):
+        cap = self._capture(str(self.source))
+        try:
+            step = 1.0 / self.fps
+            start = time.monotonic()
+            next_at = start
+            while True:
+                if not cap.grab():
+                    break
+                self.frames_read += 1
+                now = time.monotonic()
+                if now < next_at:
+                    continue
+                ok, frame = cap.retrieve()
+                if not ok:
+                    continue
+                next_at = max(next_at + step, now)
+                data = self._encode(frame)
+                if data:
+                    yield now - start, data
+        finally:
+            cap.release()
+
+    # ---------- Pillow sources ----------
+    @staticmethod
+    def _is_animated(path):
+        try:
+            with Image.open(path) as img:
+                return getattr(img, "n_frames", 1) > 1
+        except Exception:
+            return False
+
+    def _animated(self):
+        step = 1.0 / self.fps
+        next_at = 0.0
+        pos = 0.0
+        with Image.open(str(self.source)) as img:
+            for frame in ImageSequence.Iterator(img):
+                self.frames_read += 1
+                duration = (frame.info.get("duration") or 100) / 1000.0
+                if pos + 1e-9 >= next_at:
+                    next_at += step * (int((pos - next_at) / step) + 1)
+                    yield pos, _encode_jpeg_pil(frame, self.jpeg_quality)
+                pos += duration
+
+    def _directory(self):
+        """Every image in the directory (sorted by name) is one sampled frame, 1/fps apart."""
+        files = sorted(f for f in os.listdir(str(self.source)) if _ext(f) in IMAGE_EXTS)
+        for i, name in enumerate(files):
+            self.frames_read += 1
+            with open(os.path.join(str(self.source), name), "rb") as fh:
+                data = fh.read()
+            if _ext(name) != "png":
+                yield i / self.fps, data
+            elif Image is not None:
+                with Image.open(io.BytesIO(data)) as img:
+                    yield i / self.fps, _encode_jpeg_pil(img, self.jpeg_quality)
+
+
+def sample_frames(source, fps=2.0, jpeg_quality=85, max_frames=None):
+    return FrameSampler(source, fps=fps, jpeg_quality=jpeg_quality, max_frames=max_frames)
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+retention.py - archive / prune capture images and compact attendance partitions.
+
+Usage:
+  # one pass with the policy from config.py (CAPTURE_* / ATTENDANCE_COMPRESS_* / RETENTION_*)
+  python retention.py
+
+  # see what would happen
+  python retention.py --dry-run
+
+  # override the policy or the per-run I/O budget
+  python retention.py --archive-after-days 14 --delete-after-days 365 --max-files 1000
+
+  # keep running, one pass every 24 hours (instead of cron)
+  python retention.py --every-hours 24
+
+  # cron, nightly at 02:30
+  30 2 * * *  cd /srv/attendance && python retention.py >> data/retention.log 2>&1
+
+Each pass is bounded by --max-files / --max-bytes; when a pass stops at the
+budget the report says "more": true and the next pass continues.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import app, CAPTURE_DIR  # noqa: E402
+from run import configure_app_from_env  # noqa: E402
+from services.attendance_log import attendance_log  # noqa: E402
+from services.retention import ARCHIVE_DIR, run_retention  # noqa: E402
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Archive/prune captures and compact attendance partitions")
+    p.add_argument("--dry-run", action="store_true", help="report only; touch nothing")
+    p.add_argument("--archive-after-days", type=float, default=None)
+    p.add_argument("--orphan-grace-days", type=float, default=None)
+    p.add_argument("--delete-after-days", type=float, default=None, help="0 keeps bundles forever")
+    p.add_argument("--compress-after-months", type=int, default=None)
+    p.add_argument("--max-files", type=int, default=None, help="files touched per pass")
+    p.add_argument("--max-bytes", type=int, default=None, help="bytes touched per pass")
+    p.add_argument("--every-hours", type=float, default=None, help="repeat forever with this interval")
+    return p.parse_args()
+
+
+def pick(value, key, default):
+    return value if value is not None else app.config.get(key, default)
+
+
+def one_pass(args):
+    with app.app_context():  # orphans are judged against the attendance store (file or table)
+        return run_retention(
+            log=attendance_log,
+            capture_dir=CAPTURE_DIR,
+            archive_dir=ARCHIVE_DIR,
+            archive_after_days=pick(args.archive_after_days, "CAPTURE_ARCHIVE_AFTER_DAYS", 30),
+            orphan_grace_days=pick(args.orphan_grace_days, "CAPTURE_ORPHAN_GRACE_DAYS", 7),
+            delete_after_days=pick(args.delete_after_days, "CAPTURE_DELETE_AFTER_DAYS", 0),
+            compress_after_months=pick(args.compress_after_months, "ATTENDANCE_COMPRESS_AFTER_MONTHS", 2),
+            max_files=pick(args.max_files, "RETENTION_MAX_FILES_PER_RUN", 5000),
+            max_bytes=pick(args.max_bytes, "RETENTION_MAX_BYTES_PER_RUN", 512 * 1024 * 1024),
+            dry_run=args.dry_run,
+        )
+
+
+def main():
+    args = parse_args()
+    configure_app_from_env()
+    while True:
+        started = time.time()
+        report = one_pass(args)
+        report["seconds"] = round(time.time() - started, 3)
+        print(json.dumps(report), flush=True)
+        if not args.every_hours:
+            return 0
+        time.sleep(max(60.0, args.every_hours * 3600.0))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,29 +1,16 @@
 # routes/admin_routes.py
 
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session
-import os, json
-from datetime import datetime
-from pathlib import Path
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session, send_file, abort, current_app, jsonify
+import os, logging, tempfile
 
-bp = Blueprint("admin", __name__, url_prefix="/admin")
-
-DATA_DIR = os.path.join(Path(__file__).resolve().parents[1], "data")
+from recognition import recognizer
+from services import ingest_jobs, roster
+from services.bulk_enroll import BulkEnrollError, bulk_enroll
+from services.ingest import finish
+from services.profiling import request_profiler
 
-# ---------- HELPER FUNCTIONS ----------
-def _load_json(fname, default=[]):
-    p = os.path.join(DATA_DIR, fname)
-    if not os.path.exists(p):
-        return default
-    try:
-        with open(p, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except:
-        return default
-
-def _save_json(fname, data):
-    p = os.path.join(DATA_DIR, fname)
-    with open(p, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=4)
+bp = Blueprint("admin", __name__, url_prefix="/admin")
+log = logging.getLogger(__name__)
 
 # ---------- ADMIN LOGIN ----------
 
@@ -74,9 +61,14 @@ def dashboard():
         flash("Please login first", "warning")
         return redirect(url_for("admin.admin_login"))
 
-    teachers = _load_json("teachers.json", [])
-    students = _load_json("students.json", [])
-    return render_template("dashboard.html", teachers=teachers, students=students)
+    # counts are cached and the roster tables are paged in by the page itself
+    # (/api/roster/*), so this render does not grow with enrollment
+    try:
+        counts = roster.counts()
+    except Exception as e:
+        log.warning("roster counts unavailable: %s", e)
+        counts = None
+    return render_template("dashboard.html", counts=counts)
 
 # ---------- ADMIN SETTINGS ----------
 @bp.route("/settings", methods=["GET", "POST"])
@@ -89,3 +81,89 @@ def settings():
         flash("Settings saved!", "success")
 
     return render_template("settings.html")
+
+# ---------- REQUEST PROFILES ----------
+PROFILE_SORTS = ("cumulative", "tottime", "calls")
+
+@bp.route("/profiles")
+def profiles():
+    """Slowest (or most recent) captured request profiles; ?ep= filters by endpoint, ?name= opens one."""
+    if "admin" not in session:
+        flash("Please login first", "warning")
+        return redirect(url_for("admin.admin_login"))
+
+    order = "recent" if request.args.get("order") == "recent" else "slowest"
+    endpoint = request.args.get("ep") or None
+    detail = report = None
+    name = request.args.get("name")
+    if name:
+        detail = request_profiler.load(name)
+        if detail is None:
+            abort(404)
+        sort = request.args.get("sort", "cumulative")
+        report = request_profiler.report(name, sort=sort if sort in PROFILE_SORTS else "cumulative")
+    return render_template("profiles.html", items=request_profiler.recent(limit=100, order=order, endpoint=endpoint),
+                           order=order, endpoint=endpoint, detail=detail, report=report,
+                           stats=request_profiler.stats())
+
+@bp.route("/profiles/<name>.prof")
+def profile_download(name):
+    if "admin" not in session:
+        abort(403)
+    path = request_profiler.prof_path(name)
+    if path is None:
+        abort(404)
+    return send_file(path, mimetype="application/octet-stream", as_attachment=True, download_name=name + ".prof")
+
+# ---------- BULK ENROLLMENT ----------
+@bp.route("/enroll/bulk", methods=["POST"])
+def enroll_bulk():
+    """
+    multipart: roster (CSV) + photos (ZIP) [+ kind=student|teacher, allow_missing_photos=1, dry_run=1, workers=N].
+    Returns the import report (per-row failures, throughput). Progress while it runs:
+    GET /api/uploads/<id> with the id sent as X-Upload-Id. Same as `python enroll_bulk.py`.
+    """
+    if "admin" not in session:
+        return jsonify({"ok": False, "error": "admin login required"}), 403
+    upload_id = request.headers.get("X-Upload-Id")
+    if upload_id and (len(upload_id) > 64 or not upload_id.replace("-", "").replace("_", "").isalnum()):
+        return jsonify({"ok": False, "error": "invalid upload id"}), 400
+    request.max_content_length = current_app.config.get("BULK_ENROLL_MAX_CONTENT_LENGTH", 2 * 1024 * 1024 * 1024)
+    roster_file, photos = request.files.get("roster"), request.files.get("photos")
+    if not roster_file or not photos:
+        return jsonify({"ok": False, "error": "roster (CSV) and photos (ZIP) files required"}), 400
+    kind = request.form.get("kind", "student")
+    if kind not in ("student", "teacher"):
+        return jsonify({"ok": False, "error": "kind must be student or teacher"}), 400
+
+    # worker processes open the archive by path; it is spooled to disk once, never extracted
+    fd, zip_path = tempfile.mkstemp(suffix=".zip")
+    os.close(fd)
+    job = ingest_jobs.start(upload_id, kind="enrollment")
+    try:
+        photos.save(zip_path)
+        report = bulk_enroll(roster_file.stream, zip_path, kind=kind,
+                             workers=request.form.get("workers", type=int),
+                             allow_missing_photos=request.form.get("allow_missing_photos") == "1",
+                             dry_run=request.form.get("dry_run") == "1",
+                             embed=recognizer.available,
+                             face_index=recognizer.index if recognizer.loaded else None,
+                             job=job)
+    except BulkEnrollError as e:
+        finish(job, "failed", str(e))
+        return jsonify({"ok": False, "error": str(e), "upload_id": job["id"]}), 400
+    except Exception as e:
+        finish(job, "failed", str(e))
+        log.exception("bulk enrollment failed")
+        return jsonify({"ok": False, "error": f"bulk enrollment failed: {e.__class__.__name__}",
+                        "upload_id": job["id"]}), 500
+    finally:
+        try:
+            os.remove(zip_path)
+        except OSError:
+            pass
+    finish(job, "done")
+    log.info("bulk enrollment: %d rows, %d enrolled, %d updated, %d failed in %.1fs",
+             report["rows"], report["enrolled"], report["updated"], report["failed"], report["seconds"],
+             extra={"admin": session.get("admin"), "rows_per_second": report["rows_per_second"]})
+    return jsonify({"ok": True, "upload_id": job["id"], "report": report})
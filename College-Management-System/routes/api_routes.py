@@ -1,27 +1,228 @@
 # routes/api_routes.py
-from flask import Blueprint, request, jsonify
-from pathlib import Path
-import os, json
-from datetime import datetime
+from flask import Blueprint, request, jsonify, current_app
 
-bp = Blueprint("api", __name__, url_prefix="/api")
-DATA_DIR = os.path.join(Path(__file__).resolve().parents[1], "data")
+from sqlalchemy.exc import SQLAlchemyError
 
-def _load(fname, default=None):
-    p = os.path.join(DATA_DIR, fname)
-    if not os.path.exists(p):
-        return default
-    try:
-        with open(p,"r",encoding="utf-8") as f:
-            return json.load(f)
-    except Exception:
-        return default
+from services import (results_store, VersionConflict, ingest_jobs, marks_sync, roster, storage, student_search,
+                      thumbnails, timeline)
 
-def _save(fname, obj):
-    p = os.path.join(DATA_DIR, fname)
-    with open(p,"w",encoding="utf-8") as f:
-        json.dump(obj, f, ensure_ascii=False, indent=2)
+bp = Blueprint("api", __name__, url_prefix="/api")
 
 @bp.route("/get-marks")
 def get_marks():
-    return jsonify(_load("sessional_marks.json", default={}))
+    """
+    Without arguments: the stored sessional marks document (file or Mark table, see STORAGE_BACKEND).
+    ?since=<cursor>[&limit=N]: only mark rows changed after the cursor (see /api/marks/sync).
+    """
+    if "since" not in request.args:
+        return jsonify(storage.sessional_marks(default={}))
+    since = request.args.get("since", default=0, type=int)
+    limit = request.args.get("limit", default=1000, type=int)
+    try:
+        data = marks_sync.changes_since(max(0, since), limit=max(1, min(limit, 5000)))
+    except SQLAlchemyError as e:
+        return jsonify({"ok": False, "error": f"database unavailable: {e.__class__.__name__}"}), 503
+    return jsonify({"ok": True, **data})
+
+@bp.route("/marks/sync", methods=["POST"])
+def marks_sync_changes():
+    """
+    Push changed mark rows only:
+      { "changes": [ { student_id, semester, name, class, roll_no, marks, gpa, version, deleted } ],
+        "savedBy": { id, name } }
+    `version` is the row version the client last saw (0 for a new row). Rows whose
+    version moved on are returned under "conflicts" with the server copy; pull
+    /api/get-marks?since=<cursor> afterwards to pick up other teachers' edits.
+    """
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict) or not isinstance(payload.get("changes"), list):
+        return jsonify({"ok": False, "error": "changes array required"}), 400
+    saved_by = (payload.get("savedBy") or {}).get("id") if isinstance(payload.get("savedBy"), dict) else None
+    try:
+        result = storage.apply_marks_changes(payload["changes"], saved_by=saved_by)
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+    except SQLAlchemyError as e:
+        return jsonify({"ok": False, "error": f"database unavailable: {e.__class__.__name__}"}), 503
+    return jsonify({"ok": True, **result})
+
+# ---------- STUDENT SEARCH ----------
+@bp.route("/students/search")
+def students_search():
+    """
+    Typeahead search over name, roll_no, student_id and class.
+    ?q=<terms>&page=1&per_page=20[&class=CS-B]; every term is a prefix match.
+    """
+    q = request.args.get("q", "")
+    page = request.args.get("page", default=1, type=int)
+    per_page = request.args.get("per_page", default=20, type=int)
+    data = student_search.search(q, page=page, per_page=per_page, class_name=request.args.get("class"))
+    return jsonify({"ok": True, **data})
+
+# ---------- ROSTER (paged views over the Student / Teacher tables) ----------
+def _with_avatars(data):
+    """Adds item["avatar"]: a cacheable thumbnail URL (?avatar=<px>, default 48) or None for legacy images."""
+    size = request.args.get("avatar", default=48, type=int)
+    thumbnails.configure(sizes=current_app.config.get("THUMBNAIL_SIZES"))
+    for item in data["items"]:
+        item["avatar"] = thumbnails.url_for_image(item.get("face_image"), size) if size > 0 else None
+    return data
+
+@bp.route("/roster/students")
+def roster_students():
+    """?page=1&per_page=25&sort=name|student_id|class|roll_no|enrolled_at&order=asc|desc[&class=CS-B][&avatar=48]"""
+    try:
+        data = roster.students(page=request.args.get("page", default=1, type=int),
+                               per_page=request.args.get("per_page", default=25, type=int),
+                               sort=request.args.get("sort", "name"),
+                               order=request.args.get("order", "asc"),
+                               class_name=request.args.get("class"))
+    except SQLAlchemyError as e:
+        return jsonify({"ok": False, "error": f"database unavailable: {e.__class__.__name__}"}), 503
+    return jsonify({"ok": True, **_with_avatars(data)})
+
+@bp.route("/roster/teachers")
+def roster_teachers():
+    """?page=1&per_page=25&sort=name|teacher_id|department|enrolled_at&order=asc|desc[&department=...][&avatar=48]"""
+    try:
+        data = roster.teachers(page=request.args.get("page", default=1, type=int),
+                               per_page=request.args.get("per_page", default=25, type=int),
+                               sort=request.args.get("sort", "name"),
+                               order=request.args.get("order", "asc"),
+                               department=request.args.get("department"))
+    except SQLAlchemyError as e:
+        return jsonify({"ok": False, "error": f"database unavailable: {e.__class__.__name__}"}), 503
+    return jsonify({"ok": True, **_with_avatars(data)})
+
+@bp.route("/roster/counts")
+def roster_counts():
+    """Cached totals per class and per department."""
+    try:
+        return jsonify({"ok": True, "counts": roster.counts()})
+    except SQLAlchemyError as e:
+        return jsonify({"ok": False, "error": f"database unavailable: {e.__class__.__name__}"}), 503
+
+# ---------- TIME RANGES / BUCKETS (integer-epoch indexes on Attendance and Mark) ----------
+def _timeline(fn, **kwargs):
+    """Runs a services.timeline query with the common ?from=&to= arguments (epoch seconds, ISO or YYYY-MM-DD)."""
+    try:
+        data = fn(start=request.args.get("from"), end=request.args.get("to"), **kwargs)
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+    except SQLAlchemyError as e:
+        return jsonify({"ok": False, "error": f"database unavailable: {e.__class__.__name__}"}), 503
+    return jsonify({"ok": True, **data})
+
+@bp.route("/attendance/range")
+def attendance_range():
+    """?from=&to=[&student_id=&status=&session=&limit=200&after=<next>] (default: last 30 days)"""
+    return _timeline(timeline.attendance_range,
+                     student_id=request.args.get("student_id"),
+                     status=request.args.get("status"),
+                     session_id=request.args.get("session"),
+                     limit=request.args.get("limit", default=200, type=int),
+                     after=request.args.get("after"))
+
+@bp.route("/attendance/buckets")
+def attendance_buckets():
+    """?bucket=hour|day|week&from=&to=[&tz_offset=<minutes>&student_id=&session=] -> counts per status"""
+    return _timeline(timeline.attendance_buckets,
+                     bucket=request.args.get("bucket", "day"),
+                     tz_offset=request.args.get("tz_offset", default=0, type=int),
+                     student_id=request.args.get("student_id"),
+                     session_id=request.args.get("session"))
+
+@bp.route("/marks/range")
+def marks_range():
+    """?from=&to=[&student_id=&semester=&deleted=1&limit=200&after=<next>] by last write time"""
+    return _timeline(timeline.marks_range,
+                     student_id=request.args.get("student_id"),
+                     semester=request.args.get("semester", type=int),
+                     include_deleted=request.args.get("deleted") == "1",
+                     limit=request.args.get("limit", default=200, type=int),
+                     after=request.args.get("after"))
+
+@bp.route("/marks/buckets")
+def marks_buckets():
+    """?bucket=hour|day|week&from=&to=[&tz_offset=<minutes>&student_id=&semester=] -> writes per bucket"""
+    return _timeline(timeline.marks_buckets,
+                     bucket=request.args.get("bucket", "day"),
+                     tz_offset=request.args.get("tz_offset", default=0, type=int),
+                     student_id=request.args.get("student_id"),
+                     semester=request.args.get("semester", type=int))
+
+# ---------- RESULTS ANALYTICS (precomputed per published version) ----------
+def _analytics():
+    return results_store.analytics()
+
+@bp.route("/results/analytics")
+def results_summary():
+    """College-wide CGPA stats, grade histograms and toppers per class/department."""
+    a = _analytics()
+    if a is None:
+        return jsonify({"ok": False, "message": "No semester_results found on server"}), 404
+    top = request.args.get("top", default=5, type=int)
+    return jsonify({"ok": True, "data": a.summary(top=max(1, min(top, 100)))})
+
+@bp.route("/results/toppers")
+def results_toppers():
+    a = _analytics()
+    if a is None:
+        return jsonify({"ok": False, "message": "No semester_results found on server"}), 404
+    k = request.args.get("k", default=10, type=int)
+    rows = a.toppers(max(1, min(k, 500)), class_name=request.args.get("class"),
+                     department=request.args.get("department"))
+    return jsonify({"ok": True, "toppers": rows})
+
+@bp.route("/results/student/<key>")
+def results_student(key):
+    """CGPA, total marks, ranks and percentile for a roll_no or student_id."""
+    a = _analytics()
+    if a is None:
+        return jsonify({"ok": False, "message": "No semester_results found on server"}), 404
+    stats = a.student(key)
+    if stats is None:
+        return jsonify({"ok": False, "message": "not found"}), 404
+    return jsonify({"ok": True, "stats": stats, "version": a.version})
+
+# ---------- SEMESTER RESULTS DELTAS ----------
+@bp.route("/semester-results/delta", methods=["POST"])
+def semester_results_delta():
+    """
+    Upsert / delete individual students or semesters without re-uploading everything.
+    Payload:
+      {
+        "base_version": 7,
+        "upserts": [ { student_id, roll_no, name, class, semesters: [ { sem, year, marks, gpa } ] } ],
+        "deletes": [ { student_id }, { student_id, sem } ]
+      }
+    Returns { ok, version }; 409 with the current version if base_version is stale.
+    """
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify({"ok": False, "error": "Only JSON object accepted"}), 400
+    if "base_version" not in payload:
+        return jsonify({"ok": False, "error": "base_version required"}), 400
+    upserts = payload.get("upserts") or []
+    deletes = payload.get("deletes") or []
+    if not isinstance(upserts, list) or not isinstance(deletes, list):
+        return jsonify({"ok": False, "error": "upserts/deletes must be arrays"}), 400
+
+    results_store.compact_every = current_app.config.get("RESULTS_JOURNAL_COMPACT_EVERY", 200)
+    try:
+        version = results_store.apply_delta(payload["base_version"], upserts, deletes,
+                                            saved_by=payload.get("savedBy"))
+    except VersionConflict as e:
+        return jsonify({"ok": False, "error": "version conflict", "version": e.current}), 409
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+    return jsonify({"ok": True, "version": version, "upserted": len(upserts), "deleted": len(deletes)})
+
+
+@bp.route("/uploads/<upload_id>", methods=["GET"])
+def upload_progress(upload_id):
+    """Progress of a ?stream=1 upload: bytes read, records received/written/rejected, state."""
+    job = ingest_jobs.get(upload_id)
+    if job is None:
+        return jsonify({"ok": False, "error": "unknown upload id"}), 404
+    return jsonify({"ok": True, "upload": job})
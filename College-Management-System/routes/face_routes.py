@@ -1,8 +1,9 @@
 # routes/face_routes.py
 from flask import Blueprint, request, jsonify, current_app, send_file
 from pathlib import Path
-import os, base64, io
-from datetime import datetime
+import os, base64, binascii, io
+
+from services.blobstore import blob_store
 
 bp = Blueprint("face", __name__, url_prefix="/face")
 
@@ -14,67 +15,51 @@ STUDENT_FACES = os.path.join(UPLOADS, "student_faces")
 os.makedirs(TEACHER_FACES, exist_ok=True)
 os.makedirs(STUDENT_FACES, exist_ok=True)
 
-def _save_dataurl(dataurl, dest_path):
-    header, encoded = dataurl.split(",",1)
-    data = base64.b64decode(encoded)
-    with open(dest_path, "wb") as f:
-        f.write(data)
-    return dest_path
+IMAGE_FORMATS = {"JPEG": "jpg", "MPO": "jpg", "PNG": "png"}
+
+def _image_ext(data):
+    """'jpg' / 'png' when the bytes decode as a JPEG or PNG image, else None."""
+    from PIL import Image
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            img.verify()
+            return IMAGE_FORMATS.get(img.format)
+    except Exception:
+        return None
+
+def _store(upload, photo_data):
+    """Content-addressed save (services/blobstore.py): identical photos are stored once."""
+    data = None
+    if upload and upload.filename:
+        allowed = current_app.config.get("ALLOWED_IMAGE_EXTENSIONS", {"png", "jpg", "jpeg"})
+        if "." not in upload.filename or upload.filename.rsplit(".", 1)[1].lower() not in allowed:
+            return jsonify({"ok": False, "message": "only png / jpg images"}), 400
+        data = upload.read()
+    elif photo_data and photo_data.startswith("data:"):
+        header, _, encoded = photo_data.partition(",")
+        try:
+            data = base64.b64decode(encoded)
+        except (binascii.Error, ValueError):
+            return jsonify({"ok": False, "message": "invalid image data"}), 400
+    if not data:
+        return jsonify({"ok": False, "message":"no image"}), 400
+    ext = _image_ext(data)
+    if ext is None:
+        return jsonify({"ok": False, "message": "not a png / jpg image"}), 400
+    # nothing records this upload yet: no reference, so an abandoned photo is collected by recount()
+    blob = blob_store.put(data, ext, ref=False)
+    return jsonify({"ok": True, "path": blob["path"], "digest": blob["digest"], "url": blob["url"]})
 
 @bp.route("/enroll/teacher", methods=["POST"])
 def enroll_teacher():
-    # Accepts form fields teacher_id,name and photo (file or dataurl)
-    teacher_id = request.form.get("teacher_id") or request.form.get("id")
+    # Accepts a photo (file or dataurl); returns its blob path / digest / immutable url
     photo_data = request.form.get("photo_base64")
-    if "file" in request.files and request.files["file"]:
-        f = request.files["file"]
-        fname = f"{teacher_id}_{int(datetime.utcnow().timestamp())}_{f.filename}"
-        dest = os.path.join(TEACHER_FACES, fname)
-        f.save(dest)
-        return jsonify({"ok": True, "path": dest})
-    if photo_data and photo_data.startswith("data:"):
-        ext = "jpg"
-        fname = f"{teacher_id}_{int(datetime.utcnow().timestamp())}.{ext}"
-        dest = os.path.join(TEACHER_FACES, fname)
-        _save_dataurl(photo_data, dest)
-        return jsonify({"ok": True, "path": dest})
-    return jsonify({"ok": False, "message":"no image"}), 400
+    return _store(request.files.get("file"), photo_data)
 
 @bp.route("/enroll/student", methods=["POST"])
 def enroll_student():
     # similar to enroll_teacher
-    student_id = request.form.get("student_id") or request.form.get("id")
     photo_data = request.form.get("photo_base64_student") or request.form.get("photo_base64")
-    if "file" in request.files and request.files["file"]:
-        f = request.files["file"]
-        fname = f"{student_id}_{int(datetime.utcnow().timestamp())}_{f.filename}"
-        dest = os.path.join(STUDENT_FACES, fname)
-        f.save(dest)
-        return jsonify({"ok": True, "path": dest})
-    if photo_data and photo_data.startswith("data:"):
-        ext = "jpg"
-        fname = f"{student_id}_{int(datetime.utcnow().timestamp())}.{ext}"
-        dest = os.path.join(STUDENT_FACES, fname)
-        _save_dataurl(photo_data, dest)
-        return jsonify({"ok": True, "path": dest})
-    return jsonify({"ok": False, "message":"no image"}), 400
+    return _store(request.files.get("file"), photo_data)
 
-@bp.route("/recognize", methods=["POST"])
-def recognize():
-    """
-    Replace this stub with your real recognizer.
-    Accepts JSON: { image: dataURL } or multipart file.
-    Returns { ok: True, id, name } on match.
-    """
-    payload = {}
-    if request.is_json:
-        payload = request.get_json()
-    image = payload.get("image") if payload else None
-    if not image and "file" in request.files:
-        f = request.files["file"]
-        tmp = os.path.join(UPLOADS, f"capture_{int(datetime.utcnow().timestamp())}_{f.filename}")
-        f.save(tmp)
-        image = None
-        # you can process tmp
-    # stub response
-    return jsonify({"ok": False, "message":"recognition not implemented"})
+# /face/recognize is served by app.face_recognize (frame gate + capture persistence).
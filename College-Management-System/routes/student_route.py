@@ -1,22 +1,11 @@
-# routes/student_routes.py
+# routes/student_route.py
 from flask import Blueprint, render_template, request, jsonify, send_file, current_app
-from pathlib import Path
-import os, json, io, csv
+import io, csv
 from datetime import datetime
 
-bp = Blueprint("student", __name__, url_prefix="")
-
-DATA_DIR = os.path.join(Path(__file__).resolve().parents[1], "data")
+from services import results_store
 
-def _load(fname, default=None):
-    p = os.path.join(DATA_DIR, fname)
-    if not os.path.exists(p):
-        return default
-    try:
-        with open(p,"r",encoding="utf-8") as f:
-            return json.load(f)
-    except Exception:
-        return default
+bp = Blueprint("student", __name__, url_prefix="")
 
 @bp.route("/results")
 def results_page():
@@ -30,23 +19,20 @@ def lookup_student():
     Returns JSON student data if present in semester_results.json
     """
     q = request.args.get("q")
-    data = _load("semester_results.json", default=None)
-    if not data:
+    analytics = results_store.analytics()
+    if analytics is None:
         return jsonify({"ok": False, "message": "No results on server"}), 404
-    # accept wrapper { _meta, records }
-    records = data.get("records") if isinstance(data, dict) and data.get("records") else data if isinstance(data, list) else []
-    for r in records:
-        if str(r.get("roll_no")) == str(q) or str(r.get("student_id")) == str(q):
-            return jsonify({"ok": True, "student": r})
+    r = analytics.record(q)
+    if r is not None:
+        return jsonify({"ok": True, "student": r})
     return jsonify({"ok": False, "message": "not found"}), 404
 
 @bp.route("/student/download/<roll_no>.csv")
 def download_student_csv(roll_no):
-    data = _load("semester_results.json", default=None)
-    if not data:
+    analytics = results_store.analytics()
+    if analytics is None:
         return "No results stored", 404
-    records = data.get("records") if isinstance(data, dict) else data
-    student = next((r for r in records if str(r.get("roll_no"))==str(roll_no) or str(r.get("student_id"))==str(roll_no)), None)
+    student = analytics.record(roll_no)
     if not student:
         return "No student", 404
     # build CSV
@@ -1,27 +1,18 @@
 # routes/teacher_routes.py
 from flask import Blueprint, render_template, request, redirect, url_for, jsonify, session, flash, current_app
 from pathlib import Path
-import os, json, csv, io
+import os, csv, io, logging
 from datetime import datetime
 
-bp = Blueprint("teacher", __name__, url_prefix="/teacher")
+from recognition import class_sessions, roster_for_class, normalize_class
+from sqlalchemy.exc import SQLAlchemyError
 
-DATA_DIR = os.path.join(Path(__file__).resolve().parents[1], "data")
+from services import reconcile, storage
 
-def _load(fname, default=[]):
-    p = os.path.join(DATA_DIR, fname)
-    if not os.path.exists(p):
-        return default
-    try:
-        with open(p,"r",encoding="utf-8") as f:
-            return json.load(f)
-    except Exception:
-        return default
+bp = Blueprint("teacher", __name__, url_prefix="/teacher")
+log = logging.getLogger(__name__)
 
-def _save(fname, obj):
-    p = os.path.join(DATA_DIR, fname)
-    with open(p,"w",encoding="utf-8") as f:
-        json.dump(obj, f, ensure_ascii=False, indent=2)
+DATA_DIR = os.path.join(Path(__file__).resolve().parents[1], "data")
 
 @bp.route("/login", methods=["GET","POST"])
 def login():
@@ -40,7 +31,7 @@ def dashboard():
         flash("Please log in", "warning")
         return redirect(url_for("teacher.login"))
     # load current working marks if any (sessional marks)
-    marks = _load("sessional_marks.json", default={}).get("records", [])
+    marks = (storage.sessional_marks(default=None) or {}).get("records", [])
     return render_template("teacher_dashboard.html", marks=marks, teacher=session.get("teacher"))
 
 @bp.route("/upload-csv", methods=["POST"])
@@ -62,11 +53,71 @@ def upload_csv():
 @bp.route("/save-marks", methods=["POST"])
 def save_marks():
     """
-    Accepts JSON payload like { marks: [ ... ], meta: {...} } and stores server-side
+    Accepts JSON payload like { marks: [ ... ], meta: {...} } and stores server-side.
+    { changes: [ ... ] } instead syncs only the changed rows (see /api/marks/sync).
     """
     data = request.get_json() or {}
+    if isinstance(data.get("changes"), list):
+        try:
+            result = storage.apply_marks_changes(data["changes"], saved_by=session.get("teacher", {}).get("id"))
+        except ValueError as e:
+            return jsonify({"ok": False, "error": str(e)}), 400
+        return jsonify({"ok": True, **result})
     marks = data.get("marks") or []
     meta = data.get("meta") or {"lastSavedAt": datetime.utcnow().isoformat(), "lastSavedBy": session.get("teacher", {})}
-    to_store = {"_meta": meta, "records": marks}
-    _save("sessional_marks.json", to_store)
+    try:
+        storage.save_sessional_marks(marks, meta)
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
     return jsonify({"ok": True, "saved_at": meta["lastSavedAt"]})
+
+# ---------- CLASS SESSIONS ----------
+@bp.route("/session/start", methods=["POST"])
+def start_session():
+    """
+    Starts a class session for one section, e.g. { class_name: "CS-B" }.
+    Recognition requests carrying the returned session id are matched against
+    that section's roster first.
+    """
+    if "teacher" not in session:
+        return jsonify({"ok": False, "message": "login required"}), 401
+    data = request.get_json(silent=True) or request.form
+    class_name = (data.get("class_name") or "").strip()
+    if not class_name:
+        return jsonify({"ok": False, "message": "class_name required"}), 400
+
+    tid = session["teacher"].get("id")
+    teacher = storage.find_profile("teacher", tid)
+    if teacher and teacher.get("assigned_classes"):
+        assigned = {normalize_class(c) for c in teacher["assigned_classes"].split(",") if c.strip()}
+        if normalize_class(class_name) not in assigned:
+            return jsonify({"ok": False, "message": "class not assigned to this teacher"}), 403
+
+    roster = roster_for_class(storage.profiles("student"), class_name)
+    cs = class_sessions.start(class_name, teacher_id=tid, roster=roster)
+    return jsonify({"ok": True, "session": cs.to_dict()})
+
+@bp.route("/session/<session_id>/end", methods=["POST"])
+def end_session(session_id):
+    """
+    Ends a class session and writes its full register to the Attendance table:
+    present / late for recognized students, absent for the rest of the section.
+    If the register cannot be written the session stays open so ending can be retried.
+    """
+    if "teacher" not in session:
+        return jsonify({"ok": False, "message": "login required"}), 401
+    cs = class_sessions.get(session_id)
+    if cs is None:
+        return jsonify({"ok": False, "message": "unknown session"}), 404
+    try:
+        register = reconcile.close_session(
+            cs, late_after_minutes=current_app.config.get("ATTENDANCE_LATE_AFTER_MINUTES", 10))
+    except SQLAlchemyError:
+        log.exception("attendance reconciliation failed", extra={"session_id": session_id})
+        return jsonify({"ok": False, "message": "could not write the attendance register, try again"}), 503
+    cs = class_sessions.end(session_id) or cs
+    return jsonify({"ok": True, "session": cs.to_dict(), "attendance": register})
+
+@bp.route("/sessions")
+def list_sessions():
+    return jsonify({"ok": True, "sessions": [cs.to_dict() for cs in class_sessions.active()]})
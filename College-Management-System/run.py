@@ -12,14 +12,21 @@ Usage:
   # Use waitress WSGI server (recommended for simple production)
   python run.py --waitress
 
+  # Also start an ingestion worker per camera / video source (see ingest_worker.py)
+  python run.py --waitress --ingest 0 --ingest rtsp://10.0.0.12/stream
+
 Environment:
   - FLASK_ENV=production   => uses ProductionConfig from config.py
   - FLASK_ENV=development  => uses DevelopmentConfig (default)
   - FLASK_SECRET_KEY       => override secret key
+  - LOG_LEVEL / LOG_FORMAT => log threshold, and "json" (default) or "text" lines on stderr
 """
 import os
+import sys
+import atexit
 import argparse
 import logging
+import subprocess
 from pathlib import Path
 
 # import app and config classes
@@ -28,6 +35,9 @@ try:
 except Exception as e:
     raise RuntimeError("Unable to import Flask app from app.py — ensure app.py exists and defines `app`.") from e
 
+from services.health import readiness
+from services.log_pipeline import setup_logging
+
 try:
     from config import DevelopmentConfig, ProductionConfig, BaseConfig
 except Exception:
@@ -87,8 +97,29 @@ def parse_args():
     p.add_argument("--port", default=int(os.environ.get("PORT", 5000)), type=int, help="Port to bind (default 5000)")
     p.add_argument("--waitress", action="store_true", help="Run using waitress (production WSGI) if installed")
     p.add_argument("--debug", action="store_true", help="Enable Flask debug mode (overrides config)")
+    p.add_argument("--ingest", action="append", default=[], metavar="SOURCE",
+                   help="Start ingest_worker.py for this video file / device / stream URL (repeatable)")
+    p.add_argument("--ingest-fps", type=float, default=None, help="Frames per second sampled by --ingest workers")
     return p.parse_args()
 
+def start_ingest_workers(sources, fps=None):
+    """Launch one ingest_worker.py process per source; they are stopped when run.py exits."""
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ingest_worker.py")
+    procs = []
+    for source in sources:
+        cmd = [sys.executable, script, source]
+        if fps:
+            cmd += ["--fps", str(fps)]
+        procs.append(subprocess.Popen(cmd))
+        logging.getLogger(__name__).info("Started ingestion worker (pid %d) for %s", procs[-1].pid, source)
+
+    def stop():
+        for proc in procs:
+            if proc.poll() is None:
+                proc.terminate()
+    atexit.register(stop)
+    return procs
+
 def main():
     args = parse_args()
 
@@ -96,9 +127,8 @@ def main():
     configure_app_from_env()
     ensure_dirs()
 
-    # set logging level
-    logging.basicConfig(level=logging.DEBUG if app.config.get("DEBUG", False) else logging.INFO)
-    logging.getLogger("werkzeug").setLevel(logging.DEBUG if app.config.get("DEBUG", False) else logging.INFO)
+    # queue-backed JSON logging at LOG_LEVEL (request threads never write to the console)
+    setup_logging(app)
 
     host = args.host
     port = args.port
@@ -107,12 +137,22 @@ def main():
         app.config["DEBUG"] = True
         logging.getLogger(__name__).info("Debug mode enabled via CLI flag")
 
+    # with the debug reloader main() runs twice; start workers in the serving child only
+    serving = args.waitress or not app.config.get("DEBUG") or os.environ.get("WERKZEUG_RUN_MAIN") == "true"
+    if args.ingest and serving:
+        start_ingest_workers(args.ingest, fps=args.ingest_fps)
+
+    # load caches and the face index in the background; /readyz answers 503 until done
+    if serving:
+        readiness.warm_up(context=app.app_context)
+
     # Run using waitress if requested and available
     if args.waitress:
         try:
             from waitress import serve
-            logging.getLogger(__name__).info("Starting app with waitress on %s:%d", host, port)
-            serve(app, host=host, port=port)
+            threads = int(app.config.get("WAITRESS_THREADS", 4))
+            logging.getLogger(__name__).info("Starting app with waitress on %s:%d (%d threads)", host, port, threads)
+            serve(app, host=host, port=port, threads=threads)
             return
         except Exception as e:
             logging.getLogger(__name__).warning("waitress not available or failed to start (%s). Falling back to Flask dev server.", e)
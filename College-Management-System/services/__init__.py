@@ -0,0 +1,54 @@
+# services/__init__.py
+
+"""
+Application services shared by app.py and the route blueprints
+(versioned results store, analytics, streaming upload ingestion, marks
+delta sync, student search, rosters, close-session attendance
+reconciliation, the attendance log and its retention, the content-addressed
+upload store with its thumbnails, time-range queries, bulk enrollment, the
+JSON / SQL storage switch with its importer, and other derived data).
+"""
+
+from . import marks_sync, reconcile, retention, serialization, timeline
+from .analytics import ResultsAnalytics
+from .attendance_log import AttendanceLog, attendance_log
+from .blobstore import BlobStore, blob_store
+from .bulk_enroll import BulkEnrollError, BulkEnrollment, bulk_enroll
+from .ingest import IngestError, ingest_jobs
+from .json_import import JsonImporter, import_json
+from .results_store import ResultsStore, VersionConflict, results_store
+from .roster import Roster, roster
+from .storage import Storage, storage
+from .student_search import StudentSearchIndex, student_search
+from .thumbnails import ThumbnailCache, thumbnails
+
+__all__ = [
+    "AttendanceLog",
+    "BlobStore",
+    "BulkEnrollError",
+    "BulkEnrollment",
+    "IngestError",
+    "JsonImporter",
+    "ResultsAnalytics",
+    "ResultsStore",
+    "Roster",
+    "Storage",
+    "StudentSearchIndex",
+    "ThumbnailCache",
+    "VersionConflict",
+    "attendance_log",
+    "blob_store",
+    "bulk_enroll",
+    "import_json",
+    "ingest_jobs",
+    "marks_sync",
+    "reconcile",
+    "results_store",
+    "retention",
+    "roster",
+    "serialization",
+    "storage",
+    "student_search",
+    "thumbnails",
+    "timeline",
+]
@@ -0,0 +1,307 @@
+# services/analytics.py
+"""
+Vectorized results analytics over semester_results.
+
+The published records are flattened once into columnar NumPy arrays (one row
+per student, one row per semester entry) and every aggregate is computed in
+bulk: CGPA, total marks, overall / class / department rank, percentile,
+toppers and grade histogram. services.results_store keeps one snapshot per
+published version and patches it on delta updates, so pages and reports read
+precomputed numbers.
+"""
+
+import re
+
+import numpy as np
+
+# CGPA grade bands (lower edge inclusive), used for the histogram
+GRADE_EDGES = [0.0, 4.0, 5.0, 6.0, 7.0, 8.0, 9.0, 10.0001]
+GRADE_LABELS = ["F", "D", "C", "B", "B+", "A", "A+"]
+
+
+def unwrap_records(raw):
+    """semester_results.json is either { _meta, records } or a bare list."""
+    if isinstance(raw, dict):
+        return raw.get("records") or [], raw.get("_meta") or {}
+    if isinstance(raw, list):
+        return raw, {}
+    return [], {}
+
+
+def department_of(record):
+    """Explicit department, else the leading letters of the class ('CS-B' -> 'CS')."""
+    if record.get("department"):
+        return str(record["department"]).strip().upper()
+    m = re.match(r"\s*([A-Za-z]+)", str(record.get("class") or ""))
+    return m.group(1).upper() if m else ""
+
+
+def _num(v):
+    return float(v) if isinstance(v, (int, float)) and not isinstance(v, bool) else np.nan
+
+
+def _codes(values):
+    """Factorize a list of labels -> (codes array, unique labels)."""
+    uniques, codes = np.unique(np.asarray(values, dtype=object).astype(str), return_inverse=True)
+    return codes.astype(np.int64), [str(u) for u in uniques]
+
+
+def _plain(x):
+    """NumPy float -> int when whole, else rounded float (for JSON / templates)."""
+    x = float(x)
+    return int(x) if x.is_integer() else round(x, 2)
+
+
+def competition_rank(scores, groups=None):
+    """
+    1224-style rank of scores (higher is better) within each group.
+    NaN scores get rank 0 (unranked).
+    """
+    n = scores.shape[0]
+    ranks = np.zeros(n, dtype=np.int64)
+    if n == 0:
+        return ranks
+    if groups is None:
+        groups = np.zeros(n, dtype=np.int64)
+    valid = ~np.isnan(scores)
+    idx = np.flatnonzero(valid)
+    if idx.size == 0:
+        return ranks
+    g, s = groups[idx], scores[idx]
+    order = np.lexsort((-s, g))
+    g_sorted, s_sorted = g[order], s[order]
+    pos = np.arange(idx.size)
+    new_group = np.r_[True, g_sorted[1:] != g_sorted[:-1]]
+    group_start = np.maximum.accumulate(np.where(new_group, pos, 0))
+    # a tie keeps the position of the first student with that score
+    new_score = new_group | np.r_[True, s_sorted[1:] != s_sorted[:-1]]
+    first_of_score = np.maximum.accumulate(np.where(new_score, pos, 0))
+    ranks[idx[order]] = first_of_score - group_start + 1
+    return ranks
+
+
+def _semester_columns(record):
+    """(total marks, marks count, gpa sum, gpa count, semester count) for one record."""
+    sems = record.get("semesters") or []
+    marks = np.asarray([_num(x.get("marks")) for x in sems], dtype=np.float64)
+    gpa = np.asarray([_num(x.get("gpa")) for x in sems], dtype=np.float64)
+    has_m, has_g = ~np.isnan(marks), ~np.isnan(gpa)
+    return marks[has_m].sum(), int(has_m.sum()), gpa[has_g].sum(), int(has_g.sum()), len(sems)
+
+
+class ResultsAnalytics:
+    """
+    Columnar snapshot of one published version of semester results.
+    upsert()/remove() patch single students in place; refresh_ranks() then
+    re-derives ranks and percentiles from the columns without re-reading records.
+    """
+
+    # per-student NumPy columns, kept aligned row for row
+    COLUMNS = ("total_marks", "marks_count", "gpa_sum", "gpa_cnt", "semester_count", "class_codes", "dept_codes")
+
+    def __init__(self, records, meta=None, version=None):
+        self.meta = meta or {}
+        self.version = version
+        self.records = list(records)
+        n = len(self.records)
+        self.student_ids = [str(r.get("student_id") or "") for r in self.records]
+        self.roll_nos = [str(r.get("roll_no") or "") for r in self.records]
+        self.names = [r.get("name") for r in self.records]
+        self.class_codes, self.classes = _codes([r.get("class") or "" for r in self.records])
+        self.dept_codes, self.departments = _codes([department_of(r) for r in self.records])
+
+        # flatten semesters: owner index + marks/gpa columns
+        owner, marks, gpa = [], [], []
+        for i, r in enumerate(self.records):
+            for s in r.get("semesters") or []:
+                owner.append(i)
+                marks.append(_num(s.get("marks")))
+                gpa.append(_num(s.get("gpa")))
+        owner = np.asarray(owner, dtype=np.int64)
+        marks = np.asarray(marks, dtype=np.float64)
+        gpa = np.asarray(gpa, dtype=np.float64)
+
+        has_marks, has_gpa = ~np.isnan(marks), ~np.isnan(gpa)
+        self.total_marks = np.bincount(owner[has_marks], weights=marks[has_marks], minlength=n)
+        self.marks_count = np.bincount(owner[has_marks], minlength=n)
+        self.gpa_sum = np.bincount(owner[has_gpa], weights=gpa[has_gpa], minlength=n)
+        self.gpa_cnt = np.bincount(owner[has_gpa], minlength=n)
+        self.semester_count = np.bincount(owner, minlength=n)
+
+        self._by_key = {}
+        for i in range(n):
+            self._index_keys(i)
+        self.refresh_ranks()
+
+    def _index_keys(self, i):
+        for key in (self.roll_nos[i], self.student_ids[i]):
+            if key:
+                self._by_key.setdefault(key, i)
+
+    def _unindex_keys(self, i):
+        for key in (self.roll_nos[i], self.student_ids[i]):
+            if key and self._by_key.get(key) == i:
+                del self._by_key[key]
+
+    def refresh_ranks(self):
+        """Re-derive CGPA, ranks and percentiles from the per-student columns."""
+        n = len(self.records)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            self.cgpa = np.where(self.gpa_cnt > 0, self.gpa_sum / np.maximum(self.gpa_cnt, 1), np.nan)
+        self.rank = competition_rank(self.cgpa)
+        self.class_rank = competition_rank(self.cgpa, self.class_codes)
+        self.dept_rank = competition_rank(self.cgpa, self.dept_codes)
+
+        ranked = np.sort(self.cgpa[~np.isnan(self.cgpa)])
+        self.ranked_count = int(ranked.size)
+        if ranked.size:
+            # share of ranked students with a CGPA at or below this one
+            pct = np.searchsorted(ranked, self.cgpa, side="right") / ranked.size * 100.0
+            self.percentile = np.where(np.isnan(self.cgpa), np.nan, pct)
+        else:
+            self.percentile = np.full(n, np.nan)
+
+    @staticmethod
+    def _code(labels, label):
+        if label not in labels:
+            labels.append(label)
+        return labels.index(label)
+
+    def upsert(self, record):
+        """Insert or replace one student's row (matched by student_id, then roll_no)."""
+        i = self.index_of(record.get("student_id"))
+        if i is None:
+            i = self.index_of(record.get("roll_no"))
+        cols = _semester_columns(record)
+        class_code = self._code(self.classes, str(record.get("class") or ""))
+        dept_code = self._code(self.departments, department_of(record))
+        if i is None:
+            i = len(self.records)
+            self.records.append(record)
+            self.student_ids.append("")
+            self.roll_nos.append("")
+            self.names.append(None)
+            for col in self.COLUMNS:
+                arr = getattr(self, col)
+                setattr(self, col, np.append(arr, np.zeros(1, dtype=arr.dtype)))
+        else:
+            self._unindex_keys(i)
+            self.records[i] = record
+        self.student_ids[i] = str(record.get("student_id") or "")
+        self.roll_nos[i] = str(record.get("roll_no") or "")
+        self.names[i] = record.get("name")
+        (self.total_marks[i], self.marks_count[i], self.gpa_sum[i],
+         self.gpa_cnt[i], self.semester_count[i]) = cols
+        self.class_codes[i] = class_code
+        self.dept_codes[i] = dept_code
+        self._index_keys(i)
+        return i
+
+    def remove(self, key):
+        """Drop a student (swap-remove: the last row takes its place)."""
+        i = self.index_of(key)
+        if i is None:
+            return False
+        last = len(self.records) - 1
+        self._unindex_keys(i)
+        if i != last:
+            self._unindex_keys(last)
+            for lst in (self.records, self.student_ids, self.roll_nos, self.names):
+                lst[i] = lst[last]
+            for col in self.COLUMNS:
+                arr = getattr(self, col)
+                arr[i] = arr[last]
+            self._index_keys(i)
+        for lst in (self.records, self.student_ids, self.roll_nos, self.names):
+            lst.pop()
+        for col in self.COLUMNS:
+            setattr(self, col, getattr(self, col)[:last])
+        return True
+
+    def __len__(self):
+        return len(self.student_ids)
+
+    def index_of(self, key):
+        return self._by_key.get(str(key))
+
+    def record(self, key):
+        """The published record for a roll_no or student_id."""
+        i = self.index_of(key)
+        return None if i is None else self.records[i]
+
+    def student(self, key):
+        """Precomputed numbers for one student (roll_no or student_id)."""
+        i = self.index_of(key)
+        if i is None:
+            return None
+        return self._row(i)
+
+    def _row(self, i):
+        cgpa = self.cgpa[i]
+        return {
+            "student_id": self.student_ids[i],
+            "roll_no": self.roll_nos[i],
+            "name": self.names[i],
+            "class": self.classes[self.class_codes[i]],
+            "department": self.departments[self.dept_codes[i]],
+            "semesters": int(self.semester_count[i]),
+            "total_marks": _plain(self.total_marks[i]) if self.marks_count[i] else None,
+            "cgpa": None if np.isnan(cgpa) else round(float(cgpa), 2),
+            "rank": int(self.rank[i]) or None,
+            "class_rank": int(self.class_rank[i]) or None,
+            "department_rank": int(self.dept_rank[i]) or None,
+            "percentile": None if np.isnan(self.percentile[i]) else round(float(self.percentile[i]), 2),
+        }
+
+    def toppers(self, k=10, class_name=None, department=None):
+        mask = ~np.isnan(self.cgpa)
+        if class_name is not None:
+            if class_name not in self.classes:
+                return []
+            mask &= self.class_codes == self.classes.index(class_name)
+        if department is not None:
+            if department not in self.departments:
+                return []
+            mask &= self.dept_codes == self.departments.index(department)
+        idx = np.flatnonzero(mask)
+        if idx.size == 0:
+            return []
+        top = idx[np.lexsort((idx, -self.cgpa[idx]))][:k]
+        return [self._row(int(i)) for i in top]
+
+    def histogram(self, codes=None, code=None):
+        cg = self.cgpa if codes is None else self.cgpa[codes == code]
+        counts, _ = np.histogram(cg[~np.isnan(cg)], bins=GRADE_EDGES)
+        return dict(zip(GRADE_LABELS, (int(c) for c in counts)))
+
+    def summary(self, top=5):
+        valid = self.cgpa[~np.isnan(self.cgpa)]
+        per_class = {}
+        for code, name in enumerate(self.classes):
+            members = self.class_codes == code
+            if not members.any():
+                continue
+            cg = self.cgpa[members]
+            cg = cg[~np.isnan(cg)]
+            per_class[name] = {
+                "students": int(members.sum()),
+                "mean_cgpa": round(float(cg.mean()), 2) if cg.size else None,
+                "histogram": self.histogram(self.class_codes, code),
+                "toppers": self.toppers(top, class_name=name),
+            }
+        return {
+            "version": self.version,
+            "students": len(self),
+            "ranked": self.ranked_count,
+            "mean_cgpa": round(float(valid.mean()), 2) if valid.size else None,
+            "median_cgpa": round(float(np.median(valid)), 2) if valid.size else None,
+            "histogram": self.histogram(),
+            "toppers": self.toppers(top),
+            "classes": per_class,
+            "departments": {
+                name: {"students": int((self.dept_codes == code).sum()),
+                       "toppers": self.toppers(top, department=name)}
+                for code, name in enumerate(self.departments)
+                if (self.dept_codes == code).any()
+            },
+        }
@@ -0,0 +1,157 @@
+# services/attendance_log.py
+"""
+Month-partitioned attendance log.
+
+Recognized captures used to be appended to data/attendance.json by loading and
+rewriting the whole file, so every mark got slower as the term went on. Records
+now go to data/attendance/<YYYY-MM>.jsonl, one JSON object per line, written
+with a single append (safe to share between the web app and ingest_worker.py).
+Readers only open the months they ask for. Closed months can be compacted into
+<YYYY-MM>.jsonl.gz by the retention task (see services/retention.py); both
+forms are read transparently.
+
+An existing data/attendance.json is split into partitions on first use and
+renamed to attendance.json.migrated.
+"""
+
+import gzip
+import os
+import re
+import threading
+from pathlib import Path
+
+from .serialization import dumps_str, load_file, loads
+
+DATA_DIR = os.path.join(Path(__file__).resolve().parents[1], "data")
+PARTITION_DIR = os.path.join(DATA_DIR, "attendance")
+LEGACY_FILE = os.path.join(DATA_DIR, "attendance.json")
+
+UNDATED = "undated"  # partition for records without a usable timestamp
+_MONTH = re.compile(r"^(\d{4})-(\d{2})")
+_PART = re.compile(r"^(\d{4}-\d{2}|" + UNDATED + r")\.jsonl(\.gz)?$")
+
+
+def month_of(ts):
+    """'2026-10-19T09:07:52' -> '2026-10'."""
+    m = _MONTH.match(str(ts or ""))
+    return f"{m.group(1)}-{m.group(2)}" if m else UNDATED
+
+
+class AttendanceLog:
+    def __init__(self, root=PARTITION_DIR, legacy_path=LEGACY_FILE):
+        self.root = root
+        self.legacy_path = legacy_path
+        self._lock = threading.Lock()
+        self._migrated = False
+
+    def _path(self, month, compressed=False):
+        return os.path.join(self.root, f"{month}.jsonl" + (".gz" if compressed else ""))
+
+    def _ensure_ready(self):
+        if self._migrated:
+            return
+        os.makedirs(self.root, exist_ok=True)
+        if os.path.exists(self.legacy_path):
+            legacy = load_file(self.legacy_path, default=[])
+            by_month = {}
+            for record in legacy if isinstance(legacy, list) else []:
+                by_month.setdefault(month_of(record.get("ts")), []).append(record)
+            for month, records in by_month.items():
+                with open(self._path(month), "a", encoding="utf-8") as f:
+                    f.writelines(dumps_str(r) + "\n" for r in records)
+            os.replace(self.legacy_path, self.legacy_path + ".migrated")
+        self._migrated = True
+
+    # ---------- writes ----------
+    def append(self, record):
+        line = dumps_str(record) + "\n"
+        with self._lock:
+            self._ensure_ready()
+            with open(self._path(month_of(record.get("ts"))), "a", encoding="utf-8") as f:
+                f.write(line)
+
+    def clear(self):
+        with self._lock:
+            self._ensure_ready()
+            for month, files in self._partitions().items():
+                for path in files:
+                    os.remove(path)
+
+    def compress(self, month):
+        """Fold <month>.jsonl into <month>.jsonl.gz. Returns bytes read from the plain file."""
+        with self._lock:
+            plain, packed = self._path(month), self._path(month, compressed=True)
+            if not os.path.exists(plain):
+                return 0
+            size = os.path.getsize(plain)
+            tmp = packed + ".tmp"
+            with gzip.open(tmp, "wb") as out:
+                if os.path.exists(packed):
+                    with gzip.open(packed, "rb") as old:
+                        for chunk in iter(lambda: old.read(1 << 20), b""):
+                            out.write(chunk)
+                with open(plain, "rb") as f:
+                    for chunk in iter(lambda: f.read(1 << 20), b""):
+                        out.write(chunk)
+            os.replace(tmp, packed)
+            os.remove(plain)
+            return size
+
+    # ---------- reads ----------
+    def _partitions(self):
+        """month -> [existing files], compressed first (older lines come first)."""
+        out = {}
+        try:
+            names = os.listdir(self.root)
+        except OSError:
+            return out
+        for name in names:
+            m = _PART.match(name)
+            if m:
+                out.setdefault(m.group(1), []).append(os.path.join(self.root, name))
+        for files in out.values():
+            files.sort(key=lambda p: not p.endswith(".gz"))
+        return out
+
+    def months(self):
+        with self._lock:
+            self._ensure_ready()
+            return sorted(self._partitions())
+
+    def partition_stats(self):
+        with self._lock:
+            self._ensure_ready()
+            return {month: {"files": [os.path.basename(p) for p in files],
+                            "bytes": sum(os.path.getsize(p) for p in files)}
+                    for month, files in sorted(self._partitions().items())}
+
+    def iter_records(self, start=None, end=None):
+        """Records of months start..end inclusive ('YYYY-MM', either may be None), oldest month first."""
+        with self._lock:
+            self._ensure_ready()
+            parts = self._partitions()
+        for month in sorted(parts):
+            if month != UNDATED and ((start and month < start) or (end and month > end)):
+                continue
+            if month == UNDATED and (start or end):
+                continue
+            for path in parts[month]:
+                opener = gzip.open if path.endswith(".gz") else open
+                try:
+                    with opener(path, "rt", encoding="utf-8") as f:
+                        for line in f:
+                            line = line.strip()
+                            if line:
+                                try:
+                                    yield loads(line)
+                                except ValueError:
+                                    continue  # torn last line from a crash mid-append
+                except OSError:
+                    continue
+
+    def read(self, start=None, end=None):
+        return list(self.iter_records(start, end))
+
+
+# shared log used by app.py (/face/recognize, ingest worker) and the retention task
+attendance_log = AttendanceLog()
@@ -0,0 +1,236 @@
+# services/blobstore.py
+"""
+Content-addressed store for uploaded face images.
+
+A file is stored once under the SHA-256 of its bytes, fanned out over two
+directory levels so no directory grows past a few hundred entries:
+
+    static/uploads/blobs/ab/cd/abcd1234....jpg
+
+Re-enrolling with the same photo therefore costs nothing on disk. Every
+profile that points at a blob holds one reference (Blob.refcount); release()
+drops one and deletes the file when none are left, and recount() rebuilds the
+counts from students.json / teachers.json and collects unreferenced blobs.
+Because a blob's bytes can never change under its name, /blobs/<digest>.<ext>
+is served with a one-year immutable Cache-Control.
+"""
+
+import hashlib
+import os
+import re
+import tempfile
+from collections import Counter
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+
+from database.models import Blob, db
+
+BASE_DIR = str(Path(__file__).resolve().parents[1])
+BLOB_DIR = os.path.join(BASE_DIR, "static", "uploads", "blobs")
+
+EXTS = {"jpg": "jpg", "jpeg": "jpg", "png": "png"}
+_DIGEST = re.compile(r"^[0-9a-f]{64}$")
+
+
+def normalize_ext(ext):
+    return EXTS.get(str(ext or "").lower().lstrip("."), "jpg")
+
+
+def is_digest(value):
+    return bool(_DIGEST.match(str(value or "")))
+
+
+class BlobStore:
+    def __init__(self, root=BLOB_DIR, base_dir=BASE_DIR):
+        self.root = root
+        self.base_dir = base_dir
+
+    # ---------- layout ----------
+    def path_for(self, digest, ext):
+        return os.path.join(self.root, digest[:2], digest[2:4], f"{digest}.{normalize_ext(ext)}")
+
+    def relpath(self, digest, ext):
+        """Path relative to the app directory, as stored in profile["face_image"]."""
+        return os.path.relpath(self.path_for(digest, ext), self.base_dir)
+
+    @staticmethod
+    def url(digest, ext):
+        return f"/blobs/{digest}.{normalize_ext(ext)}"
+
+    def lookup(self, digest):
+        """(absolute path, ext) of a stored blob, or None."""
+        if not is_digest(digest):
+            return None
+        row = db.session.get(Blob, digest)
+        if row is None:
+            return None
+        path = self.path_for(digest, row.ext)
+        return (path, row.ext) if os.path.exists(path) else None
+
+    # ---------- writes ----------
+    def _write(self, digest, ext, data):
+        path = self.path_for(digest, ext)
+        if os.path.exists(path):
+            return path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".part")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)  # readers never see a half-written blob
+        return path
+
+    def _ref(self, digest, ext, size, n=1):
+        bumped = db.session.execute(
+            update(Blob).where(Blob.digest == digest).values(refcount=Blob.refcount + n)).rowcount
+        if not bumped:
+            db.session.add(Blob(digest=digest, ext=normalize_ext(ext), size=size, refcount=n))
+        try:
+            db.session.commit()
+        except IntegrityError:  # another request inserted the same digest first
+            db.session.rollback()
+            db.session.execute(update(Blob).where(Blob.digest == digest).values(refcount=Blob.refcount + n))
+            db.session.commit()
+        return db.session.get(Blob, digest)
+
+    def put(self, data, ext="jpg", ref=True):
+        """
+        Store bytes (deduplicated) and take one reference. With ref=False no
+        reference is taken: the blob stays collectable by recount() until a
+        profile that points at it is counted.
+        Returns {digest, ext, path (relative), url, size, new}.
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        existing = db.session.get(Blob, digest)
+        ext = existing.ext if existing is not None else normalize_ext(ext)
+        new = not os.path.exists(self.path_for(digest, ext))
+        self._write(digest, ext, data)
+        self._ref(digest, ext, len(data), 1 if ref else 0)
+        return {"digest": digest, "ext": ext, "path": self.relpath(digest, ext),
+                "url": self.url(digest, ext), "size": len(data), "new": new}
+
+    def put_many(self, items):
+        """
+        put() for a batch of (bytes, ext): the files are written first, then
+        every reference is taken in one transaction. Returns the blob dicts in order.
+        """
+        digests = [hashlib.sha256(data).hexdigest() for data, _ext in items]
+        if not digests:
+            return []
+        rows = {b.digest: b for b in db.session.execute(
+            select(Blob).where(Blob.digest.in_(set(digests)))).scalars()}
+        exts = {d: row.ext for d, row in rows.items()}
+        counts, sizes, out = Counter(), {}, []
+        for (data, ext), digest in zip(items, digests):
+            ext = exts.setdefault(digest, normalize_ext(ext))
+            new = not os.path.exists(self.path_for(digest, ext))
+            self._write(digest, ext, data)
+            counts[digest] += 1
+            sizes[digest] = len(data)
+            out.append({"digest": digest, "ext": ext, "path": self.relpath(digest, ext),
+                        "url": self.url(digest, ext), "size": len(data), "new": new})
+        for digest, n in counts.items():
+            if digest in rows:
+                db.session.execute(update(Blob).where(Blob.digest == digest).values(refcount=Blob.refcount + n))
+            else:
+                db.session.add(Blob(digest=digest, ext=exts[digest], size=sizes[digest], refcount=n))
+        try:
+            db.session.commit()
+        except IntegrityError:  # a concurrent put() inserted one of the digests; take them one by one
+            db.session.rollback()
+            for digest, n in counts.items():
+                self._ref(digest, exts[digest], sizes[digest], n)
+        return out
+
+    def release(self, digest):
+        """Drop one reference; the file goes when the last one does. Returns the remaining count."""
+        row = db.session.get(Blob, digest)
+        if row is None:
+            return 0
+        row.refcount = max(0, (row.refcount or 0) - 1)
+        remaining = row.refcount
+        if remaining == 0:
+            path = self.path_for(digest, row.ext)
+            db.session.delete(row)
+            db.session.commit()
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        else:
+            db.session.commit()
+        return remaining
+
+    def release_many(self, digests):
+        """release() for several references (a digest may repeat) in one transaction."""
+        counts = Counter(d for d in digests if is_digest(d))
+        if not counts:
+            return 0
+        gone = []
+        for row in db.session.execute(select(Blob).where(Blob.digest.in_(list(counts)))).scalars():
+            row.refcount = max(0, (row.refcount or 0) - counts[row.digest])
+            if row.refcount == 0:
+                gone.append(self.path_for(row.digest, row.ext))
+                db.session.delete(row)
+        db.session.commit()
+        for path in gone:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        return len(gone)
+
+    def recount(self, references, grace_days=1, dry_run=False):
+        """
+        references: {digest: count} from the profiles (the source of truth).
+        Sets every refcount to match and deletes blobs nobody references that
+        are older than grace_days (files without a row, e.g. from a failed
+        request, are collected too). Returns {updated, collected, bytes_freed}.
+        """
+        cutoff = (datetime.utcnow() - timedelta(days=grace_days)).isoformat()
+        report = {"updated": 0, "collected": 0, "bytes_freed": 0}
+        rows = {b.digest: b for b in db.session.execute(select(Blob)).scalars()}
+        for digest, row in rows.items():
+            want = references.get(digest, 0)
+            if want == 0 and (row.created_at or "") < cutoff:
+                report["collected"] += 1
+                report["bytes_freed"] += row.size or 0
+                if not dry_run:
+                    db.session.execute(delete(Blob).where(Blob.digest == digest))
+                    try:
+                        os.remove(self.path_for(digest, row.ext))
+                    except OSError:
+                        pass
+            elif row.refcount != want:
+                report["updated"] += 1
+                if not dry_run:
+                    row.refcount = want
+        # stray files with no row at all
+        for dirpath, _dirs, files in os.walk(self.root):
+            for name in files:
+                digest = name.split(".", 1)[0]
+                path = os.path.join(dirpath, name)
+                if digest in rows or not is_digest(digest):
+                    continue
+                if datetime.utcfromtimestamp(os.path.getmtime(path)).isoformat() >= cutoff:
+                    continue
+                report["collected"] += 1
+                report["bytes_freed"] += os.path.getsize(path)
+                if not dry_run:
+                    os.remove(path)
+        if not dry_run:
+            db.session.commit()
+        return report
+
+
+def digest_of_path(rel_path):
+    """Blob digest referenced by a stored face_image path, or None for legacy (non-blob) paths."""
+    name = os.path.basename(str(rel_path or "").replace("\\", "/"))
+    digest = name.split(".", 1)[0]
+    return digest if is_digest(digest) else None
+
+
+# shared store used by app.py (enrollment) and routes/face_routes.py
+blob_store = BlobStore()
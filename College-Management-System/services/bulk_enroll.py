@@ -0,0 +1,451 @@
+# services/bulk_enroll.py
+"""
+Bulk enrollment from a roster CSV plus a ZIP of photos.
+
+The CSV has one person per row; column names are matched loosely
+(student_id / teacher_id / id, name / student_name, class / class_section,
+roll_no, department, assigned_classes, photo, kind). A row's photo is the
+archive member named in its `photo` column, or else the member whose file
+name (without extension) is the person's id, in any folder of the archive.
+
+The archive is never extracted. Only its central directory is read up front.
+Worker processes open it themselves and read one member at a time. Each
+worker normalizes the photo: EXIF orientation applied, RGB, longest side
+capped, re-encoded as JPEG. It also computes the face embedding when
+face_recognition is installed. Only the normalized JPEG and the embedding
+come back to this process.
+
+Results are committed in batches. The photos go into the blob store with one
+transaction for all of their references. The profiles are upserted into
+students.json / teachers.json with one file write per batch (not with
+STORAGE_BACKEND=sql), and the roster tables get one transaction per batch. A row that fails is reported with its
+CSV line and the reason, and the rest of the import carries on.
+
+Must run inside an app context (blob store and roster tables).
+"""
+
+import csv
+import io
+import multiprocessing
+import os
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+from pathlib import Path
+
+from flask import current_app, has_app_context
+
+from .blobstore import blob_store, digest_of_path
+from .roster import roster
+from .serialization import dump_file, load_file
+from .storage import storage
+from .student_search import student_search
+
+DATA_DIR = os.path.join(Path(__file__).resolve().parents[1], "data")
+
+KINDS = {"student": ("students.json", "student_id"), "teacher": ("teachers.json", "teacher_id")}
+PHOTO_EXTS = (".jpg", ".jpeg", ".png")
+
+# loose CSV header -> field
+_COLUMNS = {
+    "id": "id", "student_id": "id", "teacher_id": "id", "student_no": "id",
+    "name": "name", "student_name": "name", "teacher_name": "name", "full_name": "name",
+    "class": "class", "class_section": "class", "section": "class",
+    "roll_no": "roll_no", "roll": "roll_no", "roll_number": "roll_no",
+    "department": "department", "dept": "department",
+    "assigned_classes": "assigned_classes", "classes": "assigned_classes",
+    "photo": "photo", "photo_file": "photo", "image": "photo", "file": "photo", "filename": "photo",
+    "kind": "kind", "role": "kind", "type": "kind",
+}
+
+
+class BulkEnrollError(Exception):
+    """The roster or the archive as a whole is unusable (per-row problems are reported instead)."""
+
+
+# ---------- roster CSV ----------
+def _header(name):
+    return _COLUMNS.get(str(name or "").strip().lower().replace(" ", "_").replace("-", "_"))
+
+
+def read_roster(stream, default_kind="student"):
+    """
+    Yield (line, row) from a CSV byte or text stream; row holds the known
+    fields (id, name, kind, photo, ...). A row that cannot be used carries an
+    "error" instead.
+    """
+    if isinstance(stream, (bytes, bytearray)):
+        stream = io.BytesIO(stream)
+    if not isinstance(stream, io.TextIOBase):
+        stream = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    reader = csv.reader(stream)
+    try:
+        header = next(reader)
+    except StopIteration:
+        raise BulkEnrollError("roster CSV is empty")
+    except (csv.Error, UnicodeDecodeError) as e:
+        raise BulkEnrollError(f"unreadable roster CSV: {e}")
+    fields = [_header(h) for h in header]
+    if "id" not in fields:
+        raise BulkEnrollError("roster CSV needs a student_id / teacher_id / id column")
+    while True:
+        try:
+            values = next(reader)
+        except StopIteration:
+            return
+        except (csv.Error, UnicodeDecodeError) as e:
+            yield reader.line_num, {"error": f"unreadable line: {e}"}
+            continue
+        if not any(v.strip() for v in values):
+            continue
+        row = {}
+        for field, value in zip(fields, values):
+            if field and field not in row:
+                row[field] = value.strip()
+        row["kind"] = (row.get("kind") or default_kind).lower()
+        if row["kind"] not in KINDS:
+            row["error"] = f"unknown kind {row['kind']!r} (student or teacher)"
+        elif not row.get("id"):
+            row["error"] = "missing id"
+        elif not row.get("name"):
+            row["error"] = "missing name"
+        yield reader.line_num, row
+
+
+def make_profile(row, face=None, now=None):
+    """A students.json / teachers.json record, shaped like the one register_student / register_teacher save."""
+    if row["kind"] == "student":
+        profile = {"name": row["name"], "student_id": row["id"], "class": row.get("class", ""),
+                   "roll_no": row.get("roll_no", "")}
+    else:
+        profile = {"name": row["name"], "teacher_id": row["id"], "department": row.get("department", ""),
+                   "assigned_classes": row.get("assigned_classes", "")}
+    profile["enrolled_at"] = now or datetime.utcnow().isoformat()
+    profile["face_image"] = face["path"] if face else None
+    if face:
+        profile["face_blob"] = face["digest"]
+        profile["face_url"] = face["url"]
+    return profile
+
+
+# ---------- photo archive ----------
+class PhotoArchive:
+    """Read-only view of a photo ZIP; members are looked up by path, file name or id."""
+
+    def __init__(self, path, max_photo_bytes=10 * 1024 * 1024):
+        try:
+            self.zf = zipfile.ZipFile(path)  # reads the central directory only
+        except (OSError, zipfile.BadZipFile) as e:
+            raise BulkEnrollError(f"unreadable photo archive: {e}")
+        self.path = path
+        self.max_photo_bytes = max_photo_bytes
+        self.by_name, self.by_file, self.by_stem = {}, {}, {}
+        for info in self.zf.infolist():
+            name = info.filename
+            base = name.rsplit("/", 1)[-1]
+            if info.is_dir() or name.startswith("__MACOSX/") or base.startswith("."):
+                continue
+            if not base.lower().endswith(PHOTO_EXTS):
+                continue
+            self.by_name[name] = info
+            self.by_file.setdefault(base.lower(), info)
+            self.by_stem.setdefault(base.rsplit(".", 1)[0].lower(), info)
+
+    def __len__(self):
+        return len(self.by_name)
+
+    def find(self, photo=None, person_id=None):
+        """Member name for a row's photo column (path or file name), else for its id; None if absent."""
+        if photo:
+            photo = photo.replace("\\", "/").lstrip("/")
+            info = self.by_name.get(photo) or self.by_file.get(photo.rsplit("/", 1)[-1].lower())
+            return info.filename if info else None
+        info = self.by_stem.get(str(person_id or "").lower())
+        return info.filename if info else None
+
+    def read(self, name):
+        info = self.zf.getinfo(name)
+        if info.file_size > self.max_photo_bytes:
+            raise ValueError(f"photo larger than {self.max_photo_bytes} bytes")
+        with self.zf.open(info) as f:
+            data = f.read(self.max_photo_bytes + 1)
+        if len(data) > self.max_photo_bytes:  # the size in the header lied
+            raise ValueError(f"photo larger than {self.max_photo_bytes} bytes")
+        return data
+
+    def close(self):
+        self.zf.close()
+
+
+# ---------- per photo (runs in the worker processes) ----------
+def normalize_photo(data, max_side=800, quality=90):
+    """Decoded, EXIF-rotated, RGB, longest side <= max_side, re-encoded as JPEG bytes."""
+    from PIL import Image, ImageOps
+
+    try:
+        img = Image.open(io.BytesIO(data))
+    except Exception:
+        raise ValueError("not a readable image")
+    if img.format not in ("JPEG", "PNG", "MPO"):
+        raise ValueError(f"unsupported image format {img.format}")
+    img.draft("RGB", (max_side, max_side))  # JPEG: decode at a reduced scale when much larger
+    img = ImageOps.exif_transpose(img).convert("RGB")
+    img.thumbnail((max_side, max_side))
+    out = io.BytesIO()
+    img.save(out, "JPEG", quality=quality, optimize=True)
+    return out.getvalue()
+
+
+_worker = {}
+
+
+def _init_worker(zip_path, options):
+    _worker["archive"] = PhotoArchive(zip_path, options["max_photo_bytes"])
+    _worker["options"] = options
+
+
+def process_photo(archive, member, options):
+    """{"data": normalized JPEG, "embedding": list or None, "faces": n} or {"error": ...} for one member."""
+    try:
+        data = normalize_photo(archive.read(member), options["max_side"], options["quality"])
+    except Exception as e:
+        return {"error": f"bad photo {member}: {e}"}
+    out = {"data": data, "embedding": None, "faces": None}
+    if options["embed"]:
+        from recognition.detector import detect_and_embed
+
+        faces, _boxes, _timings = detect_and_embed(data, model=options["detection_model"],
+                                                   max_side=options["detect_max_side"])
+        out["faces"] = len(faces)
+        if not faces:
+            return {"error": f"no face found in {member}"}
+        out["embedding"] = [float(x) for x in faces[0]]  # enrollment photos hold one face; take the first
+    return out
+
+
+def _process_in_worker(task):
+    index, member = task
+    return index, process_photo(_worker["archive"], member, _worker["options"])
+
+
+# ---------- import ----------
+def _defaults():
+    cfg = current_app.config if has_app_context() else {}
+    return {
+        "workers": cfg.get("BULK_ENROLL_WORKERS", 0) or min(os.cpu_count() or 1, 8),
+        "batch_size": cfg.get("BULK_ENROLL_BATCH_SIZE", 200),
+        "max_side": cfg.get("BULK_ENROLL_PHOTO_MAX_SIDE", 800),
+        "quality": cfg.get("BULK_ENROLL_JPEG_QUALITY", 90),
+        "max_photo_bytes": cfg.get("BULK_ENROLL_MAX_PHOTO_BYTES", 10 * 1024 * 1024),
+        "start_method": cfg.get("BULK_ENROLL_START_METHOD", ""),
+        "detection_model": cfg.get("FACE_DETECTION_MODEL", "hog"),
+        "detect_max_side": cfg.get("FACE_DETECT_MAX_SIDE", 480),
+        "pretty": cfg.get("JSON_PRETTY_FILES", False),
+    }
+
+
+def _pool(workers, start_method, zip_path, options):
+    # fork (where available) starts workers without re-importing the app; they
+    # only touch the archive, Pillow and the detector, never the DB or the log
+    methods = multiprocessing.get_all_start_methods()
+    method = start_method or ("fork" if "fork" in methods else "spawn")
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(method),
+                               initializer=_init_worker, initargs=(zip_path, options))
+
+
+class BulkEnrollment:
+    """
+    One import run. run() returns the report:
+
+        {rows, enrolled, updated, failed, failures: [{line, id, error}],
+         photos, embedded, workers, seconds, rows_per_second, stage_ms}
+    """
+
+    def __init__(self, roster_stream, zip_path, kind="student", workers=None, batch_size=None,
+                 allow_missing_photos=False, embed=False, face_index=None, dry_run=False, job=None,
+                 max_errors=100):
+        opts = _defaults()
+        self.roster_stream = roster_stream
+        self.zip_path = zip_path
+        self.kind = kind
+        self.workers = max(1, int(workers if workers is not None else opts["workers"]))
+        self.batch_size = max(1, int(batch_size or opts["batch_size"]))
+        self.allow_missing_photos = allow_missing_photos
+        self.face_index = face_index
+        self.dry_run = dry_run
+        self.job = job
+        self.max_errors = max_errors
+        self.pretty = opts["pretty"]
+        self.start_method = opts["start_method"]
+        self.options = {"max_side": opts["max_side"], "quality": opts["quality"],
+                        "max_photo_bytes": opts["max_photo_bytes"], "embed": bool(embed),
+                        "detection_model": opts["detection_model"], "detect_max_side": opts["detect_max_side"]}
+        self.report = {"rows": 0, "enrolled": 0, "updated": 0, "failed": 0, "failures": [], "photos": 0,
+                       "embedded": 0, "workers": self.workers, "batch_size": self.batch_size,
+                       "dry_run": dry_run, "seconds": 0.0, "rows_per_second": 0.0,
+                       "stage_ms": {"photos": 0.0, "commit": 0.0}}
+
+    # ---------- bookkeeping ----------
+    def _fail(self, line, row, error):
+        self.report["failed"] += 1
+        entry = {"line": line, "id": row.get("id"), "error": error}
+        self.report["failures"].append(entry)
+        if self.job is not None:
+            self.job["rejected"] += 1
+            if len(self.job["errors"]) < self.max_errors:
+                self.job["errors"].append({"index": line, "error": f"{row.get('id') or '?'}: {error}"})
+
+    # ---------- main loop ----------
+    def run(self):
+        started = time.perf_counter()
+        archive = PhotoArchive(self.zip_path, self.options["max_photo_bytes"])
+        pending = []  # (line, row, result) waiting for the next batch commit
+        try:
+            if self.workers <= 1:
+                source = self._inline(archive)
+            else:
+                source = self._parallel(archive)
+            for line, row, result in source:
+                if result is not None and "error" in result:
+                    self._fail(line, row, result["error"])
+                    continue
+                pending.append((line, row, result))
+                if len(pending) >= self.batch_size:
+                    self._commit(pending)
+                    pending = []
+            if pending:
+                self._commit(pending)
+        finally:
+            archive.close()
+        elapsed = time.perf_counter() - started
+        self.report["seconds"] = round(elapsed, 3)
+        self.report["rows_per_second"] = round(self.report["rows"] / max(elapsed, 1e-9), 1)
+        self.report["stage_ms"] = {k: round(v, 1) for k, v in self.report["stage_ms"].items()}
+        return self.report
+
+    def _rows(self, archive):
+        """(line, row, member) for rows that get as far as the pool; the others are failed here."""
+        for line, row in read_roster(self.roster_stream, default_kind=self.kind):
+            self.report["rows"] += 1
+            if self.job is not None:
+                self.job["received"] += 1
+            if "error" in row:
+                self._fail(line, row, row["error"])
+                continue
+            member = archive.find(row.get("photo"), row["id"])
+            if member is None and not self.allow_missing_photos:
+                self._fail(line, row, f"photo {row.get('photo') or row['id']} not found in archive")
+                continue
+            yield line, row, member
+
+    def _inline(self, archive):
+        for line, row, member in self._rows(archive):
+            if member is None:
+                yield line, row, None
+                continue
+            t0 = time.perf_counter()
+            result = process_photo(archive, member, self.options)
+            self.report["stage_ms"]["photos"] += (time.perf_counter() - t0) * 1000.0
+            yield line, row, result
+
+    def _parallel(self, archive):
+        """Keeps a bounded number of photos in flight, so rows stream through rather than queue up."""
+        in_flight = {}
+        limit = self.workers * 4
+        rows = self._rows(archive)
+        t0 = time.perf_counter()
+        with _pool(self.workers, self.start_method, self.zip_path, self.options) as pool:
+            exhausted = False
+            while True:
+                while not exhausted and len(in_flight) < limit:
+                    try:
+                        line, row, member = next(rows)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    if member is None:
+                        yield line, row, None
+                        continue
+                    in_flight[pool.submit(_process_in_worker, (line, member))] = (line, row)
+                if not in_flight:
+                    break
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    line, row = in_flight.pop(future)
+                    try:
+                        _index, result = future.result()
+                    except Exception as e:  # a worker died (e.g. out of memory on a huge image)
+                        result = {"error": f"photo processing failed: {e.__class__.__name__}"}
+                    yield line, row, result
+        self.report["stage_ms"]["photos"] += (time.perf_counter() - t0) * 1000.0
+
+    # ---------- batch commit ----------
+    def _commit(self, batch):
+        t0 = time.perf_counter()
+        with_photo = [(line, row, result) for line, row, result in batch if result is not None]
+        self.report["photos"] += len(with_photo)
+        self.report["embedded"] += sum(1 for _l, _r, res in with_photo if res.get("embedding") is not None)
+        if self.dry_run:
+            self.report["enrolled"] += len(batch)
+            self._progress(len(batch))
+            self.report["stage_ms"]["commit"] += (time.perf_counter() - t0) * 1000.0
+            return
+
+        blobs = blob_store.put_many([(res["data"], "jpg") for _l, _r, res in with_photo])
+        faces = {id(row): blob for (_l, row, _res), blob in zip(with_photo, blobs)}
+        now = datetime.utcnow().isoformat()
+        by_kind = {}
+        for line, row, result in batch:
+            profile = make_profile(row, faces.get(id(row)), now=now)
+            by_kind.setdefault(row["kind"], []).append((line, row, result, profile))
+
+        released = []
+        for kind, items in by_kind.items():
+            fname, id_key = KINDS[kind]
+            path = os.path.join(DATA_DIR, fname)
+            profiles = load_file(path, default=[]) if storage.writes_json() else storage.profiles(kind)
+            if not isinstance(profiles, list):
+                profiles = []
+            where = {str(p.get(id_key) or ""): i for i, p in enumerate(profiles) if isinstance(p, dict)}
+            for _line, row, _result, profile in items:
+                i = where.get(row["id"])
+                if i is None:
+                    where[row["id"]] = len(profiles)
+                    profiles.append(profile)
+                    self.report["enrolled"] += 1
+                    continue
+                old = profiles[i]
+                profile["enrolled_at"] = old.get("enrolled_at") or profile["enrolled_at"]
+                profile["updated_at"] = now
+                old_digest = old.get("face_blob") or digest_of_path(old.get("face_image"))
+                if old_digest:
+                    released.append(old_digest)  # the replaced profile held one reference
+                profiles[i] = profile
+                self.report["updated"] += 1
+            if storage.writes_json():
+                dump_file(path, profiles, pretty=self.pretty)
+            roster.add_many(kind, [p for _l, _r, _res, p in items])
+            storage.profiles_changed(kind)
+            if kind == "student":
+                for _l, _r, _res, p in items:
+                    student_search.add(p)
+        if released:
+            blob_store.release_many(released)
+        if self.face_index is not None:
+            for _line, row, result, profile in by_kind.get("student", []):
+                self.face_index.remove(row["id"])  # re-enrolled: the old photo's embeddings go either way
+                if result is not None and result.get("embedding") is not None:
+                    self.face_index.add(row["id"], result["embedding"], name=profile["name"],
+                                        class_name=profile.get("class"))
+        self._progress(len(batch))
+        self.report["stage_ms"]["commit"] += (time.perf_counter() - t0) * 1000.0
+
+    def _progress(self, n):
+        if self.job is not None:
+            self.job["written"] += n
+
+
+def bulk_enroll(roster_stream, zip_path, **kwargs):
+    """Run one import (see BulkEnrollment) and return its report."""
+    return BulkEnrollment(roster_stream, zip_path, **kwargs).run()
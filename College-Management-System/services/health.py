@@ -0,0 +1,180 @@
+# services/health.py
+"""
+Liveness, readiness and load numbers for the load balancer (served by app.py).
+
+    /healthz    the process answers; no I/O at all
+    /readyz     200 once every check passes and every warm-up step has run,
+                503 (with the failing parts) until then
+    /api/stats  queue depths, cache hit rates, index sizes, DB pool, memory
+
+Checks (the database answering) run on every probe, but their result is
+cached for READINESS_CACHE_SECONDS so a tight probe interval costs nothing.
+Warm-up steps (seed the roster, build the search index and the results
+snapshot, load the face index) run once in a background thread. run.py
+starts them at launch, and otherwise the first probe does. A step that fails
+is retried by the next probe, so a worker never reports ready with a cold
+cache and a probe never waits for the warm-up.
+"""
+
+import logging
+import os
+import threading
+import time
+
+try:
+    import resource  # not on Windows
+except ImportError:
+    resource = None
+
+log = logging.getLogger(__name__)
+
+
+def hit_rate(hits, misses):
+    total = (hits or 0) + (misses or 0)
+    return round(hits / total, 4) if total else None
+
+
+def _proc_status():
+    """VmRSS / VmHWM / Threads from /proc/self/status (Linux), in bytes / count."""
+    out = {}
+    try:
+        with open("/proc/self/status", "r", encoding="ascii", errors="replace") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in ("VmRSS", "VmHWM"):
+                    out[key] = int(value.split()[0]) * 1024
+                elif key == "Threads":
+                    out[key] = int(value)
+    except (OSError, ValueError):
+        pass
+    return out
+
+
+def process_stats():
+    """Memory, CPU time, threads and open files of this worker process."""
+    status = _proc_status()
+    out = {"pid": os.getpid(), "rss_bytes": status.get("VmRSS"), "peak_rss_bytes": status.get("VmHWM"),
+           "threads": status.get("Threads") or threading.active_count(), "cpu_seconds": None, "open_files": None}
+    if resource is not None:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        out["cpu_seconds"] = round(usage.ru_utime + usage.ru_stime, 3)
+        if out["peak_rss_bytes"] is None:
+            # ru_maxrss is KiB on Linux, bytes on macOS
+            out["peak_rss_bytes"] = usage.ru_maxrss * (1 if os.uname().sysname == "Darwin" else 1024)
+    try:
+        out["open_files"] = len(os.listdir("/proc/self/fd"))
+    except OSError:
+        pass
+    return out
+
+
+def pool_stats(engine):
+    """Connection pool of a SQLAlchemy engine (pools without a size, e.g. SQLite's, report what they have)."""
+    pool = engine.pool
+    out = {"pool": type(pool).__name__}
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        fn = getattr(pool, name, None)
+        if callable(fn):
+            try:
+                out[name] = fn()
+            except Exception:
+                out[name] = None
+    return out
+
+
+class Readiness:
+    def __init__(self, cache_seconds=2.0):
+        self.cache_seconds = cache_seconds
+        self.started = time.time()
+        self._checks = {}     # name -> fn(), raises when not ready
+        self._warmers = {}    # name -> fn(), optional detail string
+        self._warm = {}       # name -> {ok, ms, error | detail}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._cached = (0.0, None)
+
+    def configure(self, cache_seconds=None):
+        if cache_seconds is not None:
+            self.cache_seconds = float(cache_seconds)
+
+    def check(self, name, fn):
+        """Register a check run on (cached) probes."""
+        self._checks[name] = fn
+
+    def warmer(self, name, fn):
+        """Register a warm-up step run once (until it succeeds)."""
+        self._warmers[name] = fn
+
+    # ---------- warm-up ----------
+    def warm_up(self, context=None, block=False):
+        """
+        Run pending warm-up steps in a background thread (unless one is running).
+        context: a context-manager factory each step runs in, e.g. app.app_context.
+        """
+        with self._lock:
+            pending = [n for n in self._warmers if not self._warm.get(n, {}).get("ok")]
+            if not pending or (self._thread is not None and self._thread.is_alive()):
+                thread = self._thread
+            else:
+                thread = self._thread = threading.Thread(target=self._run, args=(pending, context),
+                                                         name="warm-up", daemon=True)
+                thread.start()
+        if block and thread is not None:
+            thread.join()
+
+    def _run(self, names, context):
+        for name in names:
+            t0 = time.perf_counter()
+            entry = {"ok": False}
+            try:
+                if context is not None:
+                    with context():
+                        detail = self._warmers[name]()
+                else:
+                    detail = self._warmers[name]()
+                entry["ok"] = True
+                if detail:
+                    entry["detail"] = detail
+            except Exception as e:
+                log.warning("warm-up step %s failed: %s", name, e)
+                entry["error"] = f"{e.__class__.__name__}: {e}"
+            entry["ms"] = round((time.perf_counter() - t0) * 1000.0, 1)
+            with self._lock:
+                self._warm[name] = entry
+                self._cached = (0.0, None)
+
+    @property
+    def warm(self):
+        with self._lock:
+            return all(self._warm.get(n, {}).get("ok") for n in self._warmers)
+
+    # ---------- probing ----------
+    def status(self, context=None):
+        """{ ready, checks, warmup, uptime_s }; checks are re-run at most every cache_seconds."""
+        now = time.monotonic()
+        with self._lock:
+            expires, cached = self._cached
+            if cached is not None and now < expires:
+                return cached
+        if not self.warm:
+            self.warm_up(context=context)
+        checks = {}
+        for name, fn in self._checks.items():
+            t0 = time.perf_counter()
+            try:
+                fn()
+                checks[name] = {"ok": True}
+            except Exception as e:
+                checks[name] = {"ok": False, "error": f"{e.__class__.__name__}: {e}"}
+            checks[name]["ms"] = round((time.perf_counter() - t0) * 1000.0, 2)
+        with self._lock:
+            warmup = {n: dict(self._warm.get(n) or {"ok": False, "pending": True}) for n in self._warmers}
+        result = {"ready": all(c["ok"] for c in checks.values()) and all(w["ok"] for w in warmup.values()),
+                  "checks": checks, "warmup": warmup, "uptime_s": round(time.time() - self.started, 1)}
+        with self._lock:
+            self._cached = (now + self.cache_seconds, result)
+        return result
+
+
+# shared readiness state used by app.py (/readyz) and run.py (warm-up at launch)
+readiness = Readiness()
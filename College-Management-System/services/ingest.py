@@ -0,0 +1,220 @@
+# services/ingest.py
+"""
+Streaming ingestion of large JSON array uploads.
+
+The request body (a top-level JSON array) is read in fixed-size chunks and
+decoded one element at a time; each element is validated and written straight
+to a temp file as it arrives, and the file is swapped into place at the end.
+Memory stays bounded by the chunk size plus the largest single record, however
+big the upload is; a record longer than `max_element` characters (or a
+malformed one that never decodes) fails the upload once that much of it is
+buffered. Progress is tracked per upload id so clients can poll it.
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+_WS = " \t\r\n"
+_NUM = "0123456789.eE+-"
+_STAGED_HEAD = '{"records": '  # staging files start with this, then the array
+MAX_ELEMENT = 16 * 1024 * 1024  # characters one array element may take
+
+
+class IngestError(Exception):
+    """Malformed stream (not a JSON array, truncated, ...)."""
+
+
+def iter_json_array(stream, chunk_size=64 * 1024, on_bytes=None, max_element=MAX_ELEMENT):
+    """
+    Yield the elements of a top-level JSON array read from a binary stream.
+    on_bytes(n) is called with the size of every chunk read.
+    """
+    decoder = json.JSONDecoder()
+    buf = ""
+    pos = 0
+    eof = False
+    pending = b""
+
+    def fill(want=1):
+        """Buffer at least `want` more characters (or up to EOF); the buffer is rebuilt once per call."""
+        nonlocal buf, pos, eof, pending
+        parts, got = [], 0
+        while got < want:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                eof = True
+                if pending:
+                    raise IngestError("truncated UTF-8 sequence at end of stream")
+                break
+            if on_bytes:
+                on_bytes(len(chunk))
+            data = pending + chunk
+            # keep an incomplete trailing UTF-8 sequence for the next chunk
+            try:
+                text = data.decode("utf-8")
+                pending = b""
+            except UnicodeDecodeError as e:
+                if e.start < len(data) - 3:
+                    raise IngestError("invalid UTF-8 in upload")
+                text = data[:e.start].decode("utf-8")
+                pending = data[e.start:]
+            parts.append(text)
+            got += len(text)
+        buf = buf[pos:] + "".join(parts)
+        pos = 0
+
+    def skip_ws():
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in _WS:
+                pos += 1
+            if pos < len(buf) or eof:
+                return
+            fill()
+
+    skip_ws()
+    if pos >= len(buf) or buf[pos] != "[":
+        raise IngestError("expected a top-level JSON array")
+    pos += 1
+    first = True
+    while True:
+        skip_ws()
+        if pos >= len(buf):
+            raise IngestError("unexpected end of stream inside array")
+        if buf[pos] == "]":
+            return
+        if not first:
+            if buf[pos] != ",":
+                raise IngestError("expected ',' between array elements")
+            pos += 1
+            skip_ws()
+        while True:
+            try:
+                value, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise IngestError("malformed or truncated array element")
+                if len(buf) - pos > max_element:
+                    raise IngestError(f"array element malformed or longer than {max_element} characters")
+                # double what is buffered before decoding again: linear copying, log(n) retries
+                fill(max(chunk_size, len(buf) - pos))
+                continue
+            if (not eof and isinstance(value, (int, float)) and not isinstance(value, bool)
+                    and all(ch in _NUM for ch in buf[end:])):
+                # "2." / "1e" at the end of the buffer: the number continues in the next chunk
+                fill()
+                continue
+            break
+        pos = end
+        first = False
+        yield value
+
+
+class IngestTracker:
+    """Progress of recent uploads, keyed by upload id (bounded)."""
+
+    def __init__(self, keep=50):
+        self.keep = keep
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def start(self, upload_id=None, kind=""):
+        upload_id = upload_id or uuid.uuid4().hex[:12]
+        job = {"id": upload_id, "kind": kind, "state": "running", "bytes": 0, "received": 0,
+               "written": 0, "rejected": 0, "errors": [], "started": time.time(), "finished": None}
+        with self._lock:
+            self._jobs[upload_id] = job
+            while len(self._jobs) > self.keep:
+                self._jobs.popitem(last=False)
+        return job
+
+    def get(self, upload_id):
+        with self._lock:
+            job = self._jobs.get(upload_id)
+            return dict(job) if job else None
+
+
+def stream_array_to_file(stream, out_path, job, validate=None, meta_fn=None,
+                         chunk_size=64 * 1024, max_errors=100, max_element=MAX_ELEMENT):
+    """
+    Copy a JSON array from `stream` into out_path as { "records": [...], "_meta": {...} }.
+    validate(record) returns an error string or None; rejected records are skipped.
+    meta_fn(job) builds _meta once the stream is done.
+    On any error out_path is removed, the job is marked failed and the error re-raised;
+    moving the finished file into place is up to the caller.
+    """
+
+    def on_bytes(n):
+        job["bytes"] += n
+
+    try:
+        with open(out_path, "w", encoding="utf-8") as out:
+            out.write(_STAGED_HEAD + "[\n")
+            for record in iter_json_array(stream, chunk_size=chunk_size, on_bytes=on_bytes,
+                                          max_element=max_element):
+                job["received"] += 1
+                err = validate(record) if validate else None
+                if err:
+                    job["rejected"] += 1
+                    if len(job["errors"]) < max_errors:
+                        job["errors"].append({"index": job["received"] - 1, "error": err})
+                    continue
+                if job["written"]:
+                    out.write(",\n")
+                out.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")))
+                job["written"] += 1
+            meta = meta_fn(job) if meta_fn else {}
+            out.write('\n], "_meta": ')
+            out.write(json.dumps(meta, ensure_ascii=False))
+            out.write("}\n")
+    except Exception as e:
+        finish(job, "failed", str(e))
+        if os.path.exists(out_path):
+            os.remove(out_path)
+        raise
+    return job
+
+
+def iter_staged_records(path, chunk_size=64 * 1024):
+    """The records of a file written by stream_array_to_file, one at a time."""
+    with open(path, "rb") as f:
+        f.seek(len(_STAGED_HEAD))
+        yield from iter_json_array(f, chunk_size=chunk_size)
+
+
+def finish(job, state, error=None):
+    job["state"] = state
+    job["finished"] = time.time()
+    if error:
+        job["errors"].append({"error": error})
+
+
+def validate_result_record(record):
+    """Minimal shape check for semester_results students."""
+    if not isinstance(record, dict):
+        return "record must be an object"
+    if not (record.get("student_id") or record.get("roll_no")):
+        return "student_id or roll_no required"
+    if "semesters" in record:
+        if not isinstance(record["semesters"], list):
+            return "semesters must be an array"
+        for s in record["semesters"]:
+            if not isinstance(s, dict) or s.get("sem") in (None, ""):
+                return "every semester must be an object with a sem"
+    return None
+
+
+def validate_mark_record(record):
+    if not isinstance(record, dict):
+        return "record must be an object"
+    if not record.get("student_id"):
+        return "student_id required"
+    return None
+
+
+# shared tracker used by the upload endpoints
+ingest_jobs = IngestTracker()
@@ -0,0 +1,279 @@
+# services/json_import.py
+"""
+Copy the JSON stores into their tables for the STORAGE_BACKEND cutover
+(services/storage.py). Driven by migrate_json.py.
+
+Every store is loaded in one transaction. Rows are inserted with executemany
+in batch_size chunks, and nothing is visible until the commit. With
+dry_run=True the transaction is rolled back, so the report shows what would
+change. A store's StoreMeta row is written in the same transaction, and that
+row is what switches dual-mode reads over to the table.
+
+Re-running is safe: every store is de-duplicated by its natural key first.
+
+    students / teachers   by student_id / teacher_id. Later records win, but
+                          they never blank out a field an earlier one filled.
+                          Existing rows are updated by primary key.
+    sessional_marks       by (student_id, semester). If the table already has
+                          the row (written through /api/marks/sync), the newer
+                          write wins: Mark.updated_at against the document's
+                          lastSavedAt. Rows are never tombstoned here.
+    attendance            by (student_id, ts, session). Captures already
+                          in the table are skipped.
+    semester_results      main file + journal, by result key. The table is
+                          replaced, and the document version is kept.
+"""
+
+import logging
+import time
+
+from sqlalchemy import insert, select, update
+
+from database.models import Attendance, Mark, ResultSemester, Student, Teacher, db
+
+from . import marks_sync
+from .attendance_log import attendance_log
+from .results_store import results_store
+from .roster import roster
+from .serialization import load_file
+from .storage import (ATTENDANCE, CAPTURE, MARKS, MARKS_FILE, RESULTS, STUDENTS, TEACHERS, attendance_row,
+                      result_key, storage)
+
+log = logging.getLogger(__name__)
+
+STORES = (STUDENTS, TEACHERS, MARKS, ATTENDANCE, RESULTS)
+
+# JSON field -> column, per profile kind
+PROFILE_COLUMNS = {
+    "student": (Student, "student_id", {"name": "name", "class": "class_name", "roll_no": "roll_no",
+                                        "face_image": "face_image", "enrolled_at": "enrolled_at"}),
+    "teacher": (Teacher, "teacher_id", {"name": "name", "department": "department",
+                                        "assigned_classes": "assigned_classes", "face_image": "face_image",
+                                        "enrolled_at": "enrolled_at"}),
+}
+
+
+def _chunks(rows, size):
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
+
+class JsonImporter:
+    def __init__(self, batch_size=1000, dry_run=False):
+        self.batch_size = max(1, int(batch_size))
+        self.dry_run = dry_run
+
+    def run(self, only=None):
+        """Import the stores in `only` (default: all, in dependency order). Returns {store: report}."""
+        out = {}
+        for store in STORES:
+            if only and store not in only:
+                continue
+            t0 = time.perf_counter()
+            try:
+                report = self._import(store)
+                if self.dry_run:
+                    db.session.rollback()
+                else:
+                    db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                log.exception("import of %s failed", store)
+                report = {"error": str(e)}
+            if self.dry_run or "error" in report:
+                storage.forget()
+            report["seconds"] = round(time.perf_counter() - t0, 3)
+            out[store] = report
+        if not self.dry_run and (not only or {STUDENTS, TEACHERS} & set(only)):
+            roster.invalidate_counts()
+        return out
+
+    def _import(self, store):
+        if store == STUDENTS:
+            return self.import_profiles("student")
+        if store == TEACHERS:
+            return self.import_profiles("teacher")
+        if store == MARKS:
+            return self.import_marks()
+        if store == ATTENDANCE:
+            return self.import_attendance()
+        return self.import_results()
+
+    # ---------- students / teachers ----------
+    def import_profiles(self, kind):
+        model, id_key, columns = PROFILE_COLUMNS[kind]
+        merged = {}
+        records = storage.json_profiles(kind)
+        for record in records:
+            if not isinstance(record, dict):
+                continue
+            key = str(record.get(id_key) or "").strip()
+            if not key:
+                continue
+            row = merged.setdefault(key, {id_key: key})
+            for field, col in columns.items():
+                value = record.get(field)
+                if value not in (None, ""):
+                    row[col] = value
+        for key, row in merged.items():
+            row.setdefault("name", key)
+
+        key_col = getattr(model, id_key)
+        have = {key: pk for key, pk in db.session.execute(select(key_col, model.id))}
+        new = [row for key, row in merged.items() if key not in have]
+        changed = [dict(row, id=have[key]) for key, row in merged.items() if key in have]
+        for chunk in _chunks(new, self.batch_size):
+            db.session.execute(insert(model), chunk)
+        for chunk in _chunks(changed, self.batch_size):
+            db.session.execute(update(model), chunk)  # bulk UPDATE by primary key
+        storage.touch(STUDENTS if kind == "student" else TEACHERS)
+        return {"records": len(records), "unique": len(merged), "inserted": len(new), "updated": len(changed)}
+
+    # ---------- sessional marks ----------
+    def import_marks(self):
+        doc = load_file(MARKS_FILE, default=None)
+        doc = doc if isinstance(doc, dict) else {}
+        meta = doc.get("_meta") if isinstance(doc.get("_meta"), dict) else {}
+        saved_at = str(meta.get("lastSavedAt") or "")
+        saved_by = meta.get("lastSavedBy") if isinstance(meta.get("lastSavedBy"), dict) else {}
+        wanted, skipped = {}, 0
+        for record in doc.get("records") or []:
+            try:
+                key, values = marks_sync.parse_record(record)
+            except ValueError:
+                skipped += 1
+                continue
+            wanted[key] = values
+
+        marks_sync.lock_for_write()
+        current = {(m.student_id, m.semester): m for m in db.session.execute(select(Mark)).scalars()}
+        accepted, kept, unchanged = [], 0, 0
+        for key, values in wanted.items():
+            row = current.get(key)
+            if row is None:
+                row = Mark(student_id=key[0], semester=key[1], version=0)
+                db.session.add(row)
+            elif not row.deleted and all(getattr(row, col) == value for col, value in values.items()):
+                unchanged += 1
+                continue
+            elif str(row.updated_at or "") > saved_at:
+                kept += 1  # edited through the delta API after the document was saved
+                continue
+            accepted.append((row, values, False))
+        applied = []
+        for chunk in _chunks(accepted, self.batch_size):
+            applied.extend(marks_sync.write_rows(chunk, saved_by.get("id")))
+            db.session.flush()
+        storage.touch(MARKS, saved_at=meta.get("lastSavedAt"), saved_by=saved_by)
+        return {"records": len(doc.get("records") or []), "unique": len(wanted), "written": len(applied),
+                "unchanged": unchanged, "kept_newer": kept, "skipped": skipped}
+
+    # ---------- attendance ----------
+    def import_attendance(self):
+        have = set(db.session.execute(
+            select(Attendance.student_id, Attendance.timestamp, Attendance.session_id)
+            .where(Attendance.source == CAPTURE)))
+        seen, batch = set(), []
+        report = {"records": 0, "inserted": 0, "duplicates": 0, "skipped": 0}
+        for record in attendance_log.iter_records():
+            report["records"] += 1
+            if not isinstance(record, dict):
+                report["skipped"] += 1
+                continue
+            row = attendance_row(record)
+            if not row["student_id"] or not row["timestamp"]:
+                report["skipped"] += 1
+                continue
+            key = (row["student_id"], row["timestamp"], row["session_id"])
+            if key in have or key in seen:
+                report["duplicates"] += 1
+                continue
+            seen.add(key)
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                db.session.execute(insert(Attendance), batch)
+                report["inserted"] += len(batch)
+                batch = []
+        if batch:
+            db.session.execute(insert(Attendance), batch)
+            report["inserted"] += len(batch)
+        storage.touch(ATTENDANCE)
+        return report
+
+    # ---------- semester results ----------
+    def import_results(self):
+        analytics, journal = results_store.load_from_files()
+        if analytics is None:
+            return {"records": 0, "skipped": "no semester_results.json"}
+        by_key, bad_sems = {}, 0
+        for record in analytics.records:
+            key = result_key(record) if isinstance(record, dict) else ""
+            if not key:
+                continue
+            semesters = []
+            for s in record.get("semesters") or []:
+                try:
+                    int(s.get("sem"))
+                except (AttributeError, TypeError, ValueError):
+                    bad_sems += 1
+                    continue
+                semesters.append(s)
+            by_key[key] = dict(record, semesters=semesters)
+        meta = dict(analytics.meta, version=analytics.version)
+        report = storage.replace_results(list(by_key.values()), meta, batch_size=self.batch_size, commit=False)
+        report.update({"journal_entries": journal, "skipped_semesters": bad_sems, "version": analytics.version})
+        return report
+
+    # ---------- checking ----------
+    def verify(self):
+        """Per store: natural keys in JSON, how many of them the table has, and which are missing (first 20)."""
+        def compare(json_keys, table_keys):
+            missing = sorted(json_keys - table_keys)
+            return {"json": len(json_keys), "table": len(table_keys), "missing": len(missing),
+                    "missing_sample": missing[:20], "ok": not missing}
+
+        out = {}
+        for kind, store in (("student", STUDENTS), ("teacher", TEACHERS)):
+            model, id_key, _cols = PROFILE_COLUMNS[kind]
+            json_keys = {str(p.get(id_key) or "").strip() for p in storage.json_profiles(kind) if isinstance(p, dict)}
+            json_keys.discard("")
+            out[store] = compare(json_keys, set(db.session.execute(select(getattr(model, id_key))).scalars()))
+
+        doc = load_file(MARKS_FILE, default=None)
+        records = doc.get("records") or [] if isinstance(doc, dict) else []
+        json_keys = set()
+        for record in records:
+            try:
+                (sid, sem), _values = marks_sync.parse_record(record)
+            except ValueError:
+                continue
+            json_keys.add(f"{sid}/{sem}")
+        table_keys = {f"{sid}/{sem}" for sid, sem in
+                      db.session.execute(select(Mark.student_id, Mark.semester).where(Mark.deleted.is_(False)))}
+        out[MARKS] = compare(json_keys, table_keys)
+
+        json_keys = set()
+        for record in attendance_log.iter_records():
+            if isinstance(record, dict):
+                row = attendance_row(record)
+                if row["student_id"] and row["timestamp"]:
+                    json_keys.add(f"{row['student_id']}@{row['timestamp']}#{row['session_id'] or ''}")
+        table_keys = {f"{sid}@{ts}#{session or ''}" for sid, ts, session in db.session.execute(
+            select(Attendance.student_id, Attendance.timestamp, Attendance.session_id)
+            .where(Attendance.source == CAPTURE))}
+        out[ATTENDANCE] = compare(json_keys, table_keys)
+
+        analytics, _journal = results_store.load_from_files()
+        json_keys = {f"{result_key(r)}/{s.get('sem')}" for r in (analytics.records if analytics else [])
+                     for s in r.get("semesters") or [] if result_key(r)}
+        table_keys = {f"{key}/{sem}" for key, sem in
+                      db.session.execute(select(ResultSemester.record_key, ResultSemester.sem_number))}
+        out[RESULTS] = compare(json_keys, table_keys)
+        for store, row in out.items():
+            row["migrated"] = storage.migrated(store)
+        return out
+
+
+def import_json(only=None, batch_size=1000, dry_run=False):
+    """Convenience wrapper: JsonImporter(...).run(only)."""
+    return JsonImporter(batch_size=batch_size, dry_run=dry_run).run(only)
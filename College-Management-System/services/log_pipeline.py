@@ -0,0 +1,286 @@
+# services/log_pipeline.py
+"""
+Non-blocking, structured logging.
+
+Request threads never write to stdout/stderr themselves. setup_logging()
+puts a single QueueHandler on the root logger; it stamps each record with the
+current request's id / endpoint / method / path (this has to happen on the
+request thread), drops it on a bounded queue and returns. One background
+thread drains the queue in batches and writes one JSON object per line with
+a single write() + flush() per batch:
+
+    {"ts": "...", "level": "WARNING", "logger": "app", "msg": "PDF generation failed",
+     "request_id": "9f1c...", "endpoint": "generate_report", "roll_no": "22EB..."}
+
+Fields passed with extra={...} become top-level keys. When the queue is full
+a record is dropped (and counted) rather than blocking the request.
+
+Repeat suppression: the same message template from the same logger and level
+is let through `burst` times per `window` seconds; further repeats are
+only counted, and the first record of the next window carries
+"suppressed_repeats": N, so a failing camera cannot flood the log.
+
+install_request_logging(app) adds the request id (X-Request-ID, taken from
+the client when it sends one) and one access record per request with the
+status and duration_ms.
+"""
+
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+import traceback
+import uuid
+from datetime import datetime
+
+try:
+    from flask import g, has_request_context, request
+except Exception:  # usable from plain scripts too
+    g = request = None
+
+    def has_request_context():
+        return False
+
+REQUEST_ID_HEADER = "X-Request-ID"
+
+# attributes every LogRecord has; anything else on a record came from extra={...}
+_STANDARD = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+
+class RequestContextFilter(logging.Filter):
+    """Copies the current request's id / endpoint / method / path onto the record."""
+
+    def filter(self, record):
+        if has_request_context():
+            record.request_id = getattr(g, "request_id", None)
+            record.endpoint = request.endpoint
+            record.method = request.method
+            record.path = request.path
+        return True
+
+
+class RepeatFilter(logging.Filter):
+    """Lets a (logger, level, template) through `burst` times per `window` seconds."""
+
+    def __init__(self, window=60.0, burst=5):
+        super().__init__()
+        self.window = window
+        self.burst = burst
+        self._lock = threading.Lock()
+        self._seen = {}  # key -> [window_start, count]
+
+    def filter(self, record):
+        if not self.burst:
+            return True
+        key = (record.name, record.levelno, str(record.msg))
+        now = time.monotonic()
+        with self._lock:
+            entry = self._seen.get(key)
+            if entry is None or now - entry[0] >= self.window:
+                suppressed = entry[1] - self.burst if entry is not None and entry[1] > self.burst else 0
+                self._seen[key] = [now, 1]
+                if len(self._seen) > 10000:  # forget old keys; entries are only kept for one window
+                    cutoff = now - self.window
+                    self._seen = {k: v for k, v in self._seen.items() if v[0] >= cutoff}
+                if suppressed:
+                    record.suppressed_repeats = suppressed
+                return True
+            entry[1] += 1
+            return entry[1] <= self.burst
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        out = {
+            "ts": datetime.utcfromtimestamp(record.created).isoformat(timespec="milliseconds") + "Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key in _STANDARD or key.startswith("_") or value is None:
+                continue
+            out[key] = value
+        if record.exc_info:
+            out["exc"] = "".join(traceback.format_exception(*record.exc_info)).rstrip()
+        elif record.exc_text:
+            out["exc"] = record.exc_text
+        return json.dumps(out, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Human-readable lines for development; context fields are appended as key=value."""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-7s %(name)s: %(message)s")
+
+    def format(self, record):
+        line = super().format(record)
+        extras = [f"{k}={v}" for k, v in vars(record).items()
+                  if k not in _STANDARD and not k.startswith("_") and v is not None]
+        return line + ("  [" + " ".join(extras) + "]" if extras else "")
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """Never blocks: a full queue drops the record and counts it."""
+
+    def __init__(self, q):
+        super().__init__(q)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # render the message and traceback now, on the calling thread: args and
+        # exc_info may reference objects that change (or are gone) by the time
+        # the writer gets to the record; the traceback stays a separate field
+        record = copy.copy(record)
+        record.msg, record.args = record.getMessage(), None
+        if record.exc_info:
+            record.exc_text = "".join(traceback.format_exception(*record.exc_info)).rstrip()
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class BatchWriter(threading.Thread):
+    """Drains the queue, formatting and writing up to `max_batch` records per write()."""
+
+    _STOP = object()
+
+    def __init__(self, q, stream, formatter, max_batch=256):
+        super().__init__(name="log-writer", daemon=True)
+        self.queue = q
+        self.stream = stream
+        self.formatter = formatter
+        self.max_batch = max_batch
+        self.written = 0
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            batch = [item]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = any(r is self._STOP for r in batch)
+            lines = []
+            for record in batch:
+                if record is self._STOP:
+                    continue
+                try:
+                    lines.append(self.formatter.format(record))
+                except Exception:
+                    lines.append(json.dumps({"level": "ERROR", "logger": "log_pipeline",
+                                             "msg": "unformattable record", "record": str(record.msg)}))
+            if lines:
+                try:
+                    self.stream.write("\n".join(lines) + "\n")
+                    self.stream.flush()
+                    self.written += len(lines)
+                except Exception:
+                    pass
+            if stop:
+                return
+
+    def stop(self, timeout=2.0):
+        try:
+            self.queue.put(self._STOP, timeout=timeout)
+        except queue.Full:
+            return
+        self.join(timeout)
+
+
+class LogPipeline:
+    def __init__(self):
+        self.handler = None
+        self.writer = None
+        self.repeat_filter = None
+
+    def setup(self, level="INFO", fmt="json", stream=None, queue_size=10000, repeat_window=60.0,
+              repeat_burst=5, max_batch=256):
+        """Route the root logger through the queue. Calling it again replaces the previous setup."""
+        self.shutdown()
+        q = queue.Queue(maxsize=queue_size)
+        handler = _QueueHandler(q)
+        handler.addFilter(RequestContextFilter())
+        self.repeat_filter = RepeatFilter(window=repeat_window, burst=repeat_burst)
+        handler.addFilter(self.repeat_filter)
+        formatter = JsonFormatter() if fmt == "json" else TextFormatter()
+        self.writer = BatchWriter(q, stream or sys.stderr, formatter, max_batch=max_batch)
+        self.writer.start()
+
+        root = logging.getLogger()
+        for h in list(root.handlers):
+            root.removeHandler(h)
+        root.addHandler(handler)
+        root.setLevel(logging.getLevelName(str(level).upper()) if isinstance(level, str) else level)
+        self.handler = handler
+        return handler
+
+    def shutdown(self):
+        if self.handler is not None:
+            logging.getLogger().removeHandler(self.handler)
+            self.handler = None
+        if self.writer is not None:
+            self.writer.stop()
+            self.writer = None
+
+    def stats(self):
+        if self.handler is None:
+            return {"enabled": False}
+        return {"enabled": True, "queued": self.handler.queue.qsize(), "dropped": self.handler.dropped,
+                "written": self.writer.written if self.writer else 0}
+
+
+pipeline = LogPipeline()
+atexit.register(pipeline.shutdown)  # flush what is still queued on exit
+
+
+def setup_logging(app):
+    """Configure the pipeline from app.config (LOG_LEVEL, LOG_FORMAT, LOG_QUEUE_SIZE, LOG_REPEAT_*)."""
+    cfg = app.config
+    handler = pipeline.setup(
+        level=cfg.get("LOG_LEVEL", "INFO"),
+        fmt=cfg.get("LOG_FORMAT", "json"),
+        queue_size=cfg.get("LOG_QUEUE_SIZE", 10000),
+        repeat_window=cfg.get("LOG_REPEAT_WINDOW_SECONDS", 60.0),
+        repeat_burst=cfg.get("LOG_REPEAT_BURST", 5),
+    )
+    logging.getLogger("PIL").setLevel(logging.INFO)  # its DEBUG output is one line per decoded chunk
+    if cfg.get("LOG_REQUESTS", True):
+        # the access record from install_request_logging replaces werkzeug's request line
+        logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    return handler
+
+
+def install_request_logging(app, logger_name="access", quiet_endpoints=()):
+    """Request id + one access record (status, duration_ms) per request; none for quiet_endpoints (probes)."""
+    quiet = {"static", *quiet_endpoints}
+    access = logging.getLogger(logger_name)
+
+    @app.before_request
+    def _request_id():
+        rid = request.headers.get(REQUEST_ID_HEADER, "")
+        g.request_id = rid[:64] if rid else uuid.uuid4().hex[:16]
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def _access_log(response):
+        response.headers[REQUEST_ID_HEADER] = getattr(g, "request_id", "")
+        started = getattr(g, "request_started", None)
+        if started is not None and app.config.get("LOG_REQUESTS", True) and request.endpoint not in quiet:
+            access.info("%s %s %s", request.method, request.path, response.status_code,
+                        extra={"status": response.status_code,
+                               "duration_ms": round((time.perf_counter() - started) * 1000, 2)})
+        return response
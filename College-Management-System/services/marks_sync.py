@@ -0,0 +1,227 @@
+# services/marks_sync.py
+"""
+Per-row delta sync for sessional marks, backed by the Mark model.
+
+Clients send only the rows they changed, each with the `version` they last
+saw (0 for a new row). A row whose stored version moved on is reported back
+as a conflict instead of being overwritten, so two teachers editing the same
+class no longer clobber each other. Every accepted write takes the next value
+of a global change counter (`Mark.seq`); that value is the sync cursor, and
+changes_since(cursor) returns exactly the rows written after it (deletes are
+kept as tombstones so they sync too).
+"""
+
+from datetime import datetime
+
+from sqlalchemy import select, tuple_, update
+
+from database.models import Mark, SyncCounter, db, epoch_of
+
+COUNTER = "marks"
+# client field -> Mark column
+FIELDS = {"name": "name", "class": "class_name", "roll_no": "roll_no", "marks": "marks", "gpa": "gpa"}
+_IN_CHUNK = 400  # keys per IN (...) query
+
+
+def _semester(value):
+    """Semester number; blank means a plain sessional mark (0)."""
+    if value in (None, ""):
+        return 0
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"semester must be a number, got {value!r}")
+
+
+def _float(value):
+    if value in (None, ""):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"marks/gpa must be numbers, got {value!r}")
+
+
+def record_key(record):
+    """(student_id, semester) of a marks record or change. Raises ValueError for a malformed one."""
+    if not isinstance(record, dict) or not str(record.get("student_id") or "").strip():
+        raise ValueError("every record needs a student_id")
+    return str(record["student_id"]).strip(), _semester(record.get("semester"))
+
+
+def parse_record(record):
+    """
+    One full marks record -> ((student_id, semester), {Mark column: value})
+    with every FIELDS column set. Raises ValueError for a malformed record.
+    """
+    key = record_key(record)
+    values = {col: record.get(field) for field, col in FIELDS.items()}
+    values["marks"], values["gpa"] = _float(values["marks"]), _float(values["gpa"])
+    return key, values
+
+
+def current_cursor():
+    value = db.session.execute(select(SyncCounter.value).where(SyncCounter.name == COUNTER)).scalar()
+    return value or 0
+
+
+def _reserve(n):
+    """Advance the change counter by n; returns the first reserved value."""
+    bumped = db.session.execute(
+        update(SyncCounter).where(SyncCounter.name == COUNTER).values(value=SyncCounter.value + n)
+    ).rowcount
+    if not bumped:
+        db.session.add(SyncCounter(name=COUNTER, value=n))
+        db.session.flush()
+    return current_cursor() - n + 1
+
+
+def lock_for_write():
+    """
+    Bump the counter by 0: takes the database write lock (SQLite) / row lock.
+    Every Mark writer calls this before reading the rows it compares against.
+    """
+    _reserve(0)
+
+
+def existing_rows(keys):
+    """{(student_id, semester): Mark} for the keys that have a row (tombstones included)."""
+    rows = {}
+    keys = list(keys)
+    for i in range(0, len(keys), _IN_CHUNK):
+        chunk = keys[i:i + _IN_CHUNK]
+        q = select(Mark).where(tuple_(Mark.student_id, Mark.semester).in_(chunk))
+        for m in db.session.execute(q).scalars():
+            rows[(m.student_id, m.semester)] = m
+    return rows
+
+
+def apply_changes(changes, saved_by=None):
+    """
+    changes: [ { student_id, semester, name, class, roll_no, marks, gpa,
+                 version: <version the client last saw, 0 for new>, deleted: bool } ]
+    Applies every non-conflicting row in one transaction.
+    Returns { applied: [{student_id, semester, version, seq}], conflicts: [{..., server}], cursor }.
+    Raises ValueError for malformed input (nothing is written).
+    """
+    parsed = {}
+    for change in changes:
+        if not isinstance(change, dict) or not str(change.get("student_id") or "").strip():
+            raise ValueError("every change needs a student_id")
+        key = (str(change["student_id"]).strip(), _semester(change.get("semester")))
+        values = {col: change[field] for field, col in FIELDS.items() if field in change}
+        for col in ("marks", "gpa"):
+            if col in values:
+                values[col] = _float(values[col])
+        try:
+            base = int(change.get("version") or 0)
+        except (TypeError, ValueError):
+            raise ValueError("version must be an integer")
+        parsed[key] = (base, values, bool(change.get("deleted")))  # last change for a key wins
+
+    try:
+        # lock first, so the version checks below cannot race another writer
+        lock_for_write()
+        existing = existing_rows(parsed)
+        accepted, conflicts = [], []
+        for key, (base, values, deleted) in parsed.items():
+            row = existing.get(key)
+            current = 0 if row is None or (row.deleted and base == 0) else row.version
+            if base != current:
+                conflicts.append({"student_id": key[0], "semester": key[1], "version": base,
+                                  "server": row.to_dict() if row is not None else None})
+                continue
+            if row is None:
+                if deleted:
+                    continue  # deleting a row the server never had
+                row = Mark(student_id=key[0], semester=key[1], version=0)
+                db.session.add(row)
+            accepted.append((row, values, deleted))
+
+        applied = write_rows(accepted, saved_by)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return {"applied": applied, "conflicts": conflicts, "cursor": current_cursor()}
+
+
+def write_rows(accepted, saved_by):
+    """
+    Apply [(row, values, deleted)], each with the next change-counter value and
+    a bumped version. The caller holds lock_for_write() and commits.
+    """
+    applied = []
+    if not accepted:
+        return applied
+    seq = _reserve(len(accepted))
+    now = datetime.utcnow()
+    now_iso, now_epoch = now.isoformat(), epoch_of(now)
+    for offset, (row, values, deleted) in enumerate(accepted):
+        for col, value in values.items():
+            setattr(row, col, value)
+        row.deleted = deleted
+        row.version = (row.version or 0) + 1
+        row.seq = seq + offset
+        row.updated_at = now_iso
+        row.updated_epoch = now_epoch
+        row.updated_by = saved_by
+        applied.append({"student_id": row.student_id, "semester": row.semester,
+                        "version": row.version, "seq": row.seq, "deleted": deleted})
+    return applied
+
+
+def replace_all(records, saved_by=None, commit=True):
+    """
+    A full sessional-marks save ({ marks: [...] }) on the tables: afterwards the
+    live rows are exactly `records`. New and changed rows are written, rows
+    missing from `records` become tombstones, unchanged rows are left alone, so
+    /api/get-marks?since= clients see the save as ordinary changes.
+    Returns { written, deleted, unchanged, cursor }. Raises ValueError for
+    malformed input (nothing is written).
+    """
+    wanted = {}
+    for record in records:
+        key, values = parse_record(record)
+        wanted[key] = values  # last record for a key wins
+    try:
+        lock_for_write()  # as in apply_changes
+        current = {(m.student_id, m.semester): m for m in db.session.execute(select(Mark)).scalars()}
+        accepted, unchanged = [], 0
+        for key, values in wanted.items():
+            row = current.get(key)
+            if row is None:
+                row = Mark(student_id=key[0], semester=key[1], version=0)
+                db.session.add(row)
+            elif not row.deleted and all(getattr(row, col) == value for col, value in values.items()):
+                unchanged += 1
+                continue
+            accepted.append((row, values, False))
+        gone = [(row, {}, True) for key, row in current.items() if key not in wanted and not row.deleted]
+        applied = write_rows(accepted + gone, saved_by)
+        if commit:
+            db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return {"written": len(applied) - len(gone), "deleted": len(gone), "unchanged": unchanged,
+            "cursor": current_cursor()}
+
+
+def changes_since(cursor=0, limit=1000):
+    """
+    Rows written after `cursor`, oldest first, at most `limit` of them.
+    Returns { changes, cursor, more, reset }; `reset` means the client's cursor is
+    ahead of the server (database was replaced) and it should resync from 0.
+    """
+    latest = current_cursor()
+    if cursor > latest:
+        return {"changes": [], "cursor": 0, "more": latest > 0, "reset": True}
+    q = select(Mark).where(Mark.seq > cursor).order_by(Mark.seq).limit(limit + 1)
+    rows = list(db.session.execute(q).scalars())
+    more = len(rows) > limit
+    rows = rows[:limit]
+    return {"changes": [m.to_dict() for m in rows],
+            "cursor": rows[-1].seq if rows else cursor,
+            "more": more,
+            "reset": False}
@@ -0,0 +1,188 @@
+# services/profiling.py
+"""
+Opt-in per-request profiling.
+
+A request is profiled when an admin asks for it, either from a logged-in
+admin session or with a valid PROFILE_TOKEN, by sending
+
+    X-Profile: 1            (admin session)
+    X-Profile: <token>      (scripts / curl)
+
+or when it is picked by sampling (PROFILE_SAMPLE_RATE, 0 = off). The
+request then runs under cProfile and two files are written to
+data/profiles/:
+
+    <stamp>_<endpoint>_<ms>ms.prof   pstats dump (python -m pstats, snakeviz)
+    <stamp>_<endpoint>_<ms>ms.json   endpoint, path, status, latency, trigger,
+                                     and the top functions by cumulative time
+
+Only one request is profiled at a time (the interpreter has one profiler
+hook); a request that would be profiled while another one is running is
+simply served without it. The directory keeps the newest PROFILE_KEEP
+captures.
+"""
+
+import cProfile
+import hmac
+import io
+import json
+import os
+import pstats
+import random
+import re
+import threading
+from datetime import datetime
+from pathlib import Path
+
+BASE_DIR = str(Path(__file__).resolve().parents[1])
+PROFILE_DIR = os.path.join(BASE_DIR, "data", "profiles")
+
+HEADER = "X-Profile"
+_SAFE = re.compile(r"[^A-Za-z0-9_.-]+")
+
+
+class RequestProfiler:
+    def __init__(self, profile_dir=PROFILE_DIR, sample_rate=0.0, token=None, keep=200, top=30):
+        self.profile_dir = profile_dir
+        self.sample_rate = sample_rate
+        self.token = token
+        self.keep = keep
+        self.top = top
+        self._active = threading.Lock()  # held while a request is being profiled
+        self._lock = threading.Lock()
+        self.counters = {"captured": 0, "skipped_busy": 0}
+
+    def configure(self, profile_dir=None, sample_rate=None, token=None, keep=None):
+        with self._lock:
+            if profile_dir:
+                self.profile_dir = profile_dir
+            if sample_rate is not None:
+                self.sample_rate = max(0.0, min(float(sample_rate), 1.0))
+            if token is not None:
+                self.token = token or None
+            if keep is not None:
+                self.keep = max(1, int(keep))
+
+    # ---------- per request ----------
+    def trigger(self, header_value, is_admin):
+        """Why this request should be profiled ('header' / 'sample'), or None."""
+        if header_value:
+            if is_admin and header_value.strip().lower() in ("1", "true", "yes"):
+                return "header"
+            if self.token and hmac.compare_digest(header_value.strip(), self.token):
+                return "header"
+        if self.sample_rate and random.random() < self.sample_rate:
+            return "sample"
+        return None
+
+    def start(self):
+        """A running cProfile.Profile, or None when another request holds the profiler."""
+        if not self._active.acquire(blocking=False):
+            with self._lock:
+                self.counters["skipped_busy"] += 1
+            return None
+        prof = cProfile.Profile()
+        try:
+            prof.enable()
+        except ValueError:  # another profiling tool is active in this interpreter
+            self._active.release()
+            return None
+        return prof
+
+    def stop(self, prof, meta):
+        """Disable `prof`, write the .prof/.json pair and return the metadata written."""
+        try:
+            prof.disable()
+        finally:
+            self._active.release()
+        stamp = datetime.utcnow().strftime("%Y%m%d%H%M%S%f")
+        name = f"{stamp}_{_SAFE.sub('-', meta.get('endpoint') or 'unknown')}_{int(meta.get('latency_ms', 0))}ms"
+        os.makedirs(self.profile_dir, exist_ok=True)
+        prof.dump_stats(os.path.join(self.profile_dir, name + ".prof"))
+        meta = dict(meta, name=name, captured_at=datetime.utcnow().isoformat(), top=self._top(prof))
+        with open(os.path.join(self.profile_dir, name + ".json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+        with self._lock:
+            self.counters["captured"] += 1
+        self._trim()
+        return meta
+
+    def _top(self, prof):
+        stats = pstats.Stats(prof)
+        rows = []
+        for (filename, line, func), (cc, nc, tt, ct, _callers) in stats.stats.items():
+            rows.append({"function": f"{os.path.basename(filename)}:{line}({func})", "calls": nc,
+                         "primitive_calls": cc, "tottime_ms": round(tt * 1000, 3),
+                         "cumtime_ms": round(ct * 1000, 3)})
+        rows.sort(key=lambda r: r["cumtime_ms"], reverse=True)
+        return rows[:self.top]
+
+    def _trim(self):
+        names = sorted(n[:-5] for n in os.listdir(self.profile_dir) if n.endswith(".json"))
+        for name in names[:max(0, len(names) - self.keep)]:
+            for ext in (".json", ".prof"):
+                try:
+                    os.remove(os.path.join(self.profile_dir, name + ext))
+                except OSError:
+                    pass
+
+    # ---------- admin view ----------
+    def _valid(self, name):
+        return bool(name) and _SAFE.sub("", name) == name and not name.startswith(".")
+
+    def recent(self, limit=50, order="slowest", endpoint=None):
+        """Saved captures (metadata without the function table), slowest or newest first."""
+        out = []
+        try:
+            names = [n for n in os.listdir(self.profile_dir) if n.endswith(".json")]
+        except OSError:
+            return out
+        for n in names:
+            try:
+                with open(os.path.join(self.profile_dir, n), "r", encoding="utf-8") as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if endpoint and meta.get("endpoint") != endpoint:
+                continue
+            meta.pop("top", None)
+            out.append(meta)
+        key = (lambda m: m.get("latency_ms", 0)) if order == "slowest" else (lambda m: m.get("name", ""))
+        out.sort(key=key, reverse=True)
+        return out[:limit]
+
+    def load(self, name):
+        """Metadata (with the top-function table) of one capture, or None."""
+        if not self._valid(name):
+            return None
+        try:
+            with open(os.path.join(self.profile_dir, name + ".json"), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def report(self, name, sort="cumulative", limit=60):
+        """pstats text of one capture, or None."""
+        path = self.prof_path(name)
+        if path is None:
+            return None
+        out = io.StringIO()
+        pstats.Stats(path, stream=out).strip_dirs().sort_stats(sort).print_stats(limit)
+        return out.getvalue()
+
+    def prof_path(self, name):
+        if not self._valid(name):
+            return None
+        path = os.path.join(self.profile_dir, name + ".prof")
+        return path if os.path.exists(path) else None
+
+    def stats(self):
+        with self._lock:
+            out = dict(self.counters)
+        out.update({"sample_rate": self.sample_rate, "token_set": bool(self.token), "keep": self.keep,
+                    "busy": self._active.locked()})
+        return out
+
+
+# shared profiler used by the request hooks in app.py and the admin view
+request_profiler = RequestProfiler()
@@ -0,0 +1,79 @@
+# services/reconcile.py
+"""
+Close-session attendance reconciliation.
+
+Recognition only ever records who was seen. When a teacher ends a class
+session, close_session() turns that into a complete register for the section:
+the roster is read from the Student table (Student.class_name), the session's
+recognized ids are split into present / late by how long after the session
+start they were first seen, and every roster student who was never recognized
+is absent. All rows are written to the Attendance table with one executemany
+INSERT inside a single transaction; closing the same session again replaces
+its rows instead of duplicating them.
+"""
+
+import json
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, insert, select
+
+from database.models import Attendance, Student, db
+from recognition import normalize_class
+
+from .roster import roster
+
+
+def _parse_ts(value):
+    try:
+        return datetime.fromisoformat(str(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def section_roster(class_name):
+    """student_ids whose Student.class_name normalizes to class_name ('CS-B' == 'cs b')."""
+    key = normalize_class(class_name)
+    # distinct class names come straight off the class_name index; the roster
+    # itself is then one IN (...) lookup on the same index
+    names = [c for c in db.session.execute(select(Student.class_name).distinct()).scalars()
+             if c and normalize_class(c) == key]
+    if not names:
+        return set()
+    return set(db.session.execute(select(Student.student_id).where(Student.class_name.in_(names))).scalars())
+
+
+def close_session(cs, late_after_minutes=10, closed_at=None):
+    """
+    Write the full register of a class session `cs` (recognition.ClassSession).
+    Returns { session, class, roster, present, late, absent, off_roster, written }.
+    """
+    roster.ensure_seeded()
+    closed_at = closed_at or datetime.utcnow().isoformat()
+    started = _parse_ts(cs.started_at)
+    late_cutoff = started + timedelta(minutes=late_after_minutes) if started and late_after_minutes is not None else None
+
+    section = section_roster(cs.class_name)
+    recognized = dict(cs.recognized)
+    absent = section - recognized.keys()
+
+    extra = json.dumps({"session": cs.id, "class": cs.class_name, "closed_at": closed_at})
+    rows, counts = [], {"present": 0, "late": 0, "absent": len(absent), "off_roster": 0}
+    for sid, ts in recognized.items():
+        seen = _parse_ts(ts)
+        status = "late" if late_cutoff and seen and seen > late_cutoff else "present"
+        counts[status] += 1
+        if sid not in section:
+            counts["off_roster"] += 1  # matched globally, e.g. a student sitting in on another section
+        rows.append({"student_id": sid, "timestamp": ts, "status": status, "extra": extra, "session_id": cs.id})
+    rows.extend({"student_id": sid, "timestamp": cs.started_at, "status": "absent", "extra": extra,
+                 "session_id": cs.id} for sid in sorted(absent))
+
+    try:
+        db.session.execute(delete(Attendance).where(Attendance.session_id == cs.id))
+        if rows:
+            db.session.execute(insert(Attendance), rows)  # executemany: one statement, one round trip
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return {"session": cs.id, "class": cs.class_name, "roster": len(section), "written": len(rows), **counts}
@@ -0,0 +1,306 @@
+# services/results_store.py
+"""
+Versioned store for data/semester_results.json.
+
+The document is held in memory once and every change bumps `_meta.version`.
+Full publishes rewrite the file. Delta updates (upsert/delete of single
+students or semesters) are applied to the in-memory records and the analytics
+snapshot in place and appended to a small journal next to the file
+(semester_results.journal.jsonl), which is folded back into the main file
+every RESULTS_JOURNAL_COMPACT_EVERY deltas. Readers always see main file +
+journal. Very large full uploads can be streamed in with publish_stream().
+
+Outside STORAGE_BACKEND=json (services/storage.py) the results tables are
+written as well, and once they are the store's source the snapshot is built
+from them; the version then lives in StoreMeta, so other processes notice a
+write by the version instead of the file's mtime.
+"""
+
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+
+from .analytics import ResultsAnalytics, unwrap_records
+from .ingest import MAX_ELEMENT, finish, iter_staged_records, stream_array_to_file, validate_result_record
+from .serialization import dump_file, dumps_str, load_file, loads
+from .storage import RESULTS, storage
+
+DATA_DIR = os.path.join(Path(__file__).resolve().parents[1], "data")
+RESULTS_FILE = os.path.join(DATA_DIR, "semester_results.json")
+
+
+class VersionConflict(Exception):
+    """base_version of a delta does not match the stored version."""
+
+    def __init__(self, current):
+        super().__init__(f"stored version is {current}")
+        self.current = current
+
+
+def _key_of(record):
+    return str(record.get("student_id") or record.get("roll_no") or "")
+
+
+def _sem_order(sem):
+    try:
+        return (0, int(sem), "")
+    except (TypeError, ValueError):
+        return (1, 0, str(sem))
+
+
+class ResultsStore:
+    def __init__(self, path=RESULTS_FILE, compact_every=200):
+        self.path = path
+        self.journal_path = os.path.splitext(path)[0] + ".journal.jsonl"
+        self.compact_every = compact_every
+        self._lock = threading.RLock()
+        self._analytics = None
+        self._seen = None          # _stamp() the memory copy reflects
+        self._journal_len = 0
+
+    # ---------- loading ----------
+    def _stat(self):
+        out = []
+        for p in (self.path, self.journal_path):
+            try:
+                st = os.stat(p)
+                out.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                out.append(None)
+        return tuple(out)
+
+    def _stamp(self):
+        """What changes whenever anybody writes: the table version, or the files' stats."""
+        if storage.uses_tables(RESULTS):
+            return ("sql", storage.store_version(RESULTS))
+        return self._stat()
+
+    def _load(self):
+        """(Re)build memory state when another writer touched the files (or the tables)."""
+        stamp = self._stamp()
+        if self._analytics is not None and stamp == self._seen:
+            return
+        if stamp[0] == "sql":
+            doc = storage.results_document()
+            analytics = None
+            if doc is not None:
+                records, meta = doc
+                meta.setdefault("version", 1)
+                analytics = ResultsAnalytics(records, meta, version=meta["version"])
+            self._analytics, self._seen, self._journal_len = analytics, stamp, 0
+            return
+        self._analytics, self._journal_len = self._load_files(stamp)
+        self._seen = stamp
+
+    def load_from_files(self):
+        """(analytics, journal entries) straight from the JSON files, whatever the backend (used by the importer)."""
+        with self._lock:
+            return self._load_files()
+
+    def _load_files(self, stat=None):
+        """(analytics, journal entries) from the main file + journal; (None, 0) when there is no file."""
+        stat = stat or self._stat()
+        if stat[0] is None:
+            return None, 0
+        raw = load_file(self.path)
+        records, meta = unwrap_records(raw)
+        meta = dict(meta)
+        meta.setdefault("version", 1)
+        analytics = ResultsAnalytics(records, meta, version=meta["version"])
+        journal_len = 0
+        if stat[1] is not None:
+            with open(self.journal_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    entry = loads(line)
+                    if entry.get("version", 0) <= analytics.version:
+                        continue  # already folded into the main file
+                    self._apply(analytics, entry.get("upserts") or [], entry.get("deletes") or [])
+                    analytics.meta.update(entry.get("meta") or {})
+                    analytics.version = analytics.meta["version"] = entry["version"]
+                    journal_len += 1
+            analytics.refresh_ranks()
+        return analytics, journal_len
+
+    def analytics(self):
+        """Current ResultsAnalytics snapshot, or None if nothing is published."""
+        with self._lock:
+            self._load()
+            return self._analytics
+
+    def document(self):
+        """{ _meta, records } as stored (records shared, do not mutate)."""
+        a = self.analytics()
+        if a is None:
+            return None
+        return {"_meta": a.meta, "records": a.records}
+
+    @property
+    def version(self):
+        a = self.analytics()
+        return 0 if a is None else a.version
+
+    # ---------- writing ----------
+    def _write_main(self, records, meta):
+        dump_file(self.path, {"_meta": meta, "records": records})  # compact, atomic
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+
+    def publish(self, records, saved_by=None):
+        """Replace the whole document (full upload). Returns the new version."""
+        with self._lock:
+            self._load()
+            version = (self._analytics.version if self._analytics else 0) + 1
+            meta = {"lastSavedAt": datetime.utcnow().isoformat(),
+                    "lastSavedBy": saved_by or {"id": "api", "name": "API"},
+                    "version": version}
+            if storage.uses_tables(RESULTS):
+                storage.replace_results(records, meta)
+            if storage.writes_json():
+                self._write_main(records, meta)
+            self._analytics = ResultsAnalytics(records, meta, version=version)
+            self._journal_len = 0
+            self._seen = self._stamp()
+            return version
+
+    def publish_stream(self, stream, job, saved_by=None, chunk_size=64 * 1024, max_element=MAX_ELEMENT):
+        """
+        Full publish from a streamed JSON array (see services.ingest). Records are
+        validated and written to a staging file as they arrive; the store lock is
+        only held to pick the version and to swap the file in, so reads keep
+        working during a long upload. The new snapshot is built lazily on the
+        next read. Raises VersionConflict if another write landed meanwhile.
+        """
+        with self._lock:
+            self._load()
+            base = self._analytics.version if self._analytics else 0
+        version = base + 1
+        meta = {"lastSavedAt": datetime.utcnow().isoformat(),
+                "lastSavedBy": saved_by or {"id": "api", "name": "API"},
+                "version": version}
+        staging = f"{self.path}.{job['id']}.part"
+        stream_array_to_file(stream, staging, job, validate=validate_result_record,
+                             meta_fn=lambda j: dict(meta, count=j["written"]), chunk_size=chunk_size,
+                             max_element=max_element)
+        with self._lock:
+            self._load()
+            current = self._analytics.version if self._analytics else 0
+            if current != base:
+                os.remove(staging)
+                finish(job, "failed", f"stored version moved to {current} during upload")
+                raise VersionConflict(current)
+            try:
+                if storage.uses_tables(RESULTS):
+                    storage.replace_results(iter_staged_records(staging, chunk_size=chunk_size), meta)
+            except Exception as e:
+                os.remove(staging)
+                finish(job, "failed", str(e))
+                raise
+            if storage.writes_json():
+                os.replace(staging, self.path)
+                if os.path.exists(self.journal_path):
+                    os.remove(self.journal_path)
+            else:
+                os.remove(staging)
+            self._analytics, self._seen, self._journal_len = None, None, 0
+        job["version"] = version
+        finish(job, "done")
+        return version
+
+    def apply_delta(self, base_version, upserts=(), deletes=(), saved_by=None):
+        """
+        Optimistic-concurrency delta update.
+        upserts: records matched by student_id (then roll_no). Top-level fields
+                 overwrite; `semesters` entries are merged by `sem` unless
+                 the entry has "replace_semesters": true.
+        deletes: {student_id} drops a student, {student_id, sem} drops one semester.
+        Raises VersionConflict if base_version is stale. Returns the new version.
+        """
+        upserts, deletes = list(upserts), list(deletes)
+        for entry in upserts:
+            err = validate_result_record(entry)
+            if err:
+                raise ValueError(f"upsert {_key_of(entry) if isinstance(entry, dict) else entry!r}: {err}")
+        for entry in deletes:
+            if not isinstance(entry, dict) or not _key_of(entry):
+                raise ValueError("every upsert/delete needs student_id or roll_no")
+        with self._lock:
+            self._load()
+            current = self._analytics.version if self._analytics else 0
+            if base_version != current:
+                raise VersionConflict(current)
+            force_write = self._analytics is None
+            if force_write:
+                # first publish through the delta API: start from an empty document
+                self._analytics = ResultsAnalytics([], {}, version=0)
+            a = self._analytics
+            version = current + 1
+            meta = {"lastSavedAt": datetime.utcnow().isoformat(),
+                    "lastSavedBy": saved_by or {"id": "api", "name": "API"},
+                    "version": version}
+            try:
+                resolved = self._apply(a, upserts, deletes)
+                a.refresh_ranks()
+                a.meta.update(meta)
+                a.version = version
+
+                if storage.uses_tables(RESULTS):
+                    storage.apply_results_delta(resolved, deletes, meta)
+                if not storage.writes_json():
+                    self._journal_len = 0
+                elif force_write or self._journal_len + 1 >= self.compact_every:
+                    self._write_main(a.records, a.meta)
+                    self._journal_len = 0
+                else:
+                    entry = {"version": version, "meta": meta, "upserts": resolved, "deletes": deletes}
+                    with open(self.journal_path, "a", encoding="utf-8") as f:
+                        f.write(dumps_str(entry) + "\n")
+                    self._journal_len += 1
+            except Exception:
+                # the snapshot may be half-updated and is ahead of what was stored: reload on next read
+                self._analytics, self._seen, self._journal_len = None, None, 0
+                raise
+            self._seen = self._stamp()
+            return version
+
+    @staticmethod
+    def _apply(analytics, upserts, deletes):
+        """Mutate the snapshot; returns upserts resolved to full records (for the journal)."""
+        resolved = []
+        for patch in upserts:
+            existing = analytics.record(patch.get("student_id") or "") or analytics.record(patch.get("roll_no") or "")
+            record = dict(existing or {})
+            for k, v in patch.items():
+                if k in ("semesters", "replace_semesters"):
+                    continue
+                record[k] = v
+            if "semesters" in patch:
+                if patch.get("replace_semesters") or existing is None:
+                    record["semesters"] = list(patch["semesters"])
+                else:
+                    by_sem = {str(s.get("sem")): s for s in existing.get("semesters") or []}
+                    for s in patch["semesters"]:
+                        by_sem[str(s.get("sem"))] = {**by_sem.get(str(s.get("sem")), {}), **s}
+                    record["semesters"] = sorted(by_sem.values(), key=lambda s: _sem_order(s.get("sem")))
+            analytics.upsert(record)
+            # journal the full record so replay does not depend on merge order
+            resolved.append(dict(record, replace_semesters=True))
+        for d in deletes:
+            key = str(d.get("student_id") or d.get("roll_no") or "")
+            existing = analytics.record(key)
+            if existing is None:
+                continue
+            if d.get("sem") is None:
+                analytics.remove(key)
+            else:
+                record = dict(existing)
+                record["semesters"] = [s for s in existing.get("semesters") or [] if str(s.get("sem")) != str(d["sem"])]
+                analytics.upsert(record)
+        return resolved
+
+
+# shared store used by app.py and the blueprints
+results_store = ResultsStore()
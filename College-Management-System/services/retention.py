@@ -0,0 +1,259 @@
+# services/retention.py
+"""
+Retention for capture images and attendance partitions.
+
+One run (run_retention) does, oldest first and within an I/O budget
+(max_files / max_bytes per run, so a cron job never stalls the disk; the
+next run picks up where this one stopped):
+
+1. Orphan pruning: captures older than `orphan_grace_days` that no
+   attendance record points at (e.g. left behind by clear-attendance) are
+   deleted. Records are read through services.storage, so the Attendance
+   table counts in the sql / dual backends; when the records cannot be read
+   nothing is pruned in that pass.
+2. Archiving: remaining captures older than `archive_after_days` are packed
+   into one compressed bundle per month,
+   static/uploads/archive/captures-<YYYY-MM>.zip, and removed from the
+   captures directory. The bundle month is part of every capture file name
+   (capture_<YYYYmmddHHMMSS...>), so open_capture() finds an archived image
+   with one zip directory lookup; archive/index.json records per-bundle
+   counts and the few captures whose month cannot be read from the name.
+3. Expiry: with `delete_after_days` > 0, whole bundles whose month ended
+   longer ago than that are deleted.
+4. Compaction: attendance partitions older than `compress_after_months`
+   are gzip'd in place.
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+import zipfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from .attendance_log import UNDATED, attendance_log
+from .storage import storage
+
+BASE_DIR = str(Path(__file__).resolve().parents[1])
+CAPTURE_DIR = os.path.join(BASE_DIR, "static", "uploads", "captures")
+ARCHIVE_DIR = os.path.join(BASE_DIR, "static", "uploads", "archive")
+
+_STAMP = re.compile(r"_(\d{4})(\d{2})(\d{2})(\d{2})(\d{2})(\d{2})\d*_")
+_index_lock = threading.Lock()
+logger = logging.getLogger(__name__)
+
+
+def capture_time(name, path=None):
+    """Capture time from the file name (make_unique_filename), else the file's mtime."""
+    m = _STAMP.search(name)
+    if m:
+        try:
+            return datetime(*(int(g) for g in m.groups()))
+        except ValueError:
+            pass
+    if path is not None:
+        try:
+            return datetime.utcfromtimestamp(os.path.getmtime(path))
+        except OSError:
+            pass
+    return None
+
+
+def _month(dt):
+    return dt.strftime("%Y-%m")
+
+
+def _next_month(month):
+    y, m = int(month[:4]), int(month[5:7])
+    return f"{y + (m == 12)}-{1 if m == 12 else m + 1:02d}"
+
+
+def bundle_path(month, archive_dir=ARCHIVE_DIR):
+    return os.path.join(archive_dir, f"captures-{month}.zip")
+
+
+def load_index(archive_dir=ARCHIVE_DIR):
+    try:
+        with open(os.path.join(archive_dir, "index.json"), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except Exception:
+        return {}
+
+
+def _save_index(index, archive_dir):
+    path = os.path.join(archive_dir, "index.json")
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+def open_capture(name, capture_dir=CAPTURE_DIR, archive_dir=ARCHIVE_DIR):
+    """
+    Bytes of a capture by file name, from the captures directory or its
+    archive bundle. Returns None when it does not exist (or was expired).
+    """
+    name = os.path.basename(name)
+    live = os.path.join(capture_dir, name)
+    if os.path.exists(live):
+        with open(live, "rb") as f:
+            return f.read()
+    dt = capture_time(name)
+    month = _month(dt) if dt else load_index(archive_dir).get("undated_names", {}).get(name)
+    if not month:
+        return None
+    try:
+        with zipfile.ZipFile(bundle_path(month, archive_dir)) as z:
+            return z.read(name)
+    except (OSError, KeyError, zipfile.BadZipFile):
+        return None
+
+
+def _scan(capture_dir, cutoff):
+    """(time, name, path, size) of captures older than cutoff, oldest first."""
+    found = []
+    try:
+        entries = os.scandir(capture_dir)
+    except OSError:
+        return found
+    with entries:
+        for entry in entries:
+            if not entry.is_file():
+                continue
+            dt = capture_time(entry.name, entry.path)
+            if dt is not None and dt < cutoff:
+                found.append((dt, entry.name, entry.path, entry.stat().st_size))
+    found.sort()
+    return found
+
+
+def _referenced(read, month, cache):
+    """Capture file names referenced by attendance records of `month` (and the next, for month-end races)."""
+    if month not in cache:
+        names = set()
+        for record in read(month, _next_month(month)):
+            image = record.get("image")
+            if image:
+                names.add(os.path.basename(str(image).replace("\\", "/")))
+        cache[month] = names
+    return cache[month]
+
+
+def run_retention(log=None, capture_dir=CAPTURE_DIR, archive_dir=ARCHIVE_DIR,
+                  archive_after_days=30, orphan_grace_days=7, delete_after_days=0,
+                  compress_after_months=2, max_files=5000, max_bytes=512 * 1024 * 1024,
+                  dry_run=False, now=None):
+    """
+    One bounded retention pass. Returns a report dict (nothing is touched with dry_run).
+    log: the attendance log whose partitions are compacted (default the shared one). Orphans
+    are judged by storage.attendance(), which needs an app context.
+    """
+    log = log or attendance_log
+    now = now or datetime.utcnow()
+    report = {"dry_run": dry_run, "pruned": 0, "archived": 0, "bytes": 0, "bundles_expired": [],
+              "partitions_compressed": [], "more": False}
+    budget = {"files": max_files, "bytes": max_bytes}
+
+    def spend(size):
+        if budget["files"] <= 0 or budget["bytes"] < size:
+            report["more"] = True
+            return False
+        budget["files"] -= 1
+        budget["bytes"] -= size
+        report["bytes"] += size
+        return True
+
+    if not dry_run:
+        os.makedirs(archive_dir, exist_ok=True)
+    with _index_lock:
+        index = load_index(archive_dir)
+        bundles = index.setdefault("bundles", {})
+        undated = index.setdefault("undated_names", {})
+
+        # 1) + 2) prune orphans, archive the rest (oldest first)
+        thresholds = [d for d in (orphan_grace_days, archive_after_days) if d is not None]
+        candidates = _scan(capture_dir, now - timedelta(days=min(thresholds))) if thresholds else []
+        referenced_cache = {}
+        prune = orphan_grace_days is not None
+        to_archive = {}  # month -> [(name, path, size)]
+        for dt, name, path, size in candidates:
+            month = _month(dt)
+            age = now - dt
+            orphan = False
+            if prune and age > timedelta(days=orphan_grace_days):
+                try:
+                    orphan = name not in _referenced(storage.attendance, month, referenced_cache)
+                except Exception as e:  # unknown references: deleting anything could lose evidence
+                    logger.warning("attendance records unreadable, orphan pruning skipped: %s", e)
+                    report["orphans_skipped"] = f"{type(e).__name__}: {e}"
+                    prune = False
+            if orphan:
+                if not spend(size):
+                    break
+                report["pruned"] += 1
+                if not dry_run:
+                    os.remove(path)
+                continue
+            if archive_after_days is not None and age > timedelta(days=archive_after_days):
+                if not spend(size):
+                    break
+                to_archive.setdefault(month, []).append((name, path, size))
+
+        for month, files in to_archive.items():
+            report["archived"] += len(files)
+            if dry_run:
+                continue
+            target = bundle_path(month, archive_dir)
+            with zipfile.ZipFile(target, "a", compression=zipfile.ZIP_DEFLATED) as z:
+                have = set(z.namelist())
+                for name, path, _size in files:
+                    if name not in have:  # a previous run may have died after writing, before removing
+                        z.write(path, arcname=name)
+            # the bundle is closed (central directory written) before any original goes away
+            for name, path, size in files:
+                os.remove(path)
+                if not _STAMP.search(name):
+                    undated[name] = month
+            entry = bundles.setdefault(month, {"bundle": os.path.basename(target), "files": 0, "bytes": 0})
+            entry["files"] += len(files)
+            entry["bytes"] += sum(f[2] for f in files)
+            entry["updated"] = now.isoformat()
+
+        # 3) expire whole bundles
+        if delete_after_days:
+            for month in sorted(bundles):
+                month_end = datetime.strptime(_next_month(month) + "-01", "%Y-%m-%d")
+                if now - month_end <= timedelta(days=delete_after_days):
+                    continue
+                report["bundles_expired"].append(month)
+                if not dry_run:
+                    try:
+                        os.remove(bundle_path(month, archive_dir))
+                    except OSError:
+                        pass
+                    bundles.pop(month, None)
+                    for name in [n for n, m in undated.items() if m == month]:
+                        undated.pop(name)
+
+        if not dry_run:
+            index["last_run"] = now.isoformat()
+            _save_index(index, archive_dir)
+
+    # 4) compact old attendance partitions
+    if compress_after_months is not None:
+        y, m = now.year, now.month - compress_after_months
+        while m <= 0:
+            y, m = y - 1, m + 12
+        cutoff = f"{y:04d}-{m:02d}"
+        for month, info in log.partition_stats().items():
+            if month == UNDATED or month >= cutoff or not any(f.endswith(".jsonl") for f in info["files"]):
+                continue
+            if not spend(info["bytes"]):
+                break
+            report["partitions_compressed"].append(month)
+            if not dry_run:
+                log.compress(month)
+    return report
@@ -0,0 +1,239 @@
+# services/roster.py
+"""
+Student / teacher rosters backed by the Student and Teacher tables.
+
+Enrollment still appends to students.json / teachers.json, and also upserts
+the row here (keyed by student_id / teacher_id, so duplicate JSON entries
+collapse to the latest one). Roster pages are read with ORDER BY + LIMIT/OFFSET
+against indexed columns, and the aggregate counts the dashboard shows (per
+class, per department) are cached in memory and adjusted on each enrollment,
+so a dashboard render costs the same at 50 or 50,000 students.
+
+On first use, rows missing from the tables are seeded from the JSON files.
+"""
+
+import json
+import os
+import threading
+from collections import Counter
+from pathlib import Path
+
+from sqlalchemy import func, select
+
+from database.models import Student, Teacher, db
+
+from .analytics import department_of
+
+DATA_DIR = os.path.join(Path(__file__).resolve().parents[1], "data")
+
+STUDENT_SORTS = {
+    "name": Student.name,
+    "student_id": Student.student_id,
+    "class": Student.class_name,
+    "roll_no": Student.roll_no,
+    "enrolled_at": Student.enrolled_at,
+}
+TEACHER_SORTS = {
+    "name": Teacher.name,
+    "teacher_id": Teacher.teacher_id,
+    "department": Teacher.department,
+    "enrolled_at": Teacher.enrolled_at,
+}
+
+
+def _load_json(fname):
+    try:
+        with open(os.path.join(DATA_DIR, fname), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, list) else []
+    except Exception:
+        return []
+
+
+def _teacher_department(record):
+    return str(record.get("department") or "").strip().upper()
+
+
+class Roster:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._counts = None
+        self._seeded = False
+
+    # ---------- writes ----------
+    def _apply_student(self, record):
+        """Upsert one students.json record; returns the previous (class, department) or None."""
+        sid = str(record.get("student_id") or "").strip()
+        if not sid:
+            return None, None
+        row = db.session.execute(select(Student).where(Student.student_id == sid)).scalar_one_or_none()
+        old = None
+        if row is None:
+            row = Student(student_id=sid, name=record.get("name") or sid)
+            db.session.add(row)
+        else:
+            old = (row.class_name or "", department_of({"class": row.class_name}))
+        row.name = record.get("name") or row.name
+        row.class_name = record.get("class") or None
+        row.roll_no = record.get("roll_no") or None
+        row.face_image = record.get("face_image") or row.face_image
+        row.enrolled_at = record.get("enrolled_at") or row.enrolled_at
+        return row, old
+
+    def _apply_teacher(self, record):
+        tid = str(record.get("teacher_id") or "").strip()
+        if not tid:
+            return None, None
+        row = db.session.execute(select(Teacher).where(Teacher.teacher_id == tid)).scalar_one_or_none()
+        old = None
+        if row is None:
+            row = Teacher(teacher_id=tid, name=record.get("name") or tid)
+            db.session.add(row)
+        else:
+            old = _teacher_department({"department": row.department})
+        row.name = record.get("name") or row.name
+        row.department = record.get("department") or None
+        row.assigned_classes = record.get("assigned_classes") or None
+        row.face_image = record.get("face_image") or row.face_image
+        row.enrolled_at = record.get("enrolled_at") or row.enrolled_at
+        return row, old
+
+    def seed_from_json(self):
+        """Copy students.json / teachers.json rows the tables do not have yet."""
+        with self._lock:
+            have_s = set(db.session.execute(select(Student.student_id)).scalars())
+            have_t = set(db.session.execute(select(Teacher.teacher_id)).scalars())
+            added = 0
+            for record in _load_json("students.json"):
+                if str(record.get("student_id") or "").strip() not in have_s:
+                    row, _ = self._apply_student(record)
+                    added += row is not None
+                    have_s.add(str(record.get("student_id") or "").strip())
+            for record in _load_json("teachers.json"):
+                if str(record.get("teacher_id") or "").strip() not in have_t:
+                    row, _ = self._apply_teacher(record)
+                    added += row is not None
+                    have_t.add(str(record.get("teacher_id") or "").strip())
+            db.session.commit()
+            self._seeded = True
+            if added:
+                self._counts = None
+            return added
+
+    def invalidate_counts(self):
+        """Drop the cached totals after the tables were written around the roster (e.g. by the JSON importer)."""
+        with self._lock:
+            self._counts = None
+
+    def ensure_seeded(self):
+        """Seed from the JSON files once per process (students enrolled before the tables existed)."""
+        with self._lock:
+            if not self._seeded:
+                self.seed_from_json()
+
+    def add_student(self, record):
+        """Upsert an enrolled student and adjust the cached counts."""
+        with self._lock:
+            self.ensure_seeded()
+            row, old = self._apply_student(record)
+            if row is None:
+                return
+            db.session.commit()
+            if self._counts is not None:
+                c = self._counts["students"]
+                if old is None:
+                    c["total"] += 1
+                else:
+                    c["by_class"][old[0]] -= 1
+                    c["by_department"][old[1]] -= 1
+                c["by_class"][row.class_name or ""] += 1
+                c["by_department"][department_of({"class": row.class_name})] += 1
+
+    def add_teacher(self, record):
+        with self._lock:
+            self.ensure_seeded()
+            row, old = self._apply_teacher(record)
+            if row is None:
+                return
+            db.session.commit()
+            if self._counts is not None:
+                c = self._counts["teachers"]
+                if old is None:
+                    c["total"] += 1
+                else:
+                    c["by_department"][old] -= 1
+                c["by_department"][_teacher_department({"department": row.department})] += 1
+
+    def add_many(self, kind, records):
+        """Upsert a batch of enrollments ('student' / 'teacher') in one transaction; counts are rebuilt on next read."""
+        apply = self._apply_student if kind == "student" else self._apply_teacher
+        with self._lock:
+            self.ensure_seeded()
+            added = 0
+            for record in records:
+                row, _old = apply(record)
+                added += row is not None
+            db.session.commit()
+            self._counts = None
+            return added
+
+    # ---------- reads ----------
+    def _build_counts(self):
+        by_class = Counter()
+        by_dept = Counter()
+        for class_name, n in db.session.execute(select(Student.class_name, func.count()).group_by(Student.class_name)):
+            by_class[class_name or ""] += n
+            by_dept[department_of({"class": class_name})] += n
+        t_dept = Counter()
+        for dept, n in db.session.execute(select(Teacher.department, func.count()).group_by(Teacher.department)):
+            t_dept[_teacher_department({"department": dept})] += n
+        return {
+            "students": {"total": sum(by_class.values()), "by_class": by_class, "by_department": by_dept},
+            "teachers": {"total": sum(t_dept.values()), "by_department": t_dept},
+        }
+
+    def counts(self):
+        """Cached { students: {total, by_class, by_department}, teachers: {total, by_department} }."""
+        with self._lock:
+            self.ensure_seeded()
+            if self._counts is None:
+                self._counts = self._build_counts()
+            out = {}
+            for kind, c in self._counts.items():
+                out[kind] = {k: (dict(sorted((label, n) for label, n in v.items() if n > 0))
+                                 if isinstance(v, Counter) else v)
+                             for k, v in c.items()}
+            return out
+
+    def _page(self, model, sorts, sort, order, page, per_page, filters=()):
+        column = sorts.get(sort) or next(iter(sorts.values()))
+        key = column.desc() if order == "desc" else column.asc()
+        q = select(model)
+        count_q = select(func.count()).select_from(model)
+        for f in filters:
+            q, count_q = q.where(f), count_q.where(f)
+        total = db.session.execute(count_q).scalar() or 0
+        rows = db.session.execute(
+            q.order_by(key, model.id).limit(per_page).offset((page - 1) * per_page)
+        ).scalars()
+        return {"total": total, "page": page, "per_page": per_page,
+                "sort": sort if sort in sorts else next(iter(sorts)), "order": order,
+                "items": [r.to_dict() for r in rows]}
+
+    def students(self, page=1, per_page=25, sort="name", order="asc", class_name=None):
+        page, per_page = max(1, int(page)), max(1, min(int(per_page), 200))
+        with self._lock:
+            self.ensure_seeded()
+        filters = [Student.class_name == class_name] if class_name else []
+        return self._page(Student, STUDENT_SORTS, sort, order, page, per_page, filters)
+
+    def teachers(self, page=1, per_page=25, sort="name", order="asc", department=None):
+        page, per_page = max(1, int(page)), max(1, min(int(per_page), 200))
+        with self._lock:
+            self.ensure_seeded()
+        filters = [Teacher.department == department] if department else []
+        return self._page(Teacher, TEACHER_SORTS, sort, order, page, per_page, filters)
+
+
+# shared roster used by app.py (enrollment), the admin dashboard and the api blueprint
+roster = Roster()
@@ -0,0 +1,149 @@
+# services/serialization.py
+"""
+JSON encoding for API responses and the data/*.json files.
+
+One entry point (dumps / loads / dump_file / load_file) with two backends:
+orjson when it is installed (pip install orjson; several times faster in
+both directions and returns bytes, which is what a response body and a file
+write want anyway), and the standard library otherwise. The output of both
+is the same document:
+
+- compact by default; pretty (2-space indent) only on demand: pretty=True,
+  ?pretty=1 on an API request, debug mode, or JSON_PRETTY_FILES for files
+- datetimes / dates as ISO strings, sets and tuples as lists, Decimals as
+  numbers, numpy scalars and arrays as numbers and lists
+- model objects (anything with to_dict(), e.g. database.models rows) encode
+  as their to_dict() output, so a view can jsonify rows directly
+- non-string dict keys (ints) become strings, as json.dumps does
+
+FastJSONProvider plugs this into Flask, so every jsonify() uses it.
+"""
+
+import datetime as _dt
+import decimal
+import json
+import os
+import tempfile
+
+from flask import has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except Exception:  # optional; the stdlib path produces the same documents
+    orjson = None
+
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+BACKEND = "orjson" if orjson is not None else "json"
+
+
+def default(obj):
+    """Typed encoders for what plain JSON does not cover (used by both backends)."""
+    to_dict = getattr(obj, "to_dict", None)
+    if callable(to_dict):
+        return to_dict()
+    if isinstance(obj, (_dt.datetime, _dt.date, _dt.time)):
+        return obj.isoformat()
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    if isinstance(obj, bytes):
+        return obj.decode("utf-8", "replace")
+    if np is not None:
+        if isinstance(obj, np.generic):
+            return obj.item()
+        if isinstance(obj, np.ndarray):
+            return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def use_backend(name):
+    """Force 'orjson' or 'json' (benchmarks); returns the backend now in use."""
+    global BACKEND
+    if name == "orjson" and orjson is None:
+        raise RuntimeError("orjson is not installed")
+    BACKEND = name
+    return BACKEND
+
+
+def dumps(obj, pretty=False, sort_keys=False):
+    """Encode to UTF-8 bytes."""
+    if BACKEND == "orjson":
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        if pretty:
+            option |= orjson.OPT_INDENT_2
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        try:
+            return orjson.dumps(obj, default=default, option=option)
+        except (orjson.JSONEncodeError, TypeError):
+            pass  # e.g. integers beyond 64 bits; the stdlib handles those
+    text = json.dumps(obj, default=default, ensure_ascii=False, sort_keys=sort_keys,
+                      indent=2 if pretty else None, separators=None if pretty else (",", ":"))
+    return text.encode("utf-8")
+
+
+def dumps_str(obj, pretty=False, sort_keys=False):
+    return dumps(obj, pretty=pretty, sort_keys=sort_keys).decode("utf-8")
+
+
+def loads(data):
+    """Decode bytes or str."""
+    if BACKEND == "orjson":
+        return orjson.loads(data)
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        data = bytes(data).decode("utf-8")
+    return json.loads(data)
+
+
+def dump_file(path, obj, pretty=False):
+    """Write atomically (temp file + rename): readers never see half a document."""
+    data = dumps(obj, pretty=pretty)
+    folder = os.path.dirname(os.path.abspath(path))
+    os.makedirs(folder, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=folder, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            if pretty:
+                f.write(b"\n")
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+    return len(data)
+
+
+def load_file(path, default=None):
+    """Parsed file contents, or `default` if it is missing or unreadable."""
+    try:
+        with open(path, "rb") as f:
+            return loads(f.read())
+    except (OSError, ValueError):
+        return default
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider on top of dumps()/loads(); install with app.json = FastJSONProvider(app)."""
+
+    def dumps(self, obj, **kwargs):
+        return dumps_str(obj, pretty=bool(kwargs.get("indent")), sort_keys=kwargs.get("sort_keys", False))
+
+    def loads(self, s, **kwargs):
+        return loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        pretty = self.compact is False or (self.compact is None and self._app.debug)
+        if has_request_context() and request.args.get("pretty") in ("1", "true"):
+            pretty = True
+        return self._app.response_class(dumps(obj, pretty=pretty, sort_keys=self.sort_keys),
+                                        mimetype=self.mimetype)
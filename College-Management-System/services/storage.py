@@ -0,0 +1,543 @@
+# services/storage.py
+"""
+Where the app's data lives: the JSON files under data/ or the indexed tables.
+
+STORAGE_BACKEND selects it:
+
+    json   students.json, teachers.json, sessional_marks.json,
+           semester_results.json and the attendance log (the default)
+    dual   cutover phase: every write goes to both; a store is read from its
+           tables once it has been migrated (python migrate_json.py), from
+           JSON until then. Rolling back is switching to json again.
+    sql    tables only; the JSON files are no longer written
+
+The stores and their tables:
+
+    students / teachers   Student / Teacher (already mirrored by services.roster
+                          in every mode, so they are always read from the tables
+                          outside json mode)
+    sessional_marks       Mark rows. These are written in every mode, because the
+                          delta sync (/api/marks/sync, ?since=) runs on them:
+                          a full save goes through marks_sync.replace_all, and
+                          rows accepted by a delta save are patched into the
+                          file whenever the file is written, so both stay alike
+    attendance            Attendance rows with source="capture", written in every
+                          mode so the time-range API (services.timeline) sees them
+    semester_results      ResultRecord + ResultSemester rows, keyed like the
+                          document (not tied to enrolled students); the
+                          document version lives in StoreMeta
+
+A store counts as migrated once it has a StoreMeta row. The first write in
+sql mode creates that row, and so does migrate_json.py. Fields without a
+column of their own are kept as JSON next to the row.
+"""
+
+import logging
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+
+from flask import current_app, has_app_context
+from sqlalchemy import delete, insert, select
+
+from database.models import (Attendance, Mark, ResultRecord, ResultSemester, StoreMeta, Student, Teacher,
+                             db)
+
+from . import marks_sync
+from .attendance_log import attendance_log
+from .blobstore import BlobStore, digest_of_path
+from .ingest import iter_staged_records
+from .roster import roster
+from .serialization import dump_file, dumps_str, load_file, loads
+
+log = logging.getLogger(__name__)
+
+DATA_DIR = os.path.join(Path(__file__).resolve().parents[1], "data")
+BACKENDS = ("json", "dual", "sql")
+
+STUDENTS, TEACHERS = "students", "teachers"
+MARKS, ATTENDANCE, RESULTS = "sessional_marks", "attendance", "semester_results"
+PROFILE_FILES = {"student": "students.json", "teacher": "teachers.json"}
+MARKS_FILE = os.path.join(DATA_DIR, "sessional_marks.json")
+CAPTURE = "capture"
+
+
+def _month_bounds(start, end):
+    """Epoch range [lo, hi) for 'YYYY-MM' months start..end inclusive (either may be None)."""
+    def first_of(month, delta=0):
+        try:
+            y, m = int(month[:4]), int(month[5:7]) + delta
+        except (TypeError, ValueError):
+            return None
+        y, m = y + (m - 1) // 12, (m - 1) % 12 + 1
+        return int((datetime(y, m, 1) - datetime(1970, 1, 1)).total_seconds())
+    return (first_of(start) if start else None), (first_of(end, 1) if end else None)
+
+
+def face_fields(profile):
+    """face_blob / face_url (not columns) from a blob face_image path."""
+    digest = digest_of_path(profile.get("face_image"))
+    if digest:
+        profile["face_blob"] = digest
+        profile["face_url"] = BlobStore.url(digest, str(profile["face_image"]).rsplit(".", 1)[-1])
+    return profile
+
+
+def student_profile(row):
+    return face_fields({"name": row.name, "student_id": row.student_id, "class": row.class_name or "",
+                        "roll_no": row.roll_no or "", "enrolled_at": row.enrolled_at, "face_image": row.face_image})
+
+
+def teacher_profile(row):
+    return face_fields({"name": row.name, "teacher_id": row.teacher_id, "department": row.department or "",
+                        "assigned_classes": row.assigned_classes or "", "enrolled_at": row.enrolled_at,
+                        "face_image": row.face_image})
+
+
+def mark_record(row):
+    """Mark row -> a sessional_marks.json record."""
+    return {"student_id": row.student_id, "semester": row.semester, "name": row.name, "class": row.class_name,
+            "roll_no": row.roll_no, "marks": row.marks, "gpa": row.gpa}
+
+
+def attendance_row(record):
+    """Attendance-log record -> Attendance insert parameters."""
+    session_id = record.get("session")
+    return {"student_id": record.get("id") or record.get("student_id"), "timestamp": record.get("ts"),
+            "status": record.get("status") or "present", "session_id": str(session_id)[:64] if session_id else None,
+            "source": CAPTURE, "extra": dumps_str({"name": record.get("name"), "image": record.get("image")})}
+
+
+def attendance_record(row, name=None):
+    """Attendance row -> the attendance-log record shape /api/get-attendance returns."""
+    try:
+        extra = loads(row.extra) if row.extra else {}
+    except ValueError:
+        extra = {}
+    if not isinstance(extra, dict):
+        extra = {}
+    return {"id": row.student_id, "name": extra.get("name") or name, "status": row.status, "ts": row.timestamp,
+            "ts_epoch": row.ts_epoch, "session": row.session_id or extra.get("session"), "image": extra.get("image")}
+
+
+def _int_or_none(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _float_or_none(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def result_key(record):
+    return str(record.get("student_id") or record.get("roll_no") or "").strip()
+
+
+RESULT_FIELDS = {"student_id": "student_id", "roll_no": "roll_no", "name": "name", "class": "class_name"}
+SEMESTER_NUMBERS = {"year": _int_or_none, "marks": _float_or_none, "gpa": _float_or_none}
+
+
+def result_rows(record):
+    """
+    (ResultRecord params, [ResultSemester params]) for one results record.
+    Fields without a column are kept as JSON in `extra`, and so are year /
+    marks / gpa values that are not numbers. The last entry for a sem wins.
+    """
+    key = result_key(record)
+    header = {"key": key}
+    for field, col in RESULT_FIELDS.items():
+        value = record.get(field)
+        header[col] = str(value) if value is not None else None
+    rest = {k: v for k, v in record.items() if k not in RESULT_FIELDS and k not in ("semesters", "replace_semesters")}
+    header["extra"] = dumps_str(rest) if rest else None
+    by_sem = {}
+    for s in record.get("semesters") or []:
+        if not isinstance(s, dict):
+            raise ValueError(f"{key}: every semester must be an object with a sem")
+        try:
+            sem = int(s.get("sem"))
+        except (TypeError, ValueError):
+            raise ValueError(f"{key}: semester {s.get('sem')!r} is not a number")
+        row = {"record_key": key, "sem_number": sem}
+        extra = {k: v for k, v in s.items() if k != "sem" and k not in SEMESTER_NUMBERS}
+        for field, convert in SEMESTER_NUMBERS.items():
+            value = s.get(field)
+            row[field] = convert(value)
+            if value is not None and row[field] is None:
+                extra[field] = value
+        row["extra"] = dumps_str(extra) if extra else None
+        by_sem[sem] = row
+    return header, list(by_sem.values())
+
+
+def result_record(header, semesters):
+    """ResultRecord + its ResultSemester rows -> the JSON record."""
+    record = {field: getattr(header, col) for field, col in RESULT_FIELDS.items() if getattr(header, col) is not None}
+    record.update(_extra(header.extra))
+    record["semesters"] = []
+    for s in semesters:
+        entry = {"sem": s.sem_number}
+        for field in SEMESTER_NUMBERS:
+            if getattr(s, field) is not None:
+                entry[field] = getattr(s, field)
+        entry.update(_extra(s.extra))
+        record["semesters"].append(entry)
+    return record
+
+
+def _extra(text):
+    try:
+        value = loads(text) if text else {}
+    except ValueError:
+        return {}
+    return value if isinstance(value, dict) else {}
+
+
+class Storage:
+    def __init__(self, backend="json"):
+        self._backend = backend
+        self._migrated = set()  # stores known to have a StoreMeta row (never un-migrated)
+        self._marks_lock = threading.Lock()  # sessional_marks.json read-modify-writes
+
+    def configure(self, backend=None):
+        """Backend outside an app context (scripts); inside one STORAGE_BACKEND wins."""
+        if backend:
+            if backend not in BACKENDS:
+                raise ValueError(f"STORAGE_BACKEND must be one of {', '.join(BACKENDS)}")
+            self._backend = backend
+
+    @property
+    def backend(self):
+        if has_app_context():
+            value = str(current_app.config.get("STORAGE_BACKEND", self._backend) or "json").lower()
+            return value if value in BACKENDS else "json"
+        return self._backend
+
+    # ---------- routing ----------
+    def migrated(self, store):
+        if store in self._migrated:
+            return True
+        if db.session.get(StoreMeta, store) is not None:
+            self._migrated.add(store)
+            return True
+        return False
+
+    def uses_tables(self, store):
+        """Reads (and table writes) of `store` go to the tables."""
+        backend = self.backend
+        if backend == "json":
+            return False
+        if store in (STUDENTS, TEACHERS):
+            return True
+        return backend == "sql" or self.migrated(store)
+
+    def writes_json(self):
+        return self.backend != "sql"
+
+    def store_version(self, store):
+        row = db.session.get(StoreMeta, store)
+        return row.version if row is not None else 0
+
+    def touch(self, store, version=None, saved_at=None, saved_by=None):
+        """Bump (or set) a store's version in the current transaction; the caller commits."""
+        row = db.session.get(StoreMeta, store)
+        if row is None:
+            row = StoreMeta(name=store, version=0)
+            db.session.add(row)
+        row.version = version if version is not None else (row.version or 0) + 1
+        if saved_at is not None:
+            row.saved_at = saved_at
+        if saved_by is not None:
+            row.saved_by = saved_by if isinstance(saved_by, str) else dumps_str(saved_by)
+        return row
+
+    def forget(self):
+        """Drop the migrated-store cache (after a rolled-back import)."""
+        self._migrated.clear()
+
+    @staticmethod
+    def meta_of(row):
+        """StoreMeta -> the {_meta} block the JSON documents carry."""
+        if row is None:
+            return {}
+        try:
+            saved_by = loads(row.saved_by) if row.saved_by else {}
+        except ValueError:
+            saved_by = {"id": row.saved_by}
+        return {"lastSavedAt": row.saved_at, "lastSavedBy": saved_by, "version": row.version}
+
+    def _pretty(self):
+        return current_app.config.get("JSON_PRETTY_FILES", False) if has_app_context() else False
+
+    # ---------- students / teachers ----------
+    @staticmethod
+    def json_profiles(kind):
+        data = load_file(os.path.join(DATA_DIR, PROFILE_FILES[kind]), default=[])
+        return data if isinstance(data, list) else []
+
+    def profiles(self, kind):
+        """Every enrolled student / teacher as profile dicts (JSON mode: the file, duplicates included)."""
+        if not self.uses_tables(STUDENTS):
+            return self.json_profiles(kind)
+        roster.ensure_seeded()
+        if kind == "student":
+            return [student_profile(r) for r in db.session.execute(select(Student).order_by(Student.id)).scalars()]
+        return [teacher_profile(r) for r in db.session.execute(select(Teacher).order_by(Teacher.id)).scalars()]
+
+    def find_profile(self, kind, person_id):
+        if not self.uses_tables(STUDENTS):
+            key = "student_id" if kind == "student" else "teacher_id"
+            return next((p for p in reversed(self.profiles(kind)) if p.get(key) == person_id), None)
+        roster.ensure_seeded()
+        if kind == "student":
+            row = db.session.execute(select(Student).where(Student.student_id == person_id)).scalar_one_or_none()
+            return student_profile(row) if row is not None else None
+        row = db.session.execute(select(Teacher).where(Teacher.teacher_id == person_id)).scalar_one_or_none()
+        return teacher_profile(row) if row is not None else None
+
+    def add_profile(self, kind, profile):
+        """One enrollment: appended to the JSON file (not in sql mode) and upserted into the roster table."""
+        if self.writes_json():
+            profiles = self.json_profiles(kind)
+            profiles.append(profile)
+            dump_file(os.path.join(DATA_DIR, PROFILE_FILES[kind]), profiles, pretty=self._pretty())
+        try:
+            if kind == "student":
+                roster.add_student(profile)
+            else:
+                roster.add_teacher(profile)
+            self.profiles_changed(kind)
+        except Exception as e:
+            db.session.rollback()
+            if not self.writes_json():
+                raise  # the table is the only copy
+            log.warning("could not add %s to roster table: %s", kind, e)
+
+    def profiles_changed(self, kind):
+        """Bump the students / teachers version after a roster write (other processes rebuild their search index)."""
+        if self.backend != "json":
+            self.touch(STUDENTS if kind == "student" else TEACHERS)
+            db.session.commit()
+
+    # ---------- sessional marks ----------
+    def sessional_marks(self, default=None):
+        """The { _meta, records } document teacher pages and /api/get-marks return."""
+        if not self.uses_tables(MARKS):
+            return load_file(MARKS_FILE, default=default)
+        meta = db.session.get(StoreMeta, MARKS)
+        rows = db.session.execute(select(Mark).where(Mark.deleted.is_(False)).order_by(Mark.id)).scalars()
+        records = [mark_record(m) for m in rows]
+        if not records and meta is None:
+            return default
+        return {"_meta": self.meta_of(meta), "records": records}
+
+    def _replace_marks(self, records, meta):
+        """Mark rows := records, in every mode (they validate: ValueError on non-numeric marks)."""
+        saved_by = meta.get("lastSavedBy") if isinstance(meta.get("lastSavedBy"), dict) else {}
+        try:
+            marks_sync.replace_all(records, saved_by=saved_by.get("id"), commit=False)
+            if self.uses_tables(MARKS):
+                self.touch(MARKS, saved_at=meta.get("lastSavedAt"), saved_by=saved_by)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+    def save_sessional_marks(self, records, meta):
+        """Full save. Mark rows first, then the file."""
+        with self._marks_lock:
+            self._replace_marks(records, meta)
+            if self.writes_json():
+                dump_file(MARKS_FILE, {"_meta": meta, "records": records}, pretty=self._pretty())
+
+    def save_sessional_marks_staged(self, staging, meta):
+        """Full save from a streamed upload staged by services.ingest (the staging file is consumed)."""
+        try:
+            with self._marks_lock:
+                self._replace_marks(iter_staged_records(staging), meta)
+                if self.writes_json():
+                    os.replace(staging, MARKS_FILE)
+        finally:
+            if os.path.exists(staging):
+                os.remove(staging)
+
+    def apply_marks_changes(self, changes, saved_by=None):
+        """
+        Delta save (marks_sync.apply_changes). The rows it accepted are then
+        patched into the file, so full reads of it see them too.
+        """
+        with self._marks_lock:
+            result = marks_sync.apply_changes(changes, saved_by=saved_by)
+            if result["applied"] and self.writes_json():
+                self._patch_marks_file(result["applied"], saved_by)
+        return result
+
+    def _patch_marks_file(self, applied, saved_by):
+        rows = marks_sync.existing_rows({(a["student_id"], a["semester"]) for a in applied})
+        doc = load_file(MARKS_FILE, default=None)
+        doc = doc if isinstance(doc, dict) else {}
+        records, patched = [], set()
+        for record in doc.get("records") or []:
+            try:
+                key = marks_sync.record_key(record)
+            except ValueError:
+                key = None
+            row = rows.get(key)
+            if row is not None:
+                patched.add(key)
+                if row.deleted:
+                    continue
+                record = dict(record, **mark_record(row))
+            records.append(record)
+        records.extend(mark_record(row) for key, row in rows.items() if key not in patched and not row.deleted)
+        meta = doc.get("_meta") if isinstance(doc.get("_meta"), dict) else {}
+        meta = dict(meta, lastSavedAt=datetime.utcnow().isoformat(), lastSavedBy={"id": saved_by})
+        dump_file(MARKS_FILE, {"_meta": meta, "records": records}, pretty=self._pretty())
+
+    # ---------- attendance ----------
+    def append_attendance(self, record):
+        """
+        One recognized capture. The Attendance row is written in every mode (the
+        range / bucket API in services.timeline reads only the table); while the
+        log is the source of truth a failed row insert is logged, not raised.
+        """
+        try:
+            db.session.execute(insert(Attendance), [attendance_row(record)])
+            if self.backend == "sql" and not self.migrated(ATTENDANCE):
+                self.touch(ATTENDANCE)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            if self.uses_tables(ATTENDANCE):
+                raise
+            log.exception("could not mirror a capture into the attendance table")
+        if self.writes_json():
+            attendance_log.append(record)
+
+    def attendance(self, start=None, end=None):
+        """Records of months start..end ('YYYY-MM', inclusive), oldest first."""
+        if not self.uses_tables(ATTENDANCE):
+            return attendance_log.read(start=start, end=end)
+        lo, hi = _month_bounds(start, end)
+        q = (select(Attendance, Student.name)
+             .outerjoin(Student, Student.student_id == Attendance.student_id))
+        if lo is not None:
+            q = q.where(Attendance.ts_epoch >= lo)
+        if hi is not None:
+            q = q.where(Attendance.ts_epoch < hi)
+        q = q.order_by(Attendance.ts_epoch, Attendance.id)
+        return [attendance_record(a, name) for a, name in db.session.execute(q)]
+
+    def clear_attendance(self):
+        """Drops recognized captures; close-session registers stay (as in json mode)."""
+        db.session.execute(delete(Attendance).where(Attendance.source == CAPTURE))
+        db.session.commit()
+        if self.writes_json():
+            attendance_log.clear()
+
+    # ---------- semester results (used by services.results_store) ----------
+    def results_document(self):
+        """(records, meta) from the tables, or None when nothing was published there."""
+        meta_row = db.session.get(StoreMeta, RESULTS)
+        if meta_row is None:
+            return None
+        by_key = {}
+        for s in db.session.execute(select(ResultSemester)
+                                    .order_by(ResultSemester.record_key, ResultSemester.sem_number)).scalars():
+            by_key.setdefault(s.record_key, []).append(s)
+        records = [result_record(r, by_key.get(r.key, ()))
+                   for r in db.session.execute(select(ResultRecord).order_by(ResultRecord.id)).scalars()]
+        return records, self.meta_of(meta_row)
+
+    def replace_results(self, records, meta, batch_size=1000, commit=True):
+        """Replace every results row with `records` (an iterable, consumed in batches) in one transaction."""
+        report = {"records": 0, "semesters": 0}
+        try:
+            db.session.execute(delete(ResultSemester))
+            db.session.execute(delete(ResultRecord))
+            headers, semesters, seen = [], [], set()
+
+            def flush():
+                if headers:
+                    db.session.execute(insert(ResultRecord), headers)
+                if semesters:
+                    db.session.execute(insert(ResultSemester), semesters)
+                report["semesters"] += len(semesters)
+                headers.clear()
+                semesters.clear()
+
+            for record in records:
+                if not isinstance(record, dict) or not result_key(record):
+                    continue
+                header, rows = result_rows(record)
+                if header["key"] in seen:
+                    raise ValueError(f"duplicate results record {header['key']}")
+                seen.add(header["key"])
+                headers.append(header)
+                semesters.extend(rows)
+                report["records"] += 1
+                if len(headers) >= batch_size:
+                    flush()
+            flush()
+            self.touch(RESULTS, version=meta.get("version"), saved_at=meta.get("lastSavedAt"),
+                       saved_by=meta.get("lastSavedBy"))
+            if commit:
+                db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return report
+
+    def apply_results_delta(self, upserts, deletes, meta):
+        """Resolved upserts (full records) and deletes from ResultsStore.apply_delta, in one transaction."""
+        try:
+            for record in upserts:
+                header, rows = result_rows(record)
+                existing = db.session.execute(
+                    select(ResultRecord).where(ResultRecord.key == header["key"])).scalar_one_or_none()
+                if existing is None:
+                    db.session.add(ResultRecord(**header))
+                else:
+                    for col, value in header.items():
+                        setattr(existing, col, value)
+                db.session.execute(delete(ResultSemester).where(ResultSemester.record_key == header["key"]))
+                db.session.flush()
+                if rows:
+                    db.session.execute(insert(ResultSemester), rows)
+            for d in deletes:
+                key = result_key(d)
+                # the document matches a delete by student_id or roll_no
+                keys = list(db.session.execute(select(ResultRecord.key).where(
+                    (ResultRecord.key == key) | (ResultRecord.student_id == key) | (ResultRecord.roll_no == key))
+                ).scalars())
+                if not keys:
+                    continue
+                q = delete(ResultSemester).where(ResultSemester.record_key.in_(keys))
+                if d.get("sem") is not None:
+                    db.session.execute(q.where(ResultSemester.sem_number == _int_or_none(d["sem"])))
+                else:
+                    db.session.execute(q)
+                    db.session.execute(delete(ResultRecord).where(ResultRecord.key.in_(keys)))
+            self.touch(RESULTS, version=meta.get("version"), saved_at=meta.get("lastSavedAt"),
+                       saved_by=meta.get("lastSavedBy"))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+    # ---------- overview ----------
+    def stats(self):
+        out = {"backend": self.backend, "stores": {}}
+        for row in db.session.execute(select(StoreMeta)).scalars():
+            out["stores"][row.name] = row.to_dict()
+        return out
+
+
+# shared switch used by app.py, the blueprints, results_store and student_search
+storage = Storage()
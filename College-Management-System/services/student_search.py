@@ -0,0 +1,263 @@
+# services/student_search.py
+"""
+In-memory prefix search over enrolled students (data/students.json).
+
+Every student is split into lowercase tokens (name words, roll_no,
+student_id, class with and without punctuation). Tokens live in one sorted
+list with parallel NumPy columns (owner doc, field weight, token length), so
+a query term is two bisects plus a slice: every token starting with the term
+is a contiguous range. Multi-word queries intersect the per-term matches and
+the best page is picked with argpartition, which keeps typeahead queries in
+the low milliseconds at 100k students.
+
+Enrollments are added to a small unsorted tail that is scanned linearly and
+merged into the sorted arrays once it grows past MERGE_AT tokens. Re-enrolling
+a student_id replaces the earlier record (students.json can hold duplicates).
+Outside STORAGE_BACKEND=json the index is built from the Student table and
+rebuilt when the "students" StoreMeta version moves.
+"""
+
+import json
+import os
+import re
+import threading
+from bisect import bisect_left
+from pathlib import Path
+
+import numpy as np
+
+from .storage import STUDENTS, storage
+
+DATA_DIR = os.path.join(Path(__file__).resolve().parents[1], "data")
+STUDENTS_FILE = os.path.join(DATA_DIR, "students.json")
+
+# field weights: an id / roll number hit outranks a name hit, which outranks a class hit
+W_ID, W_NAME, W_CLASS = 8, 4, 1
+EXACT_BONUS = 2  # whole-token match vs prefix match
+MERGE_AT = 2048
+
+_SPLIT = re.compile(r"[^0-9a-z]+")
+
+
+def _tokens(record):
+    """(token, weight) pairs for one student record."""
+    out = []
+    for field in ("student_id", "roll_no"):
+        value = str(record.get(field) or "").strip().lower()
+        if value:
+            out.append((value, W_ID))
+    for word in _SPLIT.split(str(record.get("name") or "").lower()):
+        if word:
+            out.append((word, W_NAME))
+    cls = str(record.get("class") or "").strip().lower()
+    if cls:
+        out.append((cls, W_CLASS))
+        squashed = _SPLIT.sub("", cls)
+        if squashed and squashed != cls:
+            out.append((squashed, W_CLASS))  # "cs-b" also matches "csb"
+    return out
+
+
+def query_terms(q):
+    """Whitespace-separated, lowercased terms (ids and classes keep their punctuation)."""
+    return str(q or "").lower().split()
+
+
+class StudentSearchIndex:
+    def __init__(self, path=STUDENTS_FILE):
+        self.path = path
+        self._lock = threading.RLock()
+        self._seen = None
+        self.docs = []                # student records, by doc id
+        self._alive = np.zeros(0, dtype=bool)
+        self._by_sid = {}             # student_id -> doc id (latest enrollment)
+        self._name_order = np.zeros(0, dtype=np.int64)  # alphabetical rank, for tie-breaks
+        self._sorted_names = []       # lowercased names at build time
+        self._class_codes = {}        # lowercased class -> code
+        self._doc_class = np.zeros(0, dtype=np.int64)
+        self._tokens = []             # sorted token strings
+        self._tok_doc = np.zeros(0, dtype=np.int64)
+        self._tok_weight = np.zeros(0, dtype=np.int64)
+        self._tok_len = np.zeros(0, dtype=np.int64)
+        self._tail = []               # (token, doc, weight) added since the last merge
+
+    # ---------- building ----------
+    def _stat(self):
+        if storage.uses_tables(STUDENTS):
+            return ("sql", storage.store_version(STUDENTS))
+        try:
+            st = os.stat(self.path)
+            return (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+
+    def _load(self):
+        """Rebuild from students.json (or the table) when it changed behind our back."""
+        stat = self._stat()
+        if stat == self._seen:
+            return
+        if stat is not None and stat[0] == "sql":
+            self.build(storage.profiles("student"))
+            self._seen = stat
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                records = json.load(f)
+        except Exception:
+            records = []
+        self.build(records if isinstance(records, list) else [])
+        self._seen = stat
+
+    def build(self, records):
+        with self._lock:
+            self.docs = []
+            self._by_sid = {}
+            self._class_codes = {}
+            alive, classes = [], []
+            pairs = []
+            for record in records:
+                if not isinstance(record, dict):
+                    continue
+                doc = len(self.docs)
+                self.docs.append(record)
+                alive.append(True)
+                classes.append(self._class_code(record))
+                sid = str(record.get("student_id") or "")
+                if sid in self._by_sid:
+                    alive[self._by_sid[sid]] = False
+                if sid:
+                    self._by_sid[sid] = doc
+                pairs.extend((tok, doc, w) for tok, w in _tokens(record))
+            self._alive = np.asarray(alive, dtype=bool)
+            self._doc_class = np.asarray(classes, dtype=np.int64)
+            self._tail = []
+            self._merge(pairs, reset=True)
+
+    def _merge(self, pairs, reset=False):
+        """Fold (token, doc, weight) pairs into the sorted arrays."""
+        pairs.sort(key=lambda p: p[0])
+        if reset:
+            self._tokens = [p[0] for p in pairs]
+            self._tok_doc = np.fromiter((p[1] for p in pairs), dtype=np.int64, count=len(pairs))
+            self._tok_weight = np.fromiter((p[2] for p in pairs), dtype=np.int64, count=len(pairs))
+            self._tok_len = np.fromiter((len(p[0]) for p in pairs), dtype=np.int64, count=len(pairs))
+            names = [str(d.get("name") or "").lower() for d in self.docs]
+            order = sorted(range(len(names)), key=names.__getitem__)
+            self._sorted_names = [names[i] for i in order]
+            self._name_order = np.empty(len(names), dtype=np.int64)
+            self._name_order[order] = np.arange(len(names))
+            return
+        # insert the (sorted) new pairs at their bisect positions: one memmove per array
+        at = [bisect_left(self._tokens, p[0]) for p in pairs]
+        merged, prev = [], 0
+        for pos, p in zip(at, pairs):
+            merged.extend(self._tokens[prev:pos])
+            merged.append(p[0])
+            prev = pos
+        merged.extend(self._tokens[prev:])
+        self._tokens = merged
+        self._tok_doc = np.insert(self._tok_doc, at, [p[1] for p in pairs])
+        self._tok_weight = np.insert(self._tok_weight, at, [p[2] for p in pairs])
+        self._tok_len = np.insert(self._tok_len, at, [len(p[0]) for p in pairs])
+
+    def _class_code(self, record):
+        return self._class_codes.setdefault(str(record.get("class") or "").strip().lower(), len(self._class_codes))
+
+    def add(self, record):
+        """Index one newly enrolled student (call after students.json was saved)."""
+        with self._lock:
+            if self._seen is None:
+                self._load()  # first use: the saved file already holds this student
+                return
+            doc = len(self.docs)
+            self.docs.append(record)
+            self._alive = np.append(self._alive, True)
+            self._doc_class = np.append(self._doc_class, self._class_code(record))
+            sid = str(record.get("student_id") or "")
+            if sid in self._by_sid:
+                self._alive[self._by_sid[sid]] = False
+            if sid:
+                self._by_sid[sid] = doc
+            self._tail.extend((tok, doc, w) for tok, w in _tokens(record))
+            # alphabetical rank relative to the names seen at build time (ties are fine)
+            rank = bisect_left(self._sorted_names, str(record.get("name") or "").lower())
+            self._name_order = np.append(self._name_order, rank)
+            if len(self._tail) >= MERGE_AT:
+                tail, self._tail = self._tail, []
+                self._merge(tail)
+            self._seen = self._stat()
+
+    # ---------- querying ----------
+    def _term_scores(self, term):
+        """Dense per-doc best score for one term (0 = no match)."""
+        n = len(self.docs)
+        scores = np.zeros(n, dtype=np.int64)
+        lo = bisect_left(self._tokens, term)
+        hi = bisect_left(self._tokens, term + "\uffff", lo)
+        if hi > lo:
+            sl = slice(lo, hi)
+            s = self._tok_weight[sl] * (1 + EXACT_BONUS * (self._tok_len[sl] == len(term)))
+            np.maximum.at(scores, self._tok_doc[sl], s)
+        for tok, doc, w in self._tail:
+            if tok.startswith(term):
+                scores[doc] = max(scores[doc], w * (1 + EXACT_BONUS * (len(tok) == len(term))))
+        return scores
+
+    def search(self, q, page=1, per_page=20, class_name=None):
+        """
+        Ranked, paginated search. Every term must prefix-match some token of a
+        student (AND); score is the sum of each term's best field weight, with a
+        bonus for whole-token matches. Ties are broken alphabetically by name.
+        Returns { total, page, per_page, results }.
+        """
+        page, per_page = max(1, int(page)), max(1, min(int(per_page), 100))
+        with self._lock:
+            self._load()
+            terms = query_terms(q)
+            n = len(self.docs)
+            if n == 0 or not terms:
+                return {"total": 0, "page": page, "per_page": per_page, "results": []}
+            total_score = None
+            for term in terms:
+                scores = self._term_scores(term)
+                total_score = scores if total_score is None else np.where(
+                    (total_score > 0) & (scores > 0), total_score + scores, 0)
+            mask = (total_score > 0) & self._alive
+            if class_name:
+                code = self._class_codes.get(str(class_name).strip().lower())
+                mask &= self._doc_class == (-1 if code is None else code)
+            cand = np.flatnonzero(mask)
+            total = int(cand.size)
+            start = (page - 1) * per_page
+            if start >= total:
+                return {"total": total, "page": page, "per_page": per_page, "results": []}
+            # single int64 sort key: score, then alphabetical name rank, then enrollment
+            # order (unique, so pages never overlap)
+            key = (total_score[cand] * (n + 1) + (n - self._name_order[cand])) * (n + 1) + (n - cand)
+            upto = min(total, start + per_page)
+            if upto < total:
+                part = np.argpartition(-key, upto - 1)[:upto]
+            else:
+                part = np.arange(total)
+            top = part[np.argsort(-key[part], kind="stable")][start:upto]
+            results = []
+            for i in top:
+                d = self.docs[int(cand[i])]
+                results.append({
+                    "student_id": d.get("student_id"),
+                    "name": d.get("name"),
+                    "class": d.get("class"),
+                    "roll_no": d.get("roll_no"),
+                    "score": int(total_score[cand[i]]),
+                })
+            return {"total": total, "page": page, "per_page": per_page, "results": results}
+
+    def stats(self):
+        with self._lock:
+            self._load()
+            return {"documents": len(self.docs), "students": int(self._alive.sum()),
+                    "tokens": len(self._tokens), "pending_tokens": len(self._tail)}
+
+
+# shared index used by app.py (enrollment) and the api blueprint (search)
+student_search = StudentSearchIndex()
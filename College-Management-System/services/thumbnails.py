@@ -0,0 +1,196 @@
+# services/thumbnails.py
+"""
+On-demand thumbnails of face images, cached on disk.
+
+A thumbnail is identified by (blob digest, size). The digest already names
+the source bytes, so the URL
+
+    /thumbs/<size>/<digest>.jpg?v=<RENDER_VERSION>
+
+never has to change for the same picture: it is served with an ETag and a
+one-year immutable Cache-Control. RENDER_VERSION is bumped whenever the
+rendering (crop, quality) changes, which moves every client to new URLs.
+
+Only the sizes in `sizes` are rendered (a request for another size is
+snapped up to the next one), so the cache cannot be flooded with variants.
+Rendered files live in static/uploads/thumbs/ab/<digest>-<size>.jpg; a hit
+refreshes the file's mtime, and once the directory grows past `max_bytes`
+the least recently used files are deleted.
+"""
+
+import io
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+try:
+    from PIL import Image, ImageOps
+except Exception:  # Pillow is optional; without it thumbnails are unavailable
+    Image = ImageOps = None
+
+from .blobstore import digest_of_path, is_digest
+
+BASE_DIR = str(Path(__file__).resolve().parents[1])
+THUMB_DIR = os.path.join(BASE_DIR, "static", "uploads", "thumbs")
+
+RENDER_VERSION = 1
+
+
+def render(data, size, quality=82):
+    """Square, centre-cropped JPEG of `size` px from encoded image bytes (None if undecodable)."""
+    if Image is None:
+        return None
+    try:
+        img = Image.open(io.BytesIO(data))
+        img.draft("RGB", (size * 2, size * 2))  # JPEG: decode at reduced scale
+        img = ImageOps.exif_transpose(img).convert("RGB")
+        img = ImageOps.fit(img, (size, size), method=Image.LANCZOS)
+    except Exception:
+        return None
+    out = io.BytesIO()
+    img.save(out, "JPEG", quality=quality, optimize=True, progressive=True)
+    return out.getvalue()
+
+
+class ThumbnailCache:
+    def __init__(self, root=THUMB_DIR, sizes=(48, 96, 192), max_bytes=64 * 1024 * 1024, quality=82):
+        self.root = root
+        self.sizes = tuple(sorted(sizes))
+        self.max_bytes = max_bytes
+        self.quality = quality
+        self._lock = threading.Lock()
+        self._inflight = {}          # (digest, size) -> Lock, so one render per variant
+        self._lru = None             # path -> size in bytes, least recently used first
+        self._bytes = 0
+        self.stats_counters = {"hits": 0, "misses": 0, "evicted": 0, "errors": 0}
+
+    def configure(self, sizes=None, max_bytes=None, quality=None):
+        with self._lock:
+            if sizes:
+                self.sizes = tuple(sorted(int(s) for s in sizes))
+            if max_bytes is not None:
+                self.max_bytes = int(max_bytes)
+            if quality is not None:
+                self.quality = int(quality)
+
+    # ---------- naming ----------
+    def snap(self, size):
+        """The smallest configured size >= size (the largest one if size is bigger)."""
+        for s in self.sizes:
+            if s >= size:
+                return s
+        return self.sizes[-1]
+
+    def path_for(self, digest, size):
+        return os.path.join(self.root, digest[:2], f"{digest}-{size}.jpg")
+
+    def url(self, digest, size):
+        return f"/thumbs/{self.snap(int(size))}/{digest}.jpg?v={RENDER_VERSION}"
+
+    def url_for_image(self, face_image, size):
+        """Thumbnail URL for a stored face_image path, or None for legacy (non-blob) paths."""
+        digest = digest_of_path(face_image)
+        return self.url(digest, size) if digest else None
+
+    @staticmethod
+    def etag(digest, size):
+        return f"{digest}-{size}-v{RENDER_VERSION}"
+
+    # ---------- LRU bookkeeping ----------
+    def _load_lru(self):
+        """Index the files already on disk, oldest mtime first (once per process)."""
+        if self._lru is not None:
+            return
+        found = []
+        for dirpath, _dirs, files in os.walk(self.root):
+            for name in files:
+                if not name.endswith(".jpg"):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                found.append((st.st_mtime, path, st.st_size))
+        found.sort()
+        self._lru = OrderedDict((path, size) for _m, path, size in found)
+        self._bytes = sum(self._lru.values())
+
+    def _touch(self, path, nbytes):
+        with self._lock:
+            self._load_lru()
+            old = self._lru.pop(path, None)
+            if old is not None:
+                self._bytes -= old
+            self._lru[path] = nbytes
+            self._bytes += nbytes
+            victims = []
+            while self._bytes > self.max_bytes and len(self._lru) > 1:
+                victim, vbytes = self._lru.popitem(last=False)
+                self._bytes -= vbytes
+                victims.append(victim)
+            self.stats_counters["evicted"] += len(victims)
+        for victim in victims:
+            try:
+                os.remove(victim)
+            except OSError:
+                pass
+        try:
+            os.utime(path)  # survives restarts: _load_lru orders by mtime
+        except OSError:
+            pass
+
+    # ---------- lookup / render ----------
+    def get(self, digest, size, source_path):
+        """
+        Absolute path of the cached thumbnail, rendering it from source_path
+        on a miss. Returns None when the source cannot be decoded.
+        """
+        if not is_digest(digest):
+            return None
+        size = self.snap(int(size))
+        path = self.path_for(digest, size)
+        if os.path.exists(path):
+            self.stats_counters["hits"] += 1
+            self._touch(path, os.path.getsize(path))
+            return path
+
+        key = (digest, size)
+        with self._lock:
+            lock = self._inflight.setdefault(key, threading.Lock())
+        with lock:
+            try:
+                if not os.path.exists(path):  # another request may have rendered it meanwhile
+                    self.stats_counters["misses"] += 1
+                    try:
+                        with open(source_path, "rb") as f:
+                            data = render(f.read(), size, self.quality)
+                    except OSError:
+                        data = None
+                    if data is None:
+                        self.stats_counters["errors"] += 1
+                        return None
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".part")
+                    with os.fdopen(fd, "wb") as f:
+                        f.write(data)
+                    os.replace(tmp, path)
+            finally:
+                with self._lock:
+                    self._inflight.pop(key, None)
+        self._touch(path, os.path.getsize(path))
+        return path
+
+    def stats(self):
+        with self._lock:
+            self._load_lru()
+            out = dict(self.stats_counters)
+            out.update({"files": len(self._lru), "bytes": self._bytes, "max_bytes": self.max_bytes,
+                        "sizes": list(self.sizes), "render_version": RENDER_VERSION})
+        return out
+
+
+# shared cache used by app.py (/thumbs) and the roster API (avatar URLs)
+thumbnails = ThumbnailCache()
@@ -0,0 +1,162 @@
+# services/timeline.py
+"""
+Time-range queries and time buckets over attendance and marks.
+
+Both tables carry an indexed integer epoch next to their ISO string column
+(Attendance.ts_epoch, Mark.updated_epoch; see database.migrations for the
+backfill). A range is a plain `epoch >= start AND epoch < end` scan on that
+index, paged by keyset (epoch, id) rather than OFFSET, and a bucket is
+integer arithmetic on the epoch inside GROUP BY, so neither parses a single
+timestamp per row:
+
+    hour  ->  (ts + tz) // 3600
+    day   ->  (ts + tz) // 86400
+    week  ->  (ts + tz - 4 days) // 604800   (weeks start on Monday)
+
+`tz_offset` (minutes east of UTC) moves bucket boundaries to local midnight.
+
+Recognized captures reach the Attendance table in every STORAGE_BACKEND
+(services.storage.append_attendance). Captures logged before that only live
+in the attendance log; `python migrate_json.py --only attendance` copies them
+in (it skips the ones already there).
+"""
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, func, or_, select
+
+from database.models import Attendance, Mark, db, epoch_of
+
+BUCKETS = {"hour": 3600, "day": 86400, "week": 7 * 86400}
+WEEK_ORIGIN = 4 * 86400  # 1970-01-05 was a Monday
+MAX_BUCKETS = 5000
+MAX_LIMIT = 1000
+
+
+def parse_time(value):
+    """Epoch seconds from an epoch number, ISO timestamp or YYYY-MM-DD date; None when empty."""
+    if value is None or str(value).strip() == "":
+        return None
+    text = str(value).strip()
+    if text.lstrip("-").isdigit():
+        return int(text)
+    epoch = epoch_of(text)
+    if epoch is None:
+        raise ValueError(f"unreadable time: {value!r}")
+    return epoch
+
+
+def _window(start, end, default_days=30):
+    end = parse_time(end)
+    start = parse_time(start)
+    if end is None:
+        end = epoch_of(datetime.utcnow()) + 1
+    if start is None:
+        start = end - default_days * 86400
+    if start >= end:
+        raise ValueError("'from' must be before 'to'")
+    return start, end
+
+
+def _bucket_expr(column, bucket, tz_offset):
+    if bucket not in BUCKETS:
+        raise ValueError(f"bucket must be one of {', '.join(BUCKETS)}")
+    width = BUCKETS[bucket]
+    shift = int(tz_offset or 0) * 60 - (WEEK_ORIGIN if bucket == "week" else 0)
+    # index: (column + shift) // width; bucket start = index * width - shift
+    return (column + shift) // width, width, shift
+
+
+def _iso(epoch):
+    return (datetime(1970, 1, 1) + timedelta(seconds=epoch)).isoformat()
+
+
+def _page(model, column, filters, start, end, limit, after):
+    """Rows with start <= column < end, ordered by (column, id), after the keyset cursor `after`."""
+    limit = max(1, min(int(limit or 200), MAX_LIMIT))
+    conds = [column >= start, column < end, *filters]
+    if after:
+        try:
+            a_epoch, a_id = (int(x) for x in str(after).split(":", 1))
+        except ValueError:
+            raise ValueError("after must look like '<epoch>:<id>'")
+        conds.append(or_(column > a_epoch, and_(column == a_epoch, model.id > a_id)))
+    rows = list(db.session.execute(
+        select(model).where(*conds).order_by(column, model.id).limit(limit + 1)).scalars())
+    more = len(rows) > limit
+    rows = rows[:limit]
+    last = rows[-1] if rows else None
+    return {"from": start, "to": end, "items": [r.to_dict() for r in rows], "more": more,
+            "next": f"{getattr(last, column.key)}:{last.id}" if more else None}
+
+
+def _buckets(column, extra_group, filters, start, end, bucket, tz_offset):
+    index, width, shift = _bucket_expr(column, bucket, tz_offset)
+    if (end - start) // width > MAX_BUCKETS:
+        raise ValueError(f"range too long for {bucket} buckets (max {MAX_BUCKETS})")
+    b = index.label("b")
+    cols = [b] + ([extra_group] if extra_group is not None else []) + [func.count().label("n")]
+    q = select(*cols).where(column >= start, column < end, *filters).group_by(b)
+    if extra_group is not None:
+        q = q.group_by(extra_group)
+    out = {}
+    for row in db.session.execute(q.order_by(b)):
+        epoch = int(row.b) * width - shift
+        entry = out.setdefault(epoch, {"start": epoch, "start_iso": _iso(epoch), "total": 0})
+        entry["total"] += row.n
+        if extra_group is not None:
+            entry[str(getattr(row, extra_group.key))] = row.n
+    return {"from": start, "to": end, "bucket": bucket, "tz_offset": int(tz_offset or 0),
+            "buckets": list(out.values())}
+
+
+# ---------- attendance ----------
+def _attendance_filters(student_id=None, status=None, session_id=None):
+    filters = []
+    if student_id:
+        filters.append(Attendance.student_id == student_id)
+    if status:
+        filters.append(Attendance.status == status)
+    if session_id:
+        filters.append(Attendance.session_id == session_id)
+    return filters
+
+
+def attendance_range(start=None, end=None, student_id=None, status=None, session_id=None,
+                     limit=200, after=None):
+    """Attendance rows in [start, end), oldest first; pass back `next` as `after` for the next page."""
+    start, end = _window(start, end)
+    return _page(Attendance, Attendance.ts_epoch, _attendance_filters(student_id, status, session_id),
+                 start, end, limit, after)
+
+
+def attendance_buckets(start=None, end=None, bucket="day", tz_offset=0, student_id=None, session_id=None):
+    """Per-bucket counts, split by status: [{start, start_iso, total, present, late, absent, ...}]."""
+    start, end = _window(start, end)
+    return _buckets(Attendance.ts_epoch, Attendance.status, _attendance_filters(student_id, None, session_id),
+                    start, end, bucket, tz_offset)
+
+
+# ---------- marks ----------
+def _mark_filters(student_id=None, semester=None, include_deleted=False):
+    filters = [] if include_deleted else [Mark.deleted.is_(False)]
+    if student_id:
+        filters.append(Mark.student_id == student_id)
+    if semester is not None:
+        filters.append(Mark.semester == int(semester))
+    return filters
+
+
+def marks_range(start=None, end=None, student_id=None, semester=None, include_deleted=False,
+                limit=200, after=None):
+    """Mark rows last written in [start, end), oldest first."""
+    start, end = _window(start, end)
+    return _page(Mark, Mark.updated_epoch, _mark_filters(student_id, semester, include_deleted),
+                 start, end, limit, after)
+
+
+def marks_buckets(start=None, end=None, bucket="day", tz_offset=0, student_id=None, semester=None):
+    """Mark writes per bucket: [{start, start_iso, total}]."""
+    start, end = _window(start, end)
+    return _buckets(Mark.updated_epoch, None, _mark_filters(student_id, semester),
+                    start, end, bucket, tz_offset)